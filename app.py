@@ -1,41 +1,127 @@
-import requests
-from flask import Flask, render_template, redirect, session, flash, url_for, g, request
+from flask import Blueprint, Flask, current_app, render_template, redirect, session, flash, url_for, g, request, jsonify, abort
+import hmac
 import os
-from flask_debugtoolbar import DebugToolbarExtension
+from config import PROFILES
+import profiler
+import assets
+import conditional
+import details
+import diet_index
+import fragments
+import images
+import jobs
+import suggest
 from models import connect_db, db, Recipe, User, Favorites
-from sqlalchemy.exc import IntegrityError
+from search import search_recipes, index_recipes
+from pagination import Page, paginate, page_size
+from diet_index import DIETS, filter_recipes, parse_diets
+from id_allocator import recipe_ids
+import spoonacular
+from cache import ResponseCache
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from forms import SignupForm, LoginForm, AddRecipeForm, EditRecipeForm
-from dotenv import load_dotenv
 
-load_dotenv() # Load the .env file
+CURR_USER_KEY = "curr_user"
 
-API_KEY = os.getenv("API_KEY")
 
-CURR_USER_KEY = "curr_user"
+bp = Blueprint("main", __name__)
+
+
+def create_app(config=None, **overrides):
+    """Build the Flask app.
+
+    `config` is a profile name from config.PROFILES or a config class; the
+    default is the YUMMPY_CONFIG environment variable, else "production".
+    Keyword `overrides` are applied last.
+    """
+
+    if config is None or isinstance(config, str):
+        config = PROFILES[config or os.getenv("YUMMPY_CONFIG", "production")]
+
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(overrides)
+
+    connect_db(app)
+    profiler.init_app(app)
+    assets.init_app(app)
+    conditional.init_app(app)
+    fragments.init_app(app)
+    images.init_app(app)
+    jobs.init_app(app)
+    suggest.init_app(app)
+    diet_index.init_app(app)
+    app.register_blueprint(bp)
+
+    if app.config.get("DEBUG_TB_ENABLED"):
+        # Dev-only: imported here so other profiles never load it.
+        from flask_debugtoolbar import DebugToolbarExtension
+        DebugToolbarExtension(app)
+        app.logger.info("Database: %s", app.config["SQLALCHEMY_DATABASE_URI"])
+
+    return app
+
+
+_default_app = None
+
 
+def __getattr__(name):
+    """``app.app`` builds the default app on first use, so `gunicorn app:app` still works."""
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
-    'SUPABASE_DB_URL', "postgresql:///foodrecipe_db")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ECHO"] = True
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = False
+    global _default_app
+    if name == "app":
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-print("SQLALCHEMY_DATABASE_URI:", app.config['SQLALCHEMY_DATABASE_URI'])
 
+class CurrentUser:
+    """The logged-in user, loaded from the database only when a view needs it.
 
-connect_db(app)
+    `id` and `username` come from the identity cache; reading any other
+    attribute loads the full User row (once per request).
+    """
+
+    def __init__(self, identity):
+        self.id = identity["id"]
+        self.username = identity["username"]
+        self._user = None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+            if self._user is None:
+                raise AttributeError(name)
+        return getattr(self._user, name)
+
+
+# user id -> {"id", "username"}, so most requests need no user query at all.
+user_cache = ResponseCache(maxsize=int(os.getenv('USER_CACHE_SIZE', 10000)),
+                           ttl=int(os.getenv('USER_CACHE_TTL', 300)),
+                           persistent=False)
+
+
+def load_identity(user_id):
+    """Fetch just the identity columns of a user, or None if they're gone."""
 
-toolbar = DebugToolbarExtension(app)
+    row = db.session.query(User.id, User.username).filter_by(id=user_id).first()
+    return {"id": row.id, "username": row.username} if row else None
 
 
-@app.before_request
+@bp.before_app_request
 def add_user_to_g():
     """If we're logged in, add curr user to Flask global."""
 
-    if CURR_USER_KEY in session:
-        g.user = User.query.get(session[CURR_USER_KEY])
+    user_id = session.get(CURR_USER_KEY)
+    identity = None
+    if user_id is not None:
+        identity = user_cache.get_or_set(user_id, lambda: load_identity(user_id))
+
+    if identity:
+        g.user = CurrentUser(identity)
 
     else:
         g.user = None
@@ -45,27 +131,28 @@ def do_login(user):
     """Log in user."""
 
     session[CURR_USER_KEY] = user.id
+    user_cache.set(user.id, {"id": user.id, "username": user.username})
 
 
 def do_logout():
     """Logout user."""
 
     if CURR_USER_KEY in session:
-        del session[CURR_USER_KEY]
+        user_cache.discard(session.pop(CURR_USER_KEY))
 
-@app.route("/")
+@bp.route("/")
 def home_page():
     if g.user: 
-        recipes = Recipe.query.limit(100).all()
-        # Get IDs of all recipes that are favorited by the current user
-        favorite_ids = {fav.recipe_id for fav in Favorites.query.filter_by(user_id=g.user.id).all()}
+        recipes = paginate(Recipe.with_favorite_flag(g.user.id), Recipe.id,
+                           request.args.get('cursor'))
+        details.prefetch(recipes)
 
-        return render_template("home.html", recipes=recipes, favorite_ids=favorite_ids)
+        return render_template("home.html", recipes=recipes)
     
     else:
         return render_template("home-anon.html")
 
-@app.route("/signup", methods=["GET", "POST"])
+@bp.route("/signup", methods=["GET", "POST"])
 def register():
     """Handle user signup.
 
@@ -100,7 +187,7 @@ def register():
     else:
         return render_template("signup.html", form=form)
        
-@app.route('/login', methods=["GET", "POST"])
+@bp.route('/login', methods=["GET", "POST"])
 def login():
     """Handle user login."""
 
@@ -111,6 +198,7 @@ def login():
                                  form.password.data)
 
         if user:
+            db.session.commit()  # persists a rehashed password, if any
             do_login(user)
             flash(f"Hello, {user.username}!", "success")
             return redirect("/")
@@ -120,7 +208,7 @@ def login():
     return render_template('login.html', form=form)
 
 
-@app.route("/recipes")
+@bp.route("/recipes")
 def list_recipes():
     """List recipes and show favorite status for the current user."""
     # if g.user:
@@ -129,42 +217,98 @@ def list_recipes():
     #     favorite_ids = set()
 
     search = request.args.get('q')
+    cursor = request.args.get('cursor')
+    diets, match_all = parse_diets(request.args)
 
-    if not search:
+    if not search and diets:
+        recipes = filter_recipes(diets, match_all, cursor=cursor, per_page=page_size())
+
+    elif not search:
         # Display a default list of recipes if no search term is provided
-        recipes = Recipe.query.limit(100).all()
+        recipes = paginate(Recipe.query, Recipe.id, cursor)
 
     else:
         # Try to find recipes in the database
-        recipes = Recipe.query.filter(Recipe.title.ilike(f"%{search}%")).all()
-
-        if not recipes:
-            # If no recipes found in the database, make an API request
-            response = requests.get(
-                url="https://api.spoonacular.com/recipes/complexSearch",
-                params={
-                    "query": search,
-                    "apiKey": API_KEY
-                }
-            )
-            if response.status_code == 200:
-                data = response.json()
-                recipes = data.get('results', [])
-
-                for api_recipe in recipes:
-                    new_recipe = Recipe(
-                        id=api_recipe["id"],
-                        title=api_recipe["title"],
-                        image=api_recipe["image"],
-                    )
-                    db.session.add(new_recipe)
-                db.session.commit()    
+        recipes = search_recipes(search, cursor=cursor, per_page=page_size(),
+                                 diets=diets, match_all=match_all)
+
+        if not recipes.total and not cursor and not diets:
+            # Nothing in the database: show cached API results, even stale
+            # ones, and leave asking the API to a background job.  Without a
+            # cached answer the request waits a little for that job.
+            api_recipes, stale = spoonacular.cached_search(search)
+            key = spoonacular.normalize_query(search)
+            job = None
+            if (api_recipes is None or stale) and not _search_failing(key):
+                job = jobs.queue.enqueue("search", key, search)
+                if api_recipes is None:
+                    db.session.close()  # don't hold a pooled connection while waiting
+                    job.done.wait(current_app.config.get("SEARCH_WAIT", 1.0))
+                    api_recipes, _ = spoonacular.cached_search(search)
+            if api_recipes is not None:
+                recipes = Page(api_recipes)
+            elif job is None or job.done.is_set():
+                flash("Error fetching recipes from the API.", "danger")
             else:
-                flash("Error fetching recipes from the API.", "danger")        
+                flash("Still searching for recipes, refresh in a moment.", "info")
+
+    def render():
+        return render_template("index.html", recipes=recipes, search=search,
+                               diets=diets, match_all=match_all, all_diets=DIETS)
+
+    if not all(isinstance(r, Recipe) for r in recipes):
+        return render()  # straight from the API, nothing to validate against
+
+    details.prefetch(recipes)
+    # No Last-Modified: a page can change (rows added/removed) while every
+    # row on it keeps its updated_at, which only the ETag catches.
+    etag = conditional.make_etag("recipes", request.full_path,
+                                 [(r.id, r.updated_at) for r in recipes], recipes.total)
+    return conditional.respond(etag, None, render)
 
-    return render_template("index.html", recipes=recipes)  
+def _search_failing(key):
+    """Whether a search job for `key` would only fail again right now."""
 
-@app.route("/recipes/add", methods=["GET", "POST"])
+    if spoonacular.breaker.state == "open":
+        return True
+    age = jobs.queue.last_failure("search", key)
+    return age is not None and age < current_app.config.get("SEARCH_RETRY_AFTER", 30)
+
+
+@jobs.queue.handler("search", expected=(spoonacular.SpoonacularError,))
+def refresh_search(query):
+    """Job: ask Spoonacular for `query`, cache the results and store the recipes."""
+
+    api_recipes = spoonacular.refresh_search(query)
+    rows = [{"id": r["id"], "title": r["title"], "image": r.get("image", "")}
+            for r in api_recipes]
+    try:
+        Recipe.upsert_many(rows)
+        db.session.commit()
+    except SQLAlchemyError:
+        # Saving is best effort; the cached results are still shown.
+        db.session.rollback()
+        raise
+    index_recipes(rows)
+    suggest.index_recipes(rows)
+    fragments.card_cache.invalidate(r["id"] for r in rows)
+
+
+@bp.route("/recipes/suggest")
+def suggest_recipes():
+    """Search-as-you-type completions of ``?prefix=`` as JSON."""
+
+    prefix = request.args.get("prefix", "")[:200]
+    limit = max(1, min(request.args.get("limit", 8, type=int), suggest.MAX_LIMIT))
+
+    response = jsonify(prefix=prefix, suggestions=suggest.suggest(prefix, limit))
+    # The same for every user, so shared caches may keep it.
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get("ANON_MAX_AGE", 60)
+    return response
+
+
+@bp.route("/recipes/add", methods=["GET", "POST"])
 def add_recipes():
     """Add new recipe to database""" 
     if not g.user:
@@ -173,12 +317,6 @@ def add_recipes():
     
     form = AddRecipeForm() 
 
-    def generate_unique_id():
-        """Generate an ID above 100000 for user-submitted recipes."""
-        max_id = db.session.query(db.func.max(Recipe.id)).scalar() or 100000
-        return max_id + 1
-
-
     if form.validate_on_submit():
         title = form.title.data
         image = form.image.data
@@ -187,7 +325,7 @@ def add_recipes():
         ketogenic = form.ketogenic.data
 
         new_recipe = Recipe(
-            id=generate_unique_id(), # Custom function for generating non-conflicting IDs
+            id=recipe_ids.next_id(), # From the reserved user-recipe id range
             title=title, 
             image=image,
             vegetarian=vegetarian,
@@ -203,7 +341,7 @@ def add_recipes():
 
     return render_template("add.html", form=form)  
 
-@app.route("/recipes/<int:recipe_id>/edit", methods=["GET", "POST"])
+@bp.route("/recipes/<int:recipe_id>/edit", methods=["GET", "POST"])
 def edit_recipe(recipe_id):
     """Allow the owner of the recipe to edit it.""" 
     recipe = Recipe.query.get_or_404(recipe_id)
@@ -229,7 +367,7 @@ def edit_recipe(recipe_id):
     return render_template("edit.html", form=form, recipe=recipe)
 
 
-@app.route("/recipes/<int:recipe_id>/delete", methods=["GET", "POST"])
+@bp.route("/recipes/<int:recipe_id>/delete", methods=["GET", "POST"])
 def delete_recipe(recipe_id):
     """Allow the owner of the recipe to delete it.""" 
     recipe = Recipe.query.get_or_404(recipe_id)
@@ -243,44 +381,53 @@ def delete_recipe(recipe_id):
     return redirect("/")
 
 
-@app.route("/recipes/<int:recipe_id>/info")
+@bp.route("/recipes/<int:recipe_id>/info")
 def recipe_info(recipe_id):
     """Get information about a recipe based on it's id"""
     if not g.user:
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    recipe = Recipe.query.get_or_404(recipe_id)
+    recipe = Recipe.query.options(db.joinedload(Recipe.detail)).get_or_404(recipe_id)
+    detail = details.for_recipe(recipe)
 
-    return render_template("recipe-infor.html", recipe=recipe)
+    versions = [recipe.updated_at] + ([detail.fetched_at] if detail else [])
+    return conditional.respond(
+        conditional.make_etag("recipe", recipe.id, *versions), max(versions),
+        lambda: render_template("recipe-infor.html", recipe=recipe,
+                                details=detail.data if detail else None))
 
 
-@app.route("/recipes/<int:recipe_id>/favorites", methods=["POST"])
+@bp.route("/recipes/<int:recipe_id>/favorites", methods=["POST"])
 def add_to_favorites(recipe_id):
-    """Add a recipe to the user's favorites."""
+    """Add a recipe to the user's favorites (form fallback for the JSON API)."""
     if not g.user:
         flash("Access unauthorized.", "danger")
         return redirect("/")
     
-    recipe = Recipe.query.get_or_404(recipe_id)
+    if Favorites.toggle(g.user.id, recipe_id) is None:
+        abort(404)
+    db.session.commit()
 
-    # Check if the recipe is already in favorites
-    favorite = Favorites.query.filter_by(user_id=g.user.id, recipe_id=recipe.id).first()
-    
-    if favorite:
-        db.session.delete(favorite)
+    return redirect("/")
 
-    else:
-        new_fav = Favorites(user_id=g.user.id, recipe_id=recipe_id)
-        db.session.add(new_fav)
-    
-    
+
+@bp.route("/api/recipes/<int:recipe_id>/favorite", methods=["POST"])
+def toggle_favorite(recipe_id):
+    """Toggle a favorite and return its new state as JSON."""
+    if not g.user:
+        return jsonify(error="Access unauthorized."), 401
+
+    result = Favorites.toggle(g.user.id, recipe_id)
+    if result is None:
+        return jsonify(error="Recipe not found."), 404
     db.session.commit()
 
-    return redirect("/")
+    favorited, count = result
+    return jsonify(recipe_id=recipe_id, favorited=favorited, count=count)
 
 
-@app.route("/favorites")
+@bp.route("/favorites")
 def show_favorites():
     """Show all favorite recipes for the current user."""
     if not g.user:
@@ -288,8 +435,9 @@ def show_favorites():
         return redirect("/")
 
     # Get all favorite recipes for the logged-in user
-    favorite_recipes = Recipe.query.join(Favorites, Favorites.recipe_id == Recipe.id)\
-                               .filter(Favorites.user_id == g.user.id).all()
+    favorite_recipes = paginate(Recipe.query.join(Favorites, Favorites.recipe_id == Recipe.id)
+                                            .filter(Favorites.user_id == g.user.id),
+                                Recipe.id, request.args.get('cursor'))
 
 
     return render_template("favorites.html", recipes=favorite_recipes)
@@ -297,7 +445,31 @@ def show_favorites():
        
 
 
-@app.route('/logout')
+@bp.route("/internal/metrics")
+def internal_metrics():
+    """Per-worker DB pool, Spoonacular client and cache stats (ops only)."""
+
+    token = current_app.config.get("INTERNAL_TOKEN")
+    if token:
+        if not hmac.compare_digest(request.headers.get("X-Internal-Token", ""), token):
+            abort(403)
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(403)
+
+    return jsonify(
+        pid=os.getpid(),
+        db_pool=current_app.extensions["pool_metrics"].snapshot(),
+        spoonacular=dict(breaker=spoonacular.breaker.state,
+                         endpoints=spoonacular.metrics.snapshot()),
+        caches=dict(search=spoonacular.search_cache.stats(), users=user_cache.stats(),
+                    cards=fragments.card_cache.stats(),
+                    images=current_app.extensions["images"].stats(),
+                    suggest=suggest.suggest_index.stats()),
+        jobs=jobs.queue.stats(),
+    )
+
+
+@bp.route('/logout')
 def logout():
     """Handle logout of user."""
 
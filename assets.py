@@ -0,0 +1,135 @@
+"""Fingerprinted, precompressed static assets.
+
+    python assets.py            # build static/dist/ before deploying
+
+The build copies every file under ``static/`` to ``static/dist/`` with a
+content hash in its name, writes ``.gz`` (and, with the ``brotli`` package,
+``.br``) variants of the text files next to it, and records the source ->
+hashed path mapping in ``manifest.json``.  Templates link through
+``asset_url``; the ``/assets/`` route picks the best encoding the client
+accepts and marks responses immutable, since a changed file gets a new
+name.  Without a build, ``asset_url`` falls back to the plain static URL.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+
+from flask import abort, current_app, request, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip variants only
+    brotli = None
+
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+ONE_YEAR = 365 * 24 * 3600
+
+
+def hashed_name(path, data):
+    """`path` with a digest of `data` before its extension."""
+
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build(static_folder):
+    """Write the hashed and compressed copies of `static_folder` and return the manifest.
+
+    Files from earlier builds are kept so pages cached before a deploy can
+    still load the assets they link to.
+    """
+
+    out = os.path.join(static_folder, DIST)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != out)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+
+            target = hashed_name(path, data)
+            dest = os.path.join(out, target)
+            _write(dest, data)
+            if path.endswith(COMPRESSIBLE):
+                variants = [(".gz", gzip.compress(data, 9, mtime=0))]
+                if brotli is not None:
+                    variants.append((".br", brotli.compress(data, quality=11)))
+                for suffix, compressed in variants:
+                    if len(compressed) < len(data):
+                        _write(dest + suffix, compressed)
+            manifest[path] = target
+
+    _write(os.path.join(out, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(path):
+    """Jinja global: the fingerprinted URL of static file `path`, if built."""
+
+    hashed = current_app.extensions["assets"].get(path)
+    if hashed is None:
+        return url_for("static", filename=path)
+    return url_for("assets", filename=hashed)
+
+
+def serve(filename):
+    """A built asset, precompressed when the client accepts it."""
+
+    folder = os.path.join(current_app.static_folder, DIST)
+    path = safe_join(folder, filename)
+    if path is None or filename == MANIFEST or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0],
+                         download_name=os.path.basename(filename), conditional=True,
+                         max_age=ONE_YEAR)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.extensions["assets"] = load_manifest(app.static_folder)
+    app.add_url_rule("/assets/<path:filename>", "assets", serve)
+    app.jinja_env.globals["asset_url"] = asset_url
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "static")
+    for source, target in build(folder).items():
+        print(f"{source} -> {DIST}/{target}")
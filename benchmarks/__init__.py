@@ -0,0 +1,5 @@
+"""Performance benchmarks for Yummpy.
+
+Each module is a script, e.g. ``python -m benchmarks.search``.  Unless
+``SUPABASE_DB_URL`` is set they run against a throwaway SQLite database.
+"""
@@ -0,0 +1,57 @@
+"""Home page render time for a page of 100 cards, with and without the card cache.
+
+    python -m benchmarks.cards [recipes]
+"""
+
+import sys
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, timed, report
+
+use_scratch_db()
+
+from app import create_app, CURR_USER_KEY  # noqa: E402
+from models import db, Recipe, User, Favorites  # noqa: E402
+from fragments import card_cache  # noqa: E402
+
+app = create_app()
+
+RUNS = 200
+PAGE = 100
+
+
+def load(n_recipes):
+    db.drop_all()
+    db.create_all()
+    rows = list(synthetic_recipes(n_recipes))
+    for i in range(0, len(rows), 10_000):
+        db.session.execute(db.insert(Recipe), rows[i:i + 10_000])
+    user = User(first_name="b", last_name="u", email="b@u.com", username="bench", password="x")
+    db.session.add(user)
+    db.session.flush()
+    db.session.execute(db.insert(Favorites),
+                       [{"user_id": user.id, "recipe_id": i} for i in range(1, PAGE, 3)])
+    db.session.execute(db.update(Recipe).where(Recipe.id <= PAGE // 4).values(user_id=user.id))
+    db.session.commit()
+    return user.id
+
+
+if __name__ == "__main__":
+    n_recipes = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    with app.app_context():
+        user_id = load(n_recipes)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess[CURR_USER_KEY] = user_id
+
+    pages = {}
+    for label, enabled in (("uncached cards", False), ("cached cards", True)):
+        app.config["CARD_CACHE"] = enabled
+        card_cache.clear()
+        pages[label] = client.get(f"/?per_page={PAGE}").data
+        samples = [timed(client.get, f"/?per_page={PAGE}")[1] for _ in range(RUNS)]
+        report(f"{PAGE} cards  {label}", samples)
+
+    assert pages["uncached cards"] == pages["cached cards"]
+    print(card_cache.stats())
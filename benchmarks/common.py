@@ -0,0 +1,87 @@
+"""Helpers shared by the benchmark scripts."""
+
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import requests
+
+from bulk_load import WORDS, random_title, synthetic_recipes  # noqa: F401
+
+
+def use_scratch_db():
+    """Point the app at a fresh SQLite file unless a DB URL is configured.
+
+    Must be called before importing ``app``.
+    """
+
+    if "SUPABASE_DB_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="yummpy-bench-"), "bench.db")
+        os.environ["SUPABASE_DB_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    # The scripts drop and reload tables; don't build the in-process indexes meanwhile.
+    os.environ.setdefault("SUGGEST_WARM", "0")
+    os.environ.setdefault("DIET_INDEX_WARM", "0")
+    # Never queue informationBulk prefetches against the real API.
+    os.environ.setdefault("RECIPE_DETAILS", "0")
+    return os.environ["SUPABASE_DB_URL"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def timed(fn, *args, **kwargs):
+    """Run `fn` and return ``(result, elapsed_seconds)``."""
+
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(label, samples):
+    """Print p50/p99/mean (in ms) for a list of second-valued samples."""
+
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<40} n={len(ms):<6} p50={percentile(ms, 50):8.3f}ms "
+          f"p99={percentile(ms, 99):8.3f}ms mean={statistics.fmean(ms):8.3f}ms")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def gunicorn(target, workers=1, env=None, timeout=30):
+    """Run ``gunicorn target`` on a free port; yields its base URL once "/" is served."""
+
+    base_url = f"http://127.0.0.1:{free_port()}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", base_url[7:], target],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=dict(os.environ, **(env or {})))
+    try:
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                if requests.get(f"{base_url}/", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                pass
+            if server.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError(f"gunicorn {target} did not serve a page within {timeout}s")
+            time.sleep(0.01)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,81 @@
+"""How many requests waiting on a slow Spoonacular one gunicorn worker can serve at once.
+
+    python -m benchmarks.concurrency [concurrency] [latency]
+
+Each request is the first view of a recipe, which fetches its details
+from the stub API (``latency`` seconds, 0.5 by default).  One worker is
+run with the ``sync`` worker class and then with ``gthread`` at a few
+thread counts (see gunicorn.conf.py).
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, gunicorn, percentile
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe, User  # noqa: E402
+from stub_spoonacular import StubSpoonacular  # noqa: E402
+
+app = create_app()
+
+USERNAME, PASSWORD = "bench", "benchmark"
+SETUPS = (("sync", 1), ("gthread", 8), ("gthread", 32), ("gthread", 64))
+
+
+def load(n_recipes):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(Recipe), list(synthetic_recipes(n_recipes)))
+    User.signup("bench", "user", USERNAME, "bench@example.com", PASSWORD)
+    db.session.commit()
+
+
+def run(base_url, concurrency, recipe_ids):
+    """Requests/sec, p50 and p99 ms and error count for viewing `recipe_ids`."""
+
+    cookies = requests.post(f"{base_url}/login", data={"username": USERNAME, "password": PASSWORD},
+                            allow_redirects=False).cookies
+    local = threading.local()
+
+    def view(recipe_id):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.cookies.update(cookies)
+        start = time.perf_counter()
+        response = local.session.get(f"{base_url}/recipes/{recipe_id}/info", allow_redirects=False)
+        return time.perf_counter() - start, response.status_code == 200
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(view, recipe_ids))
+        elapsed = time.perf_counter() - start
+
+    ms = [seconds * 1000 for seconds, _ in results]
+    return len(results) / elapsed, percentile(ms, 50), percentile(ms, 99), sum(not ok for _, ok in results)
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    per_setup = concurrency * 4
+
+    stub = StubSpoonacular(latency=latency).start()
+    with app.app_context():
+        load(per_setup * len(SETUPS))
+
+    for n, (worker_class, threads) in enumerate(SETUPS):
+        env = {"SPOONACULAR_BASE_URL": stub.base_url, "GUNICORN_WORKER_CLASS": worker_class,
+               "GUNICORN_THREADS": str(threads)}
+        recipe_ids = range(n * per_setup + 1, (n + 1) * per_setup + 1)
+        with gunicorn("app:create_app(WTF_CSRF_ENABLED=False)", 1, env=env) as base_url:
+            rps, p50, p99, errors = run(base_url, concurrency, recipe_ids)
+        print(f"1 worker {worker_class:<8} threads={threads:<3} {rps:7.1f} req/s  "
+              f"p50={p50:8.1f}ms p99={p99:8.1f}ms errors={errors}")
+    stub.stop()
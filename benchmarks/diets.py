@@ -0,0 +1,49 @@
+"""Diet filter latency: bitmap index vs. a WHERE on the flag columns.
+
+    python -m benchmarks.diets [recipes]
+"""
+
+import itertools
+import sys
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, timed, report
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe  # noqa: E402
+from diet_index import DIETS, diet_index, matching_bitmap, rebuild  # noqa: E402
+
+app = create_app()
+
+RUNS = 200
+PAGE = 48
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        rows = synthetic_recipes(size)
+        while batch := list(itertools.islice(rows, 10_000)):
+            db.session.execute(db.insert(Recipe), batch)
+        db.session.commit()
+
+        diet_index.invalidate()
+        _, elapsed = timed(rebuild)
+        print(f"{size} rows: built bitmaps in {elapsed:.2f}s")
+
+        combos = [(d,) for d in DIETS] + list(itertools.combinations(DIETS, 2))
+        for combo in combos:
+            for match_all in (True, False):
+                label = (" & " if match_all else " | ").join(combo)
+                bitmap_times = [timed(lambda: matching_bitmap(combo, match_all).ids_after(None, PAGE))[1]
+                                for _ in range(RUNS)]
+                flags = [getattr(Recipe, d).is_(True) for d in combo]
+                where = db.and_(*flags) if match_all else db.or_(*flags)
+                sql_times = [timed(lambda: db.session.query(Recipe.id).filter(where)
+                                                     .order_by(Recipe.id).limit(PAGE).all())[1]
+                             for _ in range(RUNS // 10)]
+                report(f"bitmap  {label}", bitmap_times)
+                report(f"sql     {label}", sql_times)
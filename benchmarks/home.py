@@ -0,0 +1,64 @@
+"""Home feed cost for users with many favorites: old two-query feed vs. one query.
+
+    python -m benchmarks.home [recipes] [favorites]
+"""
+
+import sys
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, timed, report
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe, User, Favorites  # noqa: E402
+from pagination import paginate  # noqa: E402
+
+app = create_app()
+
+RUNS = 200
+PAGE = 100
+
+
+def old_feed(user_id):
+    recipes = Recipe.query.limit(PAGE).all()
+    favorite_ids = {fav.recipe_id for fav in Favorites.query.filter_by(user_id=user_id).all()}
+    return [(r.id, r.id in favorite_ids) for r in recipes]
+
+
+def new_feed(user_id):
+    with app.test_request_context():
+        page = paginate(Recipe.with_favorite_flag(user_id), Recipe.id, per_page=PAGE)
+    return [(r.id, r.favorited) for r in page]
+
+
+def load(n_recipes, n_favorites):
+    db.drop_all()
+    db.create_all()
+    rows = list(synthetic_recipes(n_recipes))
+    for i in range(0, len(rows), 10_000):
+        db.session.execute(db.insert(Recipe), rows[i:i + 10_000])
+    user = User(first_name="b", last_name="u", email="b@u.com", username="bench", password="x")
+    db.session.add(user)
+    db.session.flush()
+    favorites = [{"user_id": user.id, "recipe_id": i} for i in range(1, n_favorites + 1)]
+    for i in range(0, len(favorites), 10_000):
+        db.session.execute(db.insert(Favorites), favorites[i:i + 10_000])
+    db.session.commit()
+    return user.id
+
+
+if __name__ == "__main__":
+    n_recipes = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_favorites = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    with app.app_context():
+        user_id = load(n_recipes, n_favorites)
+        assert old_feed(user_id) == new_feed(user_id)
+
+        for label, feed in (("two queries + favorites set", old_feed),
+                            ("single EXISTS query", new_feed)):
+            samples = []
+            for _ in range(RUNS):
+                samples.append(timed(feed, user_id)[1])
+                db.session.expunge_all()
+            report(f"{n_favorites} favs  {label}", samples)
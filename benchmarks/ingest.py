@@ -0,0 +1,54 @@
+"""Rows/sec for storing API search results: per-row session.add vs. upsert.
+
+    python -m benchmarks.ingest [pages] [page_size]
+"""
+
+import sys
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, timed
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe  # noqa: E402
+
+app = create_app()
+
+
+def per_row(pages):
+    for rows in pages:
+        for row in rows:
+            db.session.add(Recipe(id=row["id"], title=row["title"], image=row["image"]))
+        db.session.commit()
+
+
+def upsert(pages):
+    for rows in pages:
+        Recipe.upsert_many(rows)
+        db.session.commit()
+
+
+def make_pages(n_pages, page_size, start_id):
+    rows = [{"id": r["id"], "title": r["title"], "image": r["image"]}
+            for r in synthetic_recipes(n_pages * page_size, start_id=start_id)]
+    return [rows[i:i + page_size] for i in range(0, len(rows), page_size)]
+
+
+if __name__ == "__main__":
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    total = n_pages * page_size
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        _, loop = timed(per_row, make_pages(n_pages, page_size, 1))
+        _, fresh = timed(upsert, make_pages(n_pages, page_size, total + 1))
+        # Re-ingesting the same pages: the old loop raises IntegrityError here.
+        _, repeat = timed(upsert, make_pages(n_pages, page_size, total + 1))
+
+    print(f"{total} rows in pages of {page_size}")
+    print(f"  session.add loop      {total / loop:10.0f} rows/sec")
+    print(f"  upsert (new rows)     {total / fresh:10.0f} rows/sec")
+    print(f"  upsert (duplicates)   {total / repeat:10.0f} rows/sec")
@@ -0,0 +1,66 @@
+"""Logins/sec and page latency during a login storm, per bcrypt executor size.
+
+    python -m benchmarks.login [logins] [rounds]
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, timed, report
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe, User, passwords  # noqa: E402
+
+app = create_app()
+
+CLIENTS = 8
+WORKER_COUNTS = (1, 2, 4)
+
+
+def load(rounds):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(Recipe), list(synthetic_recipes(1000)))
+    passwords.configure(rounds=rounds)
+    for i in range(CLIENTS):
+        User.signup(f"b{i}", f"u{i}", f"bench{i}", f"b{i}@u.com", "password")
+    db.session.commit()
+
+
+def login_storm(n_logins):
+    def log_in(i):
+        with app.test_client() as client:
+            client.post("/login", data={"username": f"bench{i % CLIENTS}", "password": "password"})
+
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        list(pool.map(log_in, range(n_logins)))
+
+
+def browse(stop, samples):
+    with app.test_client() as client:
+        while not stop.is_set():
+            samples.append(timed(client.get, "/recipes")[1])
+
+
+if __name__ == "__main__":
+    n_logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    with app.app_context():
+        load(rounds)
+
+    for workers in WORKER_COUNTS:
+        passwords.configure(rounds=rounds, workers=workers)
+        stop, samples = threading.Event(), []
+        browser = threading.Thread(target=browse, args=(stop, samples))
+        browser.start()
+        _, elapsed = timed(login_storm, n_logins)
+        stop.set()
+        browser.join()
+
+        print(f"{workers} bcrypt workers, cost {rounds}: {n_logins / elapsed:8.1f} logins/sec")
+        report(f"{workers} workers  GET /recipes during storm", samples)
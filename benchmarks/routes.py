@@ -0,0 +1,213 @@
+"""Route throughput and latency, through the Flask test client or a real gunicorn.
+
+    python -m benchmarks.routes                                  # test client, 10k recipes
+    python -m benchmarks.routes --sizes 10000 100000 1000000 --server gunicorn
+    python -m benchmarks.routes --save                           # record new baselines
+
+Spoonacular is replaced by stub_spoonacular with ``--latency`` seconds per
+call.  Results are compared with the stored baselines (``--baselines``);
+a scenario whose p50 or throughput is more than ``--tolerance`` worse is
+listed as a regression and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import requests
+
+from benchmarks.common import (use_scratch_db, synthetic_recipes, gunicorn, percentile,
+                               WORDS)
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe, User, Favorites  # noqa: E402
+import spoonacular  # noqa: E402
+from stub_spoonacular import StubSpoonacular  # noqa: E402
+
+app = create_app(WTF_CSRF_ENABLED=False, SLOW_REQUEST_MS=float("inf"))
+
+USERNAME, PASSWORD = "bench", "benchmark"
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+BATCH = 10_000
+
+
+def seed(size):
+    """`size` recipes, one user with `size // 10` favorites."""
+
+    db.drop_all()
+    db.create_all()
+    rows = synthetic_recipes(size)
+    while True:
+        batch = [r for _, r in zip(range(BATCH), rows)]
+        if not batch:
+            break
+        db.session.execute(db.insert(Recipe), batch)
+
+    user = User.signup("bench", "user", USERNAME, "bench@example.com", PASSWORD)
+    db.session.flush()
+    favorites = [{"user_id": user.id, "recipe_id": i} for i in range(1, size // 10 + 1)]
+    for i in range(0, len(favorites), BATCH):
+        db.session.execute(db.insert(Favorites), favorites[i:i + BATCH])
+    db.session.commit()
+
+
+def scenarios(size):
+    """name -> function(rng, i) returning ``(method, path, form data)``."""
+
+    return {
+        "home": lambda rng, i: ("GET", "/", None),
+        "search": lambda rng, i: ("GET", f"/recipes?q={'+'.join(rng.sample(WORDS, 2))}", None),
+        "search-api": lambda rng, i: ("GET", f"/recipes?q=zz{rng.random():.12f}", None),
+        "favorites": lambda rng, i: ("GET", "/favorites", None),
+        "toggle": lambda rng, i: ("POST", f"/api/recipes/{rng.randint(1, size)}/favorite", None),
+        "login": lambda rng, i: ("POST", "/login", {"username": USERNAME, "password": PASSWORD}),
+    }
+
+
+class TestClientDriver:
+    """Requests through app.test_client(), in this process."""
+
+    name = "client"
+
+    def client(self):
+        client = app.test_client()
+        client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+        return client
+
+    def request(self, client, method, path, data):
+        return client.open(path, method=method, data=data).status_code
+
+
+class GunicornDriver:
+    """Requests over HTTP to a gunicorn serving the same database."""
+
+    name = "gunicorn"
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def client(self):
+        client = requests.Session()
+        client.post(f"{self.base_url}/login", data={"username": USERNAME, "password": PASSWORD},
+                    allow_redirects=False)
+        return client
+
+    def request(self, client, method, path, data):
+        return client.request(method, f"{self.base_url}{path}", data=data,
+                              allow_redirects=False).status_code
+
+
+def run(driver, make_request, requests_, concurrency, warmup=5):
+    """Latency samples and requests/sec for `requests_` calls on `concurrency` threads."""
+
+    local = threading.local()
+
+    def call(i):
+        if not hasattr(local, "client"):
+            local.client = driver.client()
+            local.rng = random.Random(threading.get_ident())
+        method, path, data = make_request(local.rng, i)
+        start = time.perf_counter()
+        status = driver.request(local.client, method, path, data)
+        return time.perf_counter() - start, status < 400
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(call, range(warmup)))
+        start = time.perf_counter()
+        results = list(pool.map(call, range(requests_)))
+        elapsed = time.perf_counter() - start
+
+    ms = [seconds * 1000 for seconds, _ in results]
+    return {
+        "rps": round(requests_ / elapsed, 1),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "errors": sum(1 for _, ok in results if not ok),
+    }
+
+
+def regressions(results, baselines, tolerance):
+    found = []
+    for key, result in results.items():
+        base = baselines.get(key)
+        if not base:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            found.append(f"{key}: p50 {base['p50_ms']}ms -> {result['p50_ms']}ms")
+        if result["rps"] < base["rps"] / (1 + tolerance):
+            found.append(f"{key}: {base['rps']} -> {result['rps']} req/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--server", choices=("client", "gunicorn"), default="client")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub API seconds per call")
+    parser.add_argument("--only", nargs="+", help="run just these scenarios")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save", action="store_true", help="store results as the new baselines")
+    args = parser.parse_args()
+
+    stub = StubSpoonacular(latency=args.latency).start()
+    spoonacular.BASE_URL = stub.base_url
+    results = {}
+
+    for size in args.sizes:
+        with app.app_context():
+            seed(size)
+        spoonacular.search_cache.clear()
+
+        if args.server == "gunicorn":
+            target = "app:create_app(WTF_CSRF_ENABLED=False)"
+            server = gunicorn(target, args.workers, env={"SPOONACULAR_BASE_URL": stub.base_url})
+        else:
+            server = nullcontext()
+
+        with server as base_url:
+            driver = GunicornDriver(base_url) if base_url else TestClientDriver()
+            for name, make_request in scenarios(size).items():
+                if args.only and name not in args.only:
+                    continue
+                result = run(driver, make_request, args.requests, args.concurrency)
+                key = f"{driver.name}/{size}/{name}"
+                results[key] = result
+                print(f"{key:<32} {result['rps']:9.1f} req/s  p50={result['p50_ms']:8.2f}ms "
+                      f"p95={result['p95_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms "
+                      f"errors={result['errors']}")
+    stub.stop()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+        return 0
+
+    found = regressions(results, baselines, args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
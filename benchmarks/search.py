@@ -0,0 +1,61 @@
+"""Search latency at growing table sizes: indexed search vs. ILIKE '%q%'.
+
+    python -m benchmarks.search                 # 10k, 100k and 1M rows
+    python -m benchmarks.search 10000 50000     # custom sizes
+"""
+
+import random
+import sys
+
+from benchmarks.common import use_scratch_db, synthetic_recipes, timed, report, WORDS
+
+use_scratch_db()
+
+from app import create_app  # noqa: E402
+from models import db, Recipe  # noqa: E402
+from search import search_recipes, title_index  # noqa: E402
+
+app = create_app()
+
+
+SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = 200
+BATCH = 10_000
+
+
+def load(size):
+    db.drop_all()
+    db.create_all()
+    rows = synthetic_recipes(size)
+    while True:
+        batch = [r for _, r in zip(range(BATCH), rows)]
+        if not batch:
+            break
+        db.session.execute(db.insert(Recipe), batch)
+    db.session.commit()
+
+
+def run(size):
+    load(size)
+    rng = random.Random(size)
+    queries = [" ".join(rng.sample(WORDS, rng.randint(1, 2))) for _ in range(QUERIES)]
+
+    if db.engine.dialect.name != "postgresql":
+        title_index.invalidate()
+        _, elapsed = timed(search_recipes, queries[0])
+        print(f"{size:>9} rows: built inverted index in {elapsed:.2f}s")
+
+    indexed, scans = [], []
+    for q in queries:
+        indexed.append(timed(search_recipes, q, per_page=24)[1])
+        scans.append(timed(lambda: Recipe.query.filter(Recipe.title.ilike(f"%{q}%")).all())[1])
+
+    report(f"{size:>9} rows  search_recipes", indexed)
+    report(f"{size:>9} rows  ILIKE scan", scans)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    with app.app_context():
+        for size in sizes:
+            run(size)
@@ -0,0 +1,46 @@
+"""Startup cost: ``import app``, ``create_app`` per profile, and gunicorn worker boot.
+
+    python -m benchmarks.startup [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_scratch_db, gunicorn, report
+
+use_scratch_db()
+
+PROFILES = ("production", "development")
+
+IMPORT = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+CREATE = ("import time; t = time.perf_counter(); import app; app.create_app({profile!r}); "
+          "print(time.perf_counter() - t)")
+
+
+def in_fresh_interpreter(code):
+    """Seconds printed by `code` run in a new Python process."""
+
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True, env=os.environ)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def worker_boot(profile):
+    """Seconds from launching gunicorn until the first page is served."""
+
+    start = time.perf_counter()
+    with gunicorn(f"app:create_app({profile!r})"):
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    report("import app", [in_fresh_interpreter(IMPORT) for _ in range(runs)])
+    for profile in PROFILES:
+        report(f"import + create_app({profile!r})",
+               [in_fresh_interpreter(CREATE.format(profile=profile)) for _ in range(runs)])
+    for profile in PROFILES:
+        report(f"gunicorn boot, {profile}", [worker_boot(profile) for _ in range(runs)])
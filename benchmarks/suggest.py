@@ -0,0 +1,78 @@
+"""Autocomplete latency and memory of the prefix index.
+
+    python -m benchmarks.suggest [titles] [vocabulary]
+
+Titles mix the bulk-load words with a long tail of made-up words (drawn
+with a Zipf-like skew), so the index sees a realistic vocabulary size
+rather than the few dozen words of bulk_load.WORDS.
+"""
+
+import itertools
+import random
+import string
+import sys
+import tracemalloc
+
+from benchmarks.common import WORDS, timed, report
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from suggest import PrefixIndex, suggest_index  # noqa: E402
+
+RUNS = 2000
+
+
+def vocabulary(size, rng):
+    made_up = {"".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+               for _ in range(size)}
+    return list(WORDS) + sorted(made_up)
+
+
+def titles(count, vocab, rng):
+    # Low ranks (the real recipe words first) are picked far more often.
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    for _ in range(count):
+        yield " ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(2, 5))).title(), 1
+
+
+def prefixes(vocab, rng, length):
+    return [w[:length] for w in rng.choices(vocab, k=RUNS) if len(w) >= length]
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    vocab_size = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    rng = random.Random(0)
+    vocab = vocabulary(vocab_size, rng)
+    rows = list(titles(size, vocab, rng))
+
+    index = PrefixIndex()
+    tracemalloc.start()
+    _, elapsed = timed(index.build, rows)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{size} titles: {len(index)} words indexed in {elapsed:.2f}s, "
+          f"{retained / 2 ** 20:.1f} MiB retained")
+
+    for length in (1, 2, 3, 4, 6):
+        sample = prefixes(vocab, rng, length)
+        cold = [timed(index.complete, p)[1] for p in sample]
+        warm = [timed(index.complete, p)[1] for p in sample]
+        report(f"complete, {length}-letter prefix, first", cold)
+        report(f"complete, {length}-letter prefix, again", warm)
+    print(f"memoized prefixes: {index.stats()['memoized']}")
+
+    new_titles = [title for title, _ in titles(RUNS, vocab + [f"novel{n}" for n in range(RUNS)], rng)]
+    report("add title", [timed(index.add, t)[1] for t in new_titles])
+    report("remove title", [timed(index.remove, t)[1] for t in new_titles])
+
+    # End to end through Flask (JSON and routing included), on the same index.
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        suggest_index.build(rows)
+        client = app.test_client()
+        sample = prefixes(vocab, rng, 3)
+        report("GET /recipes/suggest",
+               [timed(client.get, "/recipes/suggest", query_string={"prefix": f"spicy {p}"})[1]
+                for p in sample])
@@ -0,0 +1,221 @@
+"""Bulk loading of recipes, users and favorites for production-sized datasets.
+
+Rows come from generators (synthetic data or a JSONL file) and are streamed
+to the database in batches: ``COPY ... FROM STDIN`` on Postgres, batched
+executemany elsewhere.  A fresh load drops the secondary indexes first and
+builds them once at the end, which is much cheaper than maintaining them row
+by row.
+"""
+
+import io
+import json
+import random
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import func, text
+
+from models import db, Recipe, User, Favorites, RECIPE_SEARCH_INDEXES
+from id_allocator import USER_RECIPE_ID_START
+
+
+BATCH_SIZE = 50_000
+
+WORDS = (
+    "chicken beef pork tofu shrimp salmon noodle rice pasta soup stew salad "
+    "curry taco burrito pizza sandwich wrap bowl roasted grilled baked fried "
+    "spicy creamy garlic lemon honey ginger tomato mushroom spinach avocado "
+    "cheese potato sweet sour smoky herb chili coconut vegan keto quick easy"
+).split()
+
+
+def random_title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+
+
+def synthetic_recipes(count, start_id=1, seed=0):
+    """Yield ``count`` recipe row dicts with random titles and diet flags."""
+
+    rng = random.Random(seed)
+    for recipe_id in range(start_id, start_id + count):
+        yield {
+            "id": recipe_id,
+            "title": random_title(rng),
+            "image": f"https://img.example.com/{recipe_id}.jpg",
+            "vegetarian": rng.random() < 0.3,
+            "vegan": rng.random() < 0.1,
+            "ketogenic": rng.random() < 0.15,
+        }
+
+
+def recipes_from_jsonl(path):
+    """Yield recipe rows from a file of Spoonacular recipe objects, one per line."""
+
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            info = json.loads(line)
+            yield {
+                "id": info["id"],
+                "title": info["title"],
+                "image": info.get("image", ""),
+                "vegetarian": info.get("vegetarian", False),
+                "vegan": info.get("vegan", False),
+                "ketogenic": info.get("ketogenic", False),
+            }
+
+
+def synthetic_users(count, start_id=1, password_hash=""):
+    """Yield ``count`` user rows; they all share `password_hash`."""
+
+    for user_id in range(start_id, start_id + count):
+        yield {
+            "id": user_id,
+            "first_name": f"First{user_id}",
+            "last_name": f"Last{user_id}",
+            "email": f"user{user_id}@example.com",
+            "username": f"user{user_id}",
+            "password": password_hash,
+        }
+
+
+def synthetic_favorites(user_ids, recipe_ids, count, seed=0):
+    """Yield about ``count`` favorites spread evenly over `user_ids`.
+
+    Each user favorites distinct recipes picked from the `recipe_ids` list.
+    """
+
+    rng = random.Random(seed)
+    if not user_ids or not recipe_ids:
+        return
+    per_user, extra = divmod(count, len(user_ids))
+    for n, user_id in enumerate(user_ids):
+        k = min(per_user + (n < extra), len(recipe_ids))
+        for recipe_id in rng.sample(recipe_ids, k):
+            yield {"user_id": user_id, "recipe_id": recipe_id}
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _copy(connection, table, columns, batch):
+    buf = io.StringIO()
+    for row in batch:
+        buf.write("\t".join(_copy_value(row.get(c)) for c in columns))
+        buf.write("\n")
+    buf.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buf)
+    finally:
+        cursor.close()
+
+
+def load_rows(model, rows, batch_size=BATCH_SIZE):
+    """Insert the dicts from `rows` into `model`'s table, committing each batch.
+
+    Returns the number of rows loaded.
+    """
+
+    table = model.__table__
+    postgres = db.engine.dialect.name == "postgresql"
+    loaded = 0
+    rows = iter(rows)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            return loaded
+        connection = db.session.connection()
+        if postgres:
+            _copy(connection, table, list(batch[0]), batch)
+        else:
+            connection.execute(table.insert(), batch)
+        db.session.commit()
+        loaded += len(batch)
+
+
+def timed_load(model, rows, batch_size=BATCH_SIZE):
+    """``load_rows`` plus a rows/sec line on stdout."""
+
+    start = time.perf_counter()
+    loaded = load_rows(model, rows, batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"{model.__tablename__:>10}: {loaded:>10,} rows in {elapsed:7.2f}s "
+          f"({loaded / elapsed if elapsed else 0:,.0f} rows/sec)")
+    return loaded
+
+
+@contextmanager
+def deferred_indexes():
+    """Drop secondary (non-unique) indexes for the block and build them after it.
+
+    They are rebuilt even if the block fails, after rolling back its open
+    transaction (whose locks would block the builds).
+    """
+
+    postgres = db.engine.dialect.name == "postgresql"
+    tables = [Recipe.__table__, User.__table__, Favorites.__table__]
+    indexes = [index for table in tables for index in table.indexes if not index.unique]
+
+    with db.engine.begin() as conn:
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+        if postgres:
+            for name in RECIPE_SEARCH_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    try:
+        yield
+    except BaseException:
+        db.session.rollback()
+        raise
+    finally:
+        start = time.perf_counter()
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.create(conn, checkfirst=True)
+            if postgres:
+                for ddl in RECIPE_SEARCH_INDEXES.values():
+                    conn.execute(text(ddl))
+        print(f"Built indexes in {time.perf_counter() - start:.2f}s")
+
+
+def _max_id(model):
+    query = db.session.query(func.max(model.id))
+    if model is Recipe:
+        # Ids from USER_RECIPE_ID_START up belong to id_allocator.
+        query = query.filter(Recipe.id < USER_RECIPE_ID_START)
+    return query.scalar() or 0
+
+
+def next_id(model, count=0):
+    """One past the largest id in `model`'s table, the first of `count` new ids.
+
+    For recipes only ids below USER_RECIPE_ID_START count, and a ValueError
+    is raised if `count` ids from there would run into that range.
+    """
+
+    start = _max_id(model) + 1
+    if model is Recipe and start + count > USER_RECIPE_ID_START:
+        raise ValueError(f"{count} recipes from id {start} would reach the user recipe "
+                         f"ids at {USER_RECIPE_ID_START}")
+    return start
+
+
+def reset_sequences():
+    """Move Postgres serial sequences past the ids loaded explicitly."""
+
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in (Recipe, User, Favorites):
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+            f":next_id, false)"), {"next_id": _max_id(model) + 1})
+    db.session.commit()
@@ -0,0 +1,192 @@
+"""Two-tier TTL cache with per-key request coalescing.
+
+The first tier is a bounded in-process LRU.  The optional second tier is
+the ``api_cache`` table, so entries survive restarts and are shared by all
+gunicorn workers.  Concurrent misses for the same key are coalesced: one
+caller (the leader) computes the value while the others wait for it.
+
+With `stale_after`, entries older than that are reported stale by
+``lookup`` but kept until the ttl, so callers can serve them while a
+refresh runs (stale-while-revalidate).
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ApiCacheEntry
+
+
+class _Flight:
+    """An in-progress computation that followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """LRU + database cache for JSON-serializable values."""
+
+    def __init__(self, maxsize=256, ttl=3600, persistent=True, stale_after=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def stats(self):
+        """Counters for monitoring."""
+
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+            }
+
+    def clear(self):
+        """Empty the memory tier and reset counters (the table is kept)."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.db_hits = self.misses = 0
+            self.evictions = self.coalesced = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or None."""
+
+        value = self._get_memory(key)
+        if value is None and self.persistent:
+            value = self._get_db(key)
+        return value
+
+    def lookup(self, key):
+        """``(value, stale)`` for `key`; the value is None on a miss."""
+
+        value = self.get(key)
+        if value is None:
+            return None, False
+        if self.stale_after is None:
+            return value, False
+        with self._lock:
+            entry = self._entries.get(key)
+        stored_at = entry[1] - self.ttl if entry else 0
+        return value, time.time() >= stored_at + self.stale_after
+
+    def get_or_set(self, key, compute):
+        """Return the value for `key`, calling `compute()` at most once on a miss.
+
+        `compute` may return None to signal "don't cache this"; errors are
+        re-raised in every caller waiting on the same key.  Only the memory
+        tier is read.
+        """
+
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            with self._lock:
+                self.misses += 1
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, value, expires_at)
+        if self.persistent:
+            self._set_db(key, value, expires_at)
+
+    def discard(self, key):
+        """Forget `key` in this process (the database tier is left alone)."""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _set_memory(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_db(self, key):
+        # Use our own connection so the request's session transaction is untouched.
+        table = ApiCacheEntry.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                db.select(table.c.value, table.c.expires_at).where(table.c.key == key)
+            ).first()
+        if row is None or row.expires_at <= time.time():
+            return None
+
+        value = json.loads(row.value)
+        self._set_memory(key, value, row.expires_at)
+        with self._lock:
+            self.db_hits += 1
+        return value
+
+    def _set_db(self, key, value, expires_at):
+        table = ApiCacheEntry.__table__
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.delete().where(
+                    (table.c.key == key) | (table.c.expires_at <= time.time())))
+                conn.execute(table.insert().values(
+                    key=key, value=json.dumps(value), expires_at=expires_at))
+        except IntegrityError:
+            # Another worker stored the same key first; theirs is just as good.
+            pass
@@ -0,0 +1,82 @@
+"""Conditional GET: strong ETags, Last-Modified and 304 responses.
+
+Views compute their validators from data they already have (a recipe's
+``updated_at``, the rows of a listing page) and call ``respond`` with a
+render callback; when the client's ``If-None-Match`` / ``If-Modified-Since``
+still match, the 304 goes out without rendering anything.
+"""
+
+import hashlib
+import os
+from datetime import timezone
+
+from flask import current_app, g, make_response, request, session
+
+
+def template_version(app):
+    """Digest of the templates and asset manifest, so a deploy changing either changes every ETag."""
+
+    digest = hashlib.sha1(repr(sorted(app.extensions.get("assets", {}).items())).encode())
+    folder = os.path.join(app.root_path, app.template_folder)
+    for root, _, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(name.encode())
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def init_app(app):
+    app.config.setdefault("TEMPLATE_VERSION", template_version(app))
+
+
+def make_etag(*parts):
+    """Strong ETag value for a response determined by `parts`.
+
+    Pages differ for anonymous and logged-in visitors, so that is mixed in.
+    """
+
+    digest = hashlib.sha1(current_app.config["TEMPLATE_VERSION"].encode())
+    digest.update(repr((bool(g.get("user")), parts)).encode())
+    return digest.hexdigest()[:32]
+
+
+def cache_control(response):
+    """Shared caches may keep anonymous pages; logged-in ones must revalidate."""
+
+    if g.get("user"):
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get("ANON_MAX_AGE", 60)
+    return response
+
+
+def respond(etag, last_modified, render):
+    """A 304 if the client's copy is current, else ``render()`` with validators.
+
+    `last_modified` is a naive UTC datetime or None.  Pages with pending
+    flash messages are never answered with a 304 since rendering consumes
+    the messages.
+    """
+
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+
+    if "_flashes" not in session and _matches(etag, last_modified):
+        response = make_response("", 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return cache_control(response)
+
+
+def _matches(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
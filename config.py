@@ -0,0 +1,105 @@
+"""Configuration profiles for ``create_app``.
+
+Pick one with ``create_app("development")`` or the ``YUMMPY_CONFIG``
+environment variable; production is the default.
+"""
+
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv() # Load the .env file
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('SUPABASE_DB_URL', "postgresql:///foodrecipe_db")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = False
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    DEBUG_TB_ENABLED = False
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 48))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2))
+    # Per worker; keep workers * (size + overflow) under the server's connection cap.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 300))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') != '0'
+    # Required in the X-Internal-Token header of /internal/* requests; unset
+    # means loopback only.
+    INTERNAL_TOKEN = os.getenv('INTERNAL_TOKEN')
+    # Per-request profiling (profiler.py).
+    PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', '1') != '0'
+    # The Server-Timing header shows anyone the request's query counts and
+    # timings; off unless asked for (on in development).
+    SERVER_TIMING = os.getenv('SERVER_TIMING', '0') != '0'
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+    # Seconds shared caches may serve anonymous pages without revalidating.
+    ANON_MAX_AGE = int(os.getenv('ANON_MAX_AGE', 60))
+    # Thumbnail proxy for recipe images (images.py); the cache directory is
+    # shared by all workers.
+    IMAGE_PROXY = os.getenv('IMAGE_PROXY', '1') != '0'
+    IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'yummpy-images'))
+    IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 1024 ** 3))
+    IMAGE_WIDTHS = (160, 320, 640)
+    # Let the proxy fetch from loopback/private addresses (a local stub origin).
+    IMAGE_ALLOW_PRIVATE = False
+    # Spoonacular ingredients/steps/nutrition on the detail page (details.py).
+    RECIPE_DETAILS = os.getenv('RECIPE_DETAILS', '1') != '0'
+    DETAIL_PREFETCH = os.getenv('DETAIL_PREFETCH', '1') != '0'
+    DETAIL_MAX_AGE = int(os.getenv('DETAIL_MAX_AGE', 7 * 24 * 3600))
+    # After a failed fetch, seconds before the same recipes are queued again.
+    DETAIL_RETRY_AFTER = float(os.getenv('DETAIL_RETRY_AFTER', 300))
+    # Background job threads per worker (jobs.py), and how long a search with
+    # nothing local or cached waits for its API job before answering.
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    SEARCH_WAIT = float(os.getenv('SEARCH_WAIT', 1.0))
+    # After a failed search job, seconds to report the error instead of retrying.
+    SEARCH_RETRY_AFTER = float(os.getenv('SEARCH_RETRY_AFTER', 30))
+    # Seconds before the autocomplete index (suggest.py) is rebuilt in the
+    # background to pick up favorites and other workers' writes.
+    SUGGEST_MAX_AGE = int(os.getenv('SUGGEST_MAX_AGE', 3600))
+    # Queue the first build as the app starts (off for scripts that rebuild tables).
+    SUGGEST_WARM = os.getenv('SUGGEST_WARM', '1') != '0'
+    # The same for the diet bitmaps (diet_index.py).
+    DIET_INDEX_MAX_AGE = int(os.getenv('DIET_INDEX_MAX_AGE', 300))
+    DIET_INDEX_WARM = os.getenv('DIET_INDEX_WARM', '1') != '0'
+
+
+class DevelopmentConfig(Config):
+    """Every query logged; the debug toolbar and Server-Timing headers on."""
+
+    DEBUG = True
+    SQLALCHEMY_ECHO = True
+    DEBUG_TB_ENABLED = True
+    DEBUG_TB_INTERCEPT_REDIRECTS = False
+    SERVER_TIMING = True
+
+
+class TestingConfig(Config):
+    """In-memory SQLite and cheap password hashes; never the real database."""
+
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', "sqlite://")
+    SECRET_KEY = "test"
+    BCRYPT_LOG_ROUNDS = 4
+    # Never call the real API; tests that want details point it at a stub.
+    RECIPE_DETAILS = False
+    # Background jobs only run when a test calls jobs.queue.drain().
+    JOB_WORKERS = 0
+    SEARCH_WAIT = 0
+
+
+class ProductionConfig(Config):
+    pass
+
+
+PROFILES = {
+    "development": DevelopmentConfig,
+    "testing": TestingConfig,
+    "production": ProductionConfig,
+}
@@ -0,0 +1,108 @@
+"""Connection pool settings and per-worker pool metrics.
+
+Every gunicorn worker has its own pool, so the hosted Postgres sees up to
+``workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)`` connections.  Connections
+are recycled before the server's idle timeout and pinged on checkout so a
+worker that sat idle doesn't hand out dead connections.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from latency import percentile_ms
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection."""
+
+    on_wait = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            if self.on_wait:
+                self.on_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.on_wait:
+            self.on_wait(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.on_wait = self.on_wait
+        return pool
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings.
+
+    SQLite in-memory databases use a single static connection, so only
+    pre-ping applies to them.
+    """
+
+    options = {"pool_pre_ping": config.get("DB_POOL_PRE_PING", True)}
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=config.get("DB_POOL_SIZE", 5),
+        max_overflow=config.get("DB_MAX_OVERFLOW", 5),
+        pool_timeout=config.get("DB_POOL_TIMEOUT", 10),
+        pool_recycle=config.get("DB_POOL_RECYCLE", 300),
+    )
+    return options
+
+
+class PoolMetrics:
+    """Checkout, wait and churn counters for one engine's pool."""
+
+    def __init__(self, engine, window=1000):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self._counts = dict.fromkeys(
+            ("connects", "closes", "invalidations", "checkouts", "timeouts"), 0)
+
+        for name, key in (("connect", "connects"), ("close", "closes"),
+                          ("close_detached", "closes"), ("invalidate", "invalidations"),
+                          ("checkout", "checkouts")):
+            event.listen(engine.pool, name, self._counter(key))
+        engine.pool.on_wait = self._record_wait
+
+    def _counter(self, key):
+        def count(*args):
+            with self._lock:
+                self._counts[key] += 1
+        return count
+
+    def _record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self._waits.append(seconds)
+            if timed_out:
+                self._counts["timeouts"] += 1
+
+    def snapshot(self):
+        """Pool state and counters for this worker, wait times in milliseconds."""
+
+        pool = self.engine.pool
+        with self._lock:
+            waits = sorted(self._waits)
+            result = dict(self._counts, pid=os.getpid(), pool=type(pool).__name__)
+
+        if isinstance(pool, QueuePool):
+            result.update(size=pool.size(), checked_out=pool.checkedout(),
+                          idle=pool.checkedin(), overflow=max(0, pool.overflow()))
+        for name, pct in (("wait_p50_ms", 50), ("wait_p95_ms", 95), ("wait_p99_ms", 99)):
+            result[name] = percentile_ms(waits, pct, digits=3)
+        result["wait_max_ms"] = round(waits[-1] * 1000, 3) if waits else None
+        return result
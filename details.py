@@ -0,0 +1,146 @@
+"""Recipe details (ingredients, steps, nutrition) from Spoonacular, kept locally.
+
+The first view of an API recipe fetches ``/recipes/{id}/information`` and
+stores a compact subset in ``recipe_details``; later views only read that
+row.  Details older than DETAIL_MAX_AGE are still shown but refreshed by a
+background job (jobs.py), and listing pages queue an informationBulk
+prefetch for the recipes on them that have none yet.  Only recipes
+ingested from the API (``Recipe.from_api``) are fetched; user-created
+ones, seed placeholders and synthetic rows have nothing upstream.
+"""
+
+import threading
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, RecipeDetail, utcnow
+import jobs
+import spoonacular
+
+
+CHUNK_SIZE = 50  # ids per informationBulk call
+
+# Nutrients worth showing on the detail page; Spoonacular sends ~30.
+NUTRIENTS = ("Calories", "Fat", "Saturated Fat", "Carbohydrates", "Sugar", "Fiber",
+             "Protein", "Sodium")
+
+
+def compact(info):
+    """The parts of an information response the detail page shows."""
+
+    nutrients = (info.get("nutrition") or {}).get("nutrients") or []
+    return {
+        "ready_in_minutes": info.get("readyInMinutes"),
+        "servings": info.get("servings"),
+        "ingredients": [i.get("original") or i.get("name", "")
+                        for i in info.get("extendedIngredients") or []],
+        "steps": [step["step"] for block in info.get("analyzedInstructions") or []
+                  for step in block.get("steps", [])],
+        "nutrition": [[n["name"], n["amount"], n["unit"]]
+                      for n in nutrients if n.get("name") in NUTRIENTS],
+    }
+
+
+def store(infos):
+    """Save information responses as details and commit."""
+
+    RecipeDetail.upsert_many([{"recipe_id": info["id"], "data": compact(info)} for info in infos])
+    db.session.commit()
+
+
+def _enabled():
+    return current_app.config.get("RECIPE_DETAILS", True)
+
+
+def _cutoff():
+    return utcnow() - timedelta(seconds=current_app.config.get("DETAIL_MAX_AGE", 7 * 24 * 3600))
+
+
+# Recipe id -> the queued job that will fetch it, so overlapping pages
+# don't fetch the same recipes twice.
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+@jobs.queue.handler("details", expected=(spoonacular.SpoonacularError,))
+def fetch_details(recipe_ids):
+    """Job: fetch and store details for `recipe_ids`, in informationBulk chunks."""
+
+    try:
+        for i in range(0, len(recipe_ids), CHUNK_SIZE):
+            store(spoonacular.recipe_information_bulk(recipe_ids[i:i + CHUNK_SIZE], nutrition=True))
+    finally:
+        with _pending_lock:
+            for recipe_id in recipe_ids:
+                _pending.pop(recipe_id, None)
+
+
+def _failing(key):
+    """Whether a details job for `key` would only fail again right now."""
+
+    if spoonacular.breaker.state == "open":
+        return True
+    age = jobs.queue.last_failure("details", key)
+    return age is not None and age < current_app.config.get("DETAIL_RETRY_AFTER", 300)
+
+
+def refresh(recipe_ids):
+    """Queue a background fetch of details for the `recipe_ids` not already queued.
+
+    Skipped while the API is failing for these recipes.
+    """
+
+    with _pending_lock:
+        # A job dropped from the queue without running counts as done.
+        ids = sorted(i for i in set(recipe_ids)
+                     if i not in _pending or _pending[i].done.is_set())
+        if not ids or _failing(tuple(ids)):
+            return
+        job = jobs.queue.enqueue("details", tuple(ids), ids)
+        for recipe_id in ids:
+            _pending[recipe_id] = job
+
+
+def for_recipe(recipe):
+    """The details of `recipe`, fetched now if this is its first view.
+
+    Stale details are returned as they are and refreshed in the background.
+    None for recipes not from the API, or when the API can't be reached.
+    """
+
+    detail = recipe.detail
+    if not recipe.from_api or not _enabled():
+        return detail
+    if detail is not None:
+        if detail.fetched_at < _cutoff():
+            refresh([recipe.id])
+        return detail
+
+    recipe_id = recipe.id
+    # `recipe` is fully loaded; give the connection back while the API call runs.
+    db.session.close()
+    try:
+        store([spoonacular.recipe_information(recipe_id, nutrition=True)])
+    except (spoonacular.SpoonacularError, SQLAlchemyError) as e:
+        db.session.rollback()
+        current_app.logger.warning("Details for recipe %s not fetched: %s", recipe_id, e)
+        return None
+    return db.session.get(RecipeDetail, recipe_id)
+
+
+def prefetch(recipes):
+    """Queue a fetch for the API recipes among `recipes` with missing or stale details."""
+
+    if not _enabled() or not current_app.config.get("DETAIL_PREFETCH", True):
+        return
+    ids = [r.id for r in recipes if r.from_api]
+    if not ids:
+        return
+    fresh = set(db.session.scalars(
+        db.select(RecipeDetail.recipe_id)
+        .where(RecipeDetail.recipe_id.in_(ids), RecipeDetail.fetched_at >= _cutoff())))
+    missing = [i for i in ids if i not in fresh]
+    if missing:
+        refresh(missing)
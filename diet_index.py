@@ -0,0 +1,313 @@
+"""In-process bitmap index over the recipe diet flags.
+
+Each diet (vegetarian, vegan, ketogenic) is a bitmap of recipe ids made
+of big-int bitset chunks, so AND/OR combinations are a handful of integer
+operations instead of a table scan.
+
+The index is only built by a background job (jobs.py), queued when the
+app starts (DIET_INDEX_WARM) and whenever a lookup finds it missing or
+older than DIET_INDEX_MAX_AGE seconds; an old index keeps answering while
+it is rebuilt, and until the first build finishes lookups read the
+matching ids from the flag columns instead.  ORM events keep it current
+between builds.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+
+from models import db, Recipe, invalidate_on_bulk_write
+from pagination import AFTER, BEFORE, decode_cursor, make_page
+import jobs
+
+
+DIETS = ("vegetarian", "vegan", "ketogenic")
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# Bits are read out through small windows so each step works on a short int.
+WINDOW_BITS = 512
+WINDOW_MASK = (1 << WINDOW_BITS) - 1
+
+
+def _lowest_bits(bits, limit):
+    """Positions of the `limit` lowest set bits, ascending."""
+
+    positions = []
+    offset = 0
+    while bits and len(positions) < limit:
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        offset += skip
+        window = bits & WINDOW_MASK
+        while window and len(positions) < limit:
+            low = window & -window
+            positions.append(offset + low.bit_length() - 1)
+            window ^= low
+        bits >>= WINDOW_BITS
+        offset += WINDOW_BITS
+    return positions
+
+
+def _highest_bits(bits, limit):
+    """Positions of the `limit` highest set bits, descending."""
+
+    positions = []
+    while bits and len(positions) < limit:
+        start = max(0, bits.bit_length() - WINDOW_BITS)
+        window = bits >> start
+        while window and len(positions) < limit:
+            top = window.bit_length() - 1
+            positions.append(start + top)
+            window ^= 1 << top
+        bits &= (1 << start) - 1
+    return positions
+
+
+class Bitmap:
+    """A set of non-negative ints stored as bitset chunks of 2**16 ids.
+
+    Chunking keeps sparse id ranges cheap while dense ranges stay plain
+    big-int bitsets.
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or {}
+
+    @classmethod
+    def from_ids(cls, ids):
+        buffers = {}
+        for i in ids:
+            buf = buffers.get(i >> CHUNK_BITS)
+            if buf is None:
+                buf = buffers[i >> CHUNK_BITS] = bytearray(1 << (CHUNK_BITS - 3))
+            low = i & CHUNK_MASK
+            buf[low >> 3] |= 1 << (low & 7)
+        return cls({k: int.from_bytes(b, "little") for k, b in buffers.items()})
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def __contains__(self, i):
+        return bool(self.chunks.get(i >> CHUNK_BITS, 0) >> (i & CHUNK_MASK) & 1)
+
+    def __len__(self):
+        return sum(bin(bits).count("1") for bits in self.chunks.values())
+
+    def add(self, i):
+        key = i >> CHUNK_BITS
+        self.chunks[key] = self.chunks.get(key, 0) | 1 << (i & CHUNK_MASK)
+
+    def discard(self, i):
+        key = i >> CHUNK_BITS
+        bits = self.chunks.get(key, 0) & ~(1 << (i & CHUNK_MASK))
+        if bits:
+            self.chunks[key] = bits
+        else:
+            self.chunks.pop(key, None)
+
+    def copy(self):
+        return Bitmap(dict(self.chunks))
+
+    def __and__(self, other):
+        chunks = {}
+        for key, bits in self.chunks.items():
+            both = bits & other.chunks.get(key, 0)
+            if both:
+                chunks[key] = both
+        return Bitmap(chunks)
+
+    def __or__(self, other):
+        chunks = dict(self.chunks)
+        for key, bits in other.chunks.items():
+            chunks[key] = chunks.get(key, 0) | bits
+        return Bitmap(chunks)
+
+    def ids_after(self, after, limit):
+        """The `limit` smallest ids greater than `after` (None: from the start)."""
+
+        ids = []
+        for key in sorted(self.chunks):
+            base = key << CHUNK_BITS
+            bits = self.chunks[key]
+            if after is not None:
+                if base + CHUNK_MASK <= after:
+                    continue
+                if after >= base:
+                    shift = after - base + 1
+                    bits = bits >> shift << shift
+            ids.extend(base + i for i in _lowest_bits(bits, limit - len(ids)))
+            if len(ids) >= limit:
+                break
+        return ids
+
+    def ids_before(self, before, limit):
+        """The `limit` largest ids smaller than `before`, largest first."""
+
+        ids = []
+        for key in sorted(self.chunks, reverse=True):
+            base = key << CHUNK_BITS
+            if base >= before:
+                continue
+            bits = self.chunks[key]
+            if before - base <= CHUNK_MASK:
+                bits &= (1 << (before - base)) - 1
+            ids.extend(base + i for i in _highest_bits(bits, limit - len(ids)))
+            if len(ids) >= limit:
+                break
+        return ids
+
+
+class DietIndex:
+    """One Bitmap of recipe ids per diet."""
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._bitmaps = {diet: Bitmap() for diet in DIETS}
+        self._built_at = None
+
+    @property
+    def built(self):
+        return self._built_at is not None
+
+    @property
+    def fresh(self):
+        return self.built and time.monotonic() - self._built_at < self.max_age
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def build(self, rows):
+        """(Re)build from ``(id, vegetarian, vegan, ketogenic)`` rows."""
+
+        ids = {diet: [] for diet in DIETS}
+        for row in rows:
+            for diet, flag in zip(DIETS, row[1:]):
+                if flag:
+                    ids[diet].append(row[0])
+        bitmaps = {diet: Bitmap.from_ids(recipe_ids) for diet, recipe_ids in ids.items()}
+
+        with self._lock:
+            self._bitmaps = bitmaps
+            self._built_at = time.monotonic()
+
+    def set(self, recipe_id, **flags):
+        """Update the flags of one recipe (missing diets count as False)."""
+
+        with self._lock:
+            for diet in DIETS:
+                if flags.get(diet):
+                    self._bitmaps[diet].add(recipe_id)
+                else:
+                    self._bitmaps[diet].discard(recipe_id)
+
+    def remove(self, recipe_id):
+        self.set(recipe_id)
+
+    def match(self, diets, match_all=True):
+        """Bitmap of recipes having all (or any) of `diets`."""
+
+        with self._lock:
+            bitmaps = [self._bitmaps[d] for d in diets]
+            if not bitmaps:
+                return Bitmap()
+            result = bitmaps[0].copy()
+            for bitmap in bitmaps[1:]:
+                result = result & bitmap if match_all else result | bitmap
+        return result
+
+
+diet_index = DietIndex()
+invalidate_on_bulk_write(diet_index.invalidate)
+_build_lock = threading.Lock()
+
+
+@jobs.queue.handler("diets")
+def rebuild():
+    """Job: rebuild the bitmaps from the database, unless another build just did."""
+
+    with _build_lock:
+        if not diet_index.fresh:
+            diet_index.build(db.session.query(Recipe.id, Recipe.vegetarian, Recipe.vegan,
+                                              Recipe.ketogenic).yield_per(10000))
+
+
+def ensure_built():
+    """Whether the index can answer; queues a rebuild if it is missing or old."""
+
+    if not diet_index.fresh:
+        jobs.queue.enqueue("diets", "rebuild")
+    return diet_index.built
+
+
+def init_app(app):
+    diet_index.max_age = app.config.get("DIET_INDEX_MAX_AGE", 300)
+    if app.config.get("DIET_INDEX_WARM", True):
+        with app.app_context():
+            jobs.queue.enqueue("diets", "rebuild")
+
+
+def parse_diets(args):
+    """Diets and match mode from ``?diet=vegan&diet=ketogenic&match=any``."""
+
+    diets = [d for d in args.getlist("diet") if d in DIETS]
+    return list(dict.fromkeys(diets)), args.get("match") != "any"
+
+
+def _query_bitmap(diets, match_all):
+    # Before the first build: a scan of the flag columns, not of every recipe.
+    if not diets:
+        return Bitmap()
+    flags = [getattr(Recipe, d).is_(True) for d in diets]
+    where = db.and_(*flags) if match_all else db.or_(*flags)
+    return Bitmap.from_ids(recipe_id for recipe_id, in db.session.query(Recipe.id).filter(where))
+
+
+def matching_bitmap(diets, match_all=True):
+    if not ensure_built():
+        return _query_bitmap(diets, match_all)
+    return diet_index.match(diets, match_all)
+
+
+def has_diets(recipe, diets, match_all=True):
+    """Check a loaded recipe's own flags (guards against a stale index)."""
+
+    flags = [bool(getattr(recipe, d)) for d in diets]
+    return all(flags) if match_all else any(flags)
+
+
+def filter_recipes(diets, match_all=True, cursor=None, per_page=20):
+    """Page of recipes (ordered by id) having all/any of `diets`."""
+
+    bitmap = matching_bitmap(diets, match_all)
+    direction, key = decode_cursor(cursor)
+    if not isinstance(key, int):
+        direction, key = AFTER, None
+
+    if direction == BEFORE:
+        ids = bitmap.ids_before(key, per_page + 1)
+    else:
+        ids = bitmap.ids_after(key, per_page + 1)
+    page = make_page(ids, per_page, direction, key, lambda recipe_id: recipe_id)
+
+    by_id = {r.id: r for r in Recipe.query.filter(Recipe.id.in_(page.items))} if page.items else {}
+    page.items = [by_id[i] for i in page.items
+                  if i in by_id and has_diets(by_id[i], diets, match_all)]
+    return page
+
+
+@event.listens_for(Recipe, "after_insert")
+@event.listens_for(Recipe, "after_update")
+def _index_written(mapper, connection, target):
+    diet_index.set(target.id, **{d: getattr(target, d) for d in DIETS})
+
+
+@event.listens_for(Recipe, "after_delete")
+def _index_deleted(mapper, connection, target):
+    diet_index.remove(target.id)
+
@@ -0,0 +1,136 @@
+"""Cache of rendered recipe-card fragments.
+
+Cards are rendered once per recipe version from the macros in
+``_recipe_card.html`` and kept in a bounded LRU.  Per-user bits (the
+favorite button state and the owner's edit/delete links) are left as slots
+in the cached markup and filled in with plain string joins, so a page of
+cards costs a few dict lookups instead of a template render per card.
+
+Entries are keyed by ``(kind, recipe id)`` and remember the ``updated_at``
+they were rendered from; ORM updates/deletes and API ingestion drop them
+eagerly, and a newer version seen on a page simply re-renders.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from flask import current_app, g
+from markupsafe import Markup
+from sqlalchemy import event
+
+from models import Recipe
+
+
+# Stands in for the per-user parts while rendering; unique per process so
+# no title can contain it.
+SLOT = f"\x00slot-{uuid.uuid4().hex}\x00"
+
+FAV_CLASSES = ("btn-secondary", "btn-primary")
+
+
+class FragmentCache:
+    """Bounded LRU of rendered fragments, one entry per (kind, recipe id)."""
+
+    def __init__(self, maxsize=5000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._kinds = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_render(self, kind, recipe_id, version, render):
+        """Cached ``render()`` result for this recipe version."""
+
+        key = (kind, recipe_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = render()
+        with self._lock:
+            self._kinds.add(kind)
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, recipe_ids):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                for kind in self._kinds:
+                    if self._entries.pop((kind, recipe_id), None) is not None:
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+card_cache = FragmentCache(maxsize=int(os.getenv("CARD_CACHE_SIZE", 5000)))
+
+
+def _macro(name):
+    return getattr(current_app.jinja_env.get_template("_recipe_card.html").module, name)
+
+
+def _render(kind, recipe):
+    """The card as a list of markup strings around the per-user slots."""
+
+    if kind == "home":
+        return str(_macro("home")(recipe, Markup(SLOT), Markup(SLOT))).split(SLOT)
+    return [str(_macro(kind)(recipe))]
+
+
+def recipe_card(kind, recipe):
+    """Jinja global: the `kind` card ("home", "index" or "favorite") for `recipe`."""
+
+    version = getattr(recipe, "updated_at", None)
+    # API results have no version and are rendered every time.
+    cached = version is not None and current_app.config.get("CARD_CACHE", True)
+
+    def fragment(name, render):
+        return card_cache.get_or_render(name, recipe.id, version, render) if cached else render()
+
+    parts = fragment(kind, lambda: _render(kind, recipe))
+    if kind != "home":
+        return Markup(parts[0])
+
+    head, middle, tail = parts
+    owner = ""
+    if g.user and recipe.user_id == g.user.id:
+        owner = fragment("owner", lambda: str(_macro("owner")(recipe)))
+    return Markup("".join((head, owner, middle, FAV_CLASSES[bool(recipe.favorited)], tail)))
+
+
+def init_app(app):
+    app.jinja_env.globals["recipe_card"] = recipe_card
+
+
+@event.listens_for(Recipe, "after_update")
+@event.listens_for(Recipe, "after_delete")
+def _invalidate_card(mapper, connection, target):
+    card_cache.invalidate([target.id])
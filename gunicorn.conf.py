@@ -0,0 +1,30 @@
+"""Gunicorn settings, read from the working directory by ``gunicorn app:app``.
+
+Requests mostly wait on I/O (Postgres, Spoonacular, image origins), so each
+worker serves them on a pool of threads instead of one at a time; a request
+stuck on a slow upstream call no longer blocks its whole worker.  Views let
+go of their DB connection before waiting on the API, so waiting threads
+don't starve the connection pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+
+    WEB_CONCURRENCY=4 GUNICORN_THREADS=32 gunicorn app:app
+    GUNICORN_WORKER_CLASS=gevent gunicorn app:app    # needs gevent and psycogreen
+    GUNICORN_WORKER_CLASS=sync gunicorn app:app      # one request per worker
+
+Gunicorn reads WEB_CONCURRENCY for the number of workers itself.
+"""
+
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+if "PORT" in os.environ:
+    bind = f"0.0.0.0:{os.environ['PORT']}"
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        # gunicorn patches the standard library; psycopg2 needs its own hook.
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,78 @@
+"""Collision-free ids for user-submitted recipes.
+
+User recipes get ids from a reserved range starting at
+USER_RECIPE_ID_START, far above Spoonacular's ids.  Each process reserves
+a block of BLOCK_SIZE ids at a time (one ``nextval`` on a Postgres
+sequence that increments by the block size, or one counter UPDATE on
+other databases) and hands them out locally, so an insert normally needs
+no extra round trip and two workers can never pick the same id.
+"""
+
+import os
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdBlock
+
+
+USER_RECIPE_ID_START = 1_000_000_000
+BLOCK_SIZE = 50
+
+user_recipe_id_seq = db.Sequence(
+    "user_recipe_id_seq",
+    start=USER_RECIPE_ID_START,
+    increment=BLOCK_SIZE,
+    metadata=db.metadata,
+)
+
+
+class BlockAllocator:
+    """Hands out ids from blocks reserved in the database."""
+
+    def __init__(self, sequence, start, block_size):
+        self.sequence = sequence
+        self.start = start
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = None
+
+    def next_id(self):
+        with self._lock:
+            # A block reserved before a fork must not be shared with the child.
+            if self._next >= self._end or self._pid != os.getpid():
+                self._next = self._reserve_block()
+                self._end = self._next + self.block_size
+                self._pid = os.getpid()
+            recipe_id = self._next
+            self._next += 1
+            return recipe_id
+
+    def _reserve_block(self):
+        """First id of a freshly reserved block, committed on its own connection."""
+
+        if db.engine.dialect.name == "postgresql":
+            with db.engine.begin() as conn:
+                return conn.execute(self.sequence.next_value()).scalar()
+
+        table = IdBlock.__table__
+        bump = (table.update()
+                     .where(table.c.name == self.sequence.name)
+                     .values(next_value=table.c.next_value + self.block_size)
+                     .returning(table.c.next_value))
+        while True:
+            try:
+                with db.engine.begin() as conn:
+                    end = conn.execute(bump).scalar()
+                    if end is not None:
+                        return end - self.block_size
+                    conn.execute(table.insert().values(name=self.sequence.name,
+                                                       next_value=self.start + self.block_size))
+                    return self.start
+            except IntegrityError:
+                # Another process created the counter row first; bump it instead.
+                continue
+
+
+recipe_ids = BlockAllocator(user_recipe_id_seq, USER_RECIPE_ID_START, BLOCK_SIZE)
@@ -0,0 +1,374 @@
+"""Thumbnail proxy for recipe images.
+
+Cards link ``thumb_url(recipe.image, width)`` rather than hotlinking the
+source.  The URL is ``/images/<width>?src=...&sig=...``, signed with
+SECRET_KEY so the endpoint only fetches sources the app itself put on a
+page, and its transport refuses connections to non-public addresses.
+Each source is downloaded once, resized to the requested card width
+(WebP when the browser accepts it, else JPEG) and kept in a disk cache
+that drops the least recently used files past IMAGE_CACHE_MAX_BYTES.
+Cache files are named by a digest of source, width and format, which also
+serves as their ETag; a different source means a different URL, so
+responses are immutable.
+
+Resizing needs Pillow; without it the original image is cached and served
+as is.  When a source can't be fetched the client is redirected to it.
+"""
+
+import hashlib
+import hmac
+import io
+import ipaddress
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from flask import Response, abort, current_app, redirect, request, url_for
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import profiler
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # originals only
+    Image = None
+
+
+CONNECT_TIMEOUT = float(os.getenv("IMAGE_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("IMAGE_READ_TIMEOUT", 10))
+MAX_SOURCE_BYTES = int(os.getenv("IMAGE_MAX_SOURCE_BYTES", 20 * 1024 * 1024))
+ONE_YEAR = 365 * 24 * 3600
+
+# Magic bytes of the formats passed through without Pillow.
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+class ImageError(Exception):
+    """The source could not be fetched or is not a usable image."""
+
+
+def _check_peer(sock, host):
+    """Refuse a socket connected to a non-public address.
+
+    Checked on the connected socket rather than a separate DNS lookup, so a
+    host can't resolve to a public address for the check and a private one
+    for the connection.
+    """
+
+    address = sock.getpeername()[0]
+    if current_app.config.get("IMAGE_ALLOW_PRIVATE") or ipaddress.ip_address(address.split("%")[0]).is_global:
+        return
+    sock.close()
+    raise ImageError(f"{host}: {address} is not a public address")
+
+
+class _PublicHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        sock = super()._new_conn()
+        _check_peer(sock, self.host)
+        return sock
+
+
+class _PublicHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        sock = super()._new_conn()
+        _check_peer(sock, self.host)
+        return sock
+
+
+class _PublicHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class PublicOnlyAdapter(HTTPAdapter):
+    """Transport that only talks to public addresses (see `_check_peer`)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PublicHTTPPool,
+                                                   "https": _PublicHTTPSPool}
+
+
+http = requests.Session()
+http.mount("http://", PublicOnlyAdapter())
+http.mount("https://", PublicOnlyAdapter())
+
+
+class ImageCache:
+    """Files on disk, evicted oldest-mtime first once over `max_bytes`.
+
+    Reads bump a file's mtime, so eviction is least recently used.  Every
+    worker shares the directory; each keeps a running size estimate and
+    re-scans when it passes the limit or every `rescan_every` writes.
+    """
+
+    def __init__(self, directory, max_bytes, rescan_every=100):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_every = rescan_every
+        self._lock = threading.Lock()
+        self._fetch_locks = [threading.Lock() for _ in range(64)]
+        self._bytes = sum(size for _, _, size in self._files())
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fetches = 0
+        self.errors = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _files(self):
+        """``(mtime, path, size)`` for every cached file."""
+
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        files = []
+        for shard in shards:
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._bytes += len(data)
+            self._writes += 1
+            check = self._bytes > self.max_bytes or self._writes % self.rescan_every == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used files until under 90% of the limit."""
+
+        files = sorted(self._files())
+        total = sum(size for _, _, size in files)
+        target = self.max_bytes * 0.9 if total > self.max_bytes else total
+        removed = 0
+        for _, path, size in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+            self.evictions += removed
+
+    def fetch_lock(self, key):
+        """Lock held while producing `key`, so concurrent misses fetch once."""
+
+        return self._fetch_locks[hash(key) % len(self._fetch_locks)]
+
+    def get_or_create(self, key, create):
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self.fetch_lock(key):
+            data = self.get(key)
+            if data is None:
+                with self._lock:
+                    self.misses += 1
+                data = create()
+                self.put(key, data)
+        return data
+
+    def record_fetch(self):
+        with self._lock:
+            self.fetches += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "fetches": self.fetches,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+def _digest(*parts):
+    return hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()
+
+
+def sign(src):
+    key = current_app.config["SECRET_KEY"].encode()
+    return hmac.new(key, src.encode(), hashlib.sha256).hexdigest()[:20]
+
+
+def _proxied(src):
+    return (current_app.config.get("IMAGE_PROXY", True) and bool(src)
+            and urlsplit(src).scheme in ("http", "https"))
+
+
+def thumb_url(src, width):
+    """Jinja global: proxied URL of image `src` at `width` pixels, or `src` itself."""
+
+    if not _proxied(src):
+        return src
+    return url_for("images", width=width, src=src, sig=sign(src))
+
+
+def thumb_srcset(src):
+    """Jinja global: a ``srcset`` of `src` at every configured width."""
+
+    if not _proxied(src):
+        return ""
+    return ", ".join(f"{thumb_url(src, w)} {w}w" for w in current_app.config["IMAGE_WIDTHS"])
+
+
+def fetch(src):
+    """The bytes of image `src`; raises ImageError."""
+
+    if not urlsplit(src).hostname:
+        raise ImageError(f"{src}: no host")
+
+    start = time.perf_counter()
+    try:
+        with http.get(src, stream=True, allow_redirects=False,
+                      timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+            if response.status_code != 200:
+                raise ImageError(f"{src}: HTTP {response.status_code}")
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > MAX_SOURCE_BYTES:
+                    raise ImageError(f"{src}: larger than {MAX_SOURCE_BYTES} bytes")
+            return bytes(data)
+    except requests.RequestException as e:
+        raise ImageError(f"{src}: {e}")
+    finally:
+        profiler.add_time("api", time.perf_counter() - start)
+
+
+def sniff(data):
+    for signature, mimetype in SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def resize(data, width, fmt):
+    """`data` scaled down to `width` pixels wide and encoded as `fmt`."""
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                image.thumbnail((width, image.height))
+            if fmt == "jpeg" or image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGB" if fmt == "jpeg" else "RGBA")
+            out = io.BytesIO()
+            image.save(out, fmt.upper(), quality=80)
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f"cannot resize: {e}")
+
+
+def serve(width):
+    """The `width`-pixel thumbnail of the signed ``src`` argument."""
+
+    src = request.args.get("src", "")
+    sig = request.args.get("sig", "")
+    if width not in current_app.config["IMAGE_WIDTHS"] or not hmac.compare_digest(sig, sign(src)):
+        abort(404)
+
+    cache = current_app.extensions["images"]
+
+    def original():
+        cache.record_fetch()
+        data = fetch(src)
+        if sniff(data) is None and Image is None:
+            raise ImageError(f"{src}: not an image")
+        return data
+
+    if Image is None:
+        key = _digest(src)
+        mimetype = None
+        create = original
+    else:
+        fmt = "webp" if request.accept_mimetypes["image/webp"] else "jpeg"
+        key = _digest(src, width, fmt)
+        mimetype = FORMATS[fmt]
+
+        def create():
+            return resize(cache.get_or_create(_digest(src), original), width, fmt)
+
+    try:
+        data = cache.get_or_create(key, create)
+    except ImageError as e:
+        cache.record_error()
+        current_app.logger.warning("Image proxy: %s", e)
+        response = redirect(src)
+        response.cache_control.max_age = 300
+        return response
+
+    response = Response(data, mimetype=mimetype or sniff(data))
+    response.set_etag(key[:32])
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.vary.add("Accept")
+    response.cache_control.public = True
+    response.cache_control.max_age = ONE_YEAR
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    app.extensions["images"] = ImageCache(app.config["IMAGE_CACHE_DIR"],
+                                          app.config["IMAGE_CACHE_MAX_BYTES"])
+    app.add_url_rule("/images/<int:width>", "images", serve)
+    app.jinja_env.globals["thumb_url"] = thumb_url
+    app.jinja_env.globals["thumb_srcset"] = thumb_srcset
@@ -0,0 +1,208 @@
+"""In-process background jobs: API fetches and ingestion off the request path.
+
+Views ``enqueue`` a job by kind and key and return; a few daemon threads in
+each worker run the handlers registered for that kind, inside an app
+context.  A job whose key is already queued or running is not queued
+again, so a burst of identical searches makes one upstream call.
+
+With ``JOB_WORKERS = 0`` (the testing profile) nothing runs in the
+background: jobs wait until ``drain()`` runs them in the calling thread.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+
+from flask import current_app, has_app_context
+
+from latency import percentile_ms
+
+
+class Job:
+    """One queued call; `done` is set once it has run (or been dropped)."""
+
+    def __init__(self, app, kind, key, args):
+        self.app = app
+        self.kind = kind
+        self.key = key
+        self.args = args
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+
+
+class JobQueue:
+    """FIFO of jobs run by `workers` threads, with wait/run latency stats."""
+
+    def __init__(self, workers=2, window=1000):
+        self._handlers = {}
+        self._expected = {}
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._active = {}
+        self._running = 0
+        self._generation = 0
+        self._pid = None
+        self._waits = deque(maxlen=window)
+        self._runs = deque(maxlen=window)
+        self._failed_at = OrderedDict()  # (kind, key) -> when its last run failed
+        self.window = window
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.workers = workers
+
+    def handler(self, kind, expected=()):
+        """Decorator registering the function that runs jobs of `kind`.
+
+        Failures raising one of the `expected` exception types (an API being
+        down, say) are logged as a one-line warning rather than a traceback.
+        """
+
+        def register(fn):
+            self._handlers[kind] = fn
+            self._expected[kind] = expected
+            return fn
+        return register
+
+    def configure(self, workers=2):
+        """Use `workers` threads from now on (0: run only on ``drain()``)."""
+
+        with self._cond:
+            self.workers = workers
+            self._generation += 1
+            self._pid = None
+            self._cond.notify_all()
+            if self._queue:
+                self._start_workers()
+
+    def _start_workers(self):
+        # Called with the lock held.  Threads don't survive a fork, so a
+        # worker process forked after the first enqueue starts its own.
+        if self._pid == os.getpid() or not self.workers:
+            return
+        self._pid = os.getpid()
+        for n in range(self.workers):
+            threading.Thread(target=self._work, args=(self._generation,), daemon=True,
+                             name=f"jobs-{n}").start()
+
+    def enqueue(self, kind, key, *args):
+        """Queue ``handler(*args)`` unless a `kind`/`key` job is pending.
+
+        Returns the Job (the pending one if it was a duplicate).
+        """
+
+        if kind not in self._handlers:
+            raise KeyError(f"no handler for {kind!r} jobs")
+        with self._cond:
+            job = self._active.get((kind, key))
+            if job is not None:
+                self.skipped += 1
+                return job
+            job = self._active[(kind, key)] = Job(current_app._get_current_object(), kind, key, args)
+            self._queue.append(job)
+            self._start_workers()
+            self._cond.notify()
+            return job
+
+    def _next(self, generation=None):
+        with self._cond:
+            while not self._queue:
+                if generation is None:
+                    return None
+                self._cond.wait()
+                if generation != self._generation:
+                    return None
+            if generation is not None and generation != self._generation:
+                return None
+            self._running += 1
+            return self._queue.popleft()
+
+    def _work(self, generation):
+        while True:
+            job = self._next(generation)
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        started = time.monotonic()
+        ok = False
+        try:
+            with nullcontext() if has_app_context() else job.app.app_context():
+                self._handlers[job.kind](*job.args)
+            ok = True
+        except self._expected[job.kind] as e:
+            job.app.logger.warning("Job %s %r failed: %s", job.kind, job.key, e)
+        except Exception:
+            job.app.logger.exception("Job %s %r failed", job.kind, job.key)
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._active.pop((job.kind, job.key), None)
+                self._waits.append(started - job.enqueued_at)
+                self._runs.append(time.monotonic() - started)
+                if ok:
+                    self.completed += 1
+                    self._failed_at.pop((job.kind, job.key), None)
+                else:
+                    self.failed += 1
+                    self._failed_at[(job.kind, job.key)] = time.monotonic()
+                    self._failed_at.move_to_end((job.kind, job.key))
+                    if len(self._failed_at) > self.window:
+                        self._failed_at.popitem(last=False)
+            job.done.set()
+
+    def last_failure(self, kind, key):
+        """Seconds since the last `kind`/`key` job failed, or None if the last one didn't."""
+
+        with self._cond:
+            failed_at = self._failed_at.get((kind, key))
+        return None if failed_at is None else time.monotonic() - failed_at
+
+    def drain(self):
+        """Run every queued job in this thread; returns how many ran."""
+
+        ran = 0
+        while True:
+            job = self._next()
+            if job is None:
+                return ran
+            self._run(job)
+            ran += 1
+
+    def clear(self):
+        """Drop queued jobs and reset the stats (running jobs finish)."""
+
+        with self._cond:
+            for job in self._queue:
+                self._active.pop((job.kind, job.key), None)
+                job.done.set()
+            self._queue.clear()
+            self._waits.clear()
+            self._runs.clear()
+            self._failed_at.clear()
+            self.completed = self.failed = self.skipped = 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "depth": len(self._queue),
+                "running": self._running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "wait_p50_ms": percentile_ms(self._waits, 50),
+                "wait_p95_ms": percentile_ms(self._waits, 95),
+                "run_p50_ms": percentile_ms(self._runs, 50),
+                "run_p95_ms": percentile_ms(self._runs, 95),
+            }
+
+
+queue = JobQueue()
+
+
+def init_app(app):
+    queue.configure(workers=app.config.get("JOB_WORKERS", 2))
@@ -0,0 +1,10 @@
+"""Helpers for the latency summaries in ``/internal/metrics``."""
+
+
+def percentile_ms(samples, pct, digits=2):
+    """The `pct` percentile of second-valued `samples` in milliseconds, or None if empty."""
+
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return round(ordered[int(pct / 100 * (len(ordered) - 1))] * 1000, digits)
@@ -1,11 +1,64 @@
 """Models for Food Recipe app."""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from db_pool import PoolMetrics, engine_options
 
 
 bcrypt = Bcrypt()
 db = SQLAlchemy()
 
+
+class PasswordHasher:
+    """bcrypt hashing on a small, bounded thread pool.
+
+    bcrypt releases the GIL, so running it on a few dedicated threads caps
+    how much CPU a burst of logins can take from the rest of the worker
+    instead of every request thread hashing at once.
+    """
+
+    def __init__(self, rounds=12, workers=2):
+        self._pool = None
+        self.configure(rounds, workers)
+
+    def configure(self, rounds=12, workers=2):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.rounds = rounds
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    def hash(self, password):
+        return self._pool.submit(
+            bcrypt.generate_password_hash, password, self.rounds
+        ).result().decode('UTF-8')
+
+    def check(self, hashed, password):
+        return self._pool.submit(bcrypt.check_password_hash, hashed, password).result()
+
+    def needs_rehash(self, hashed):
+        """True if `hashed` was made with a different cost than configured."""
+
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+passwords = PasswordHasher()
+
+
+def utcnow():
+    """Naive UTC now, as stored in DateTime columns."""
+
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Recipe(db.Model):
     __tablename__ = "recipes"
 
@@ -23,11 +76,126 @@ class Recipe(db.Model):
                             default=False)
     user_id = db.Column(db.Integer,
                         db.ForeignKey("users.id"))
+    # Set only by upsert_many: the id is a Spoonacular id with details upstream
+    # (seed placeholders and synthetic rows have no owner either, but aren't).
+    from_api = db.Column(db.Boolean,
+                         nullable=False,
+                         default=False,
+                         server_default=db.false())
+    # Bumped on every change; the validator for ETag / Last-Modified (see conditional.py).
+    updated_at = db.Column(db.DateTime,
+                           nullable=False,
+                           default=utcnow,
+                           onupdate=utcnow,
+                           server_default=db.func.now())
     user = db.relationship("User", backref="recipes")
-    
+    # Not loaded unless asked for (joinedload in recipe_info); the database
+    # deletes it with the recipe.
+    detail = db.relationship("RecipeDetail", uselist=False, cascade="all, delete-orphan",
+                             passive_deletes=True)
+
+    @classmethod
+    def with_favorite_flag(cls, user_id):
+        """Query of lightweight card rows with a `favorited` flag for `user_id`.
+
+        Rows carry id, title, image, user_id, from_api, updated_at and
+        favorited; the
+        flag is an EXISTS probe on the (user_id, recipe_id) index, evaluated
+        only for the recipes actually fetched.
+        """
+
+        favorited = db.exists().where(Favorites.user_id == user_id,
+                                      Favorites.recipe_id == cls.id)
+        return db.session.query(cls.id, cls.title, cls.image, cls.user_id, cls.from_api,
+                                cls.updated_at, favorited.label("favorited"))
+
+    @classmethod
+    def upsert_many(cls, rows):
+        """Insert API recipes in one statement, refreshing ones we already have.
+
+        `rows` are dicts with at least ``id``, ``title`` and ``image``; they
+        are marked `from_api`.  Recipes owned by a user are never
+        overwritten.  The caller commits.
+        """
+
+        if not rows:
+            return
+        rows = [dict(row, from_api=True) for row in rows]
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            insert = (postgresql if dialect == "postgresql" else sqlite).insert
+            stmt = insert(cls).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.id],
+                set_={"title": stmt.excluded.title, "image": stmt.excluded.image,
+                      "from_api": True, "updated_at": utcnow()},
+                # Unchanged rows are left alone so their ETags stay valid.
+                where=db.and_(cls.user_id.is_(None),
+                              db.or_(cls.title.is_distinct_from(stmt.excluded.title),
+                                     cls.image.is_distinct_from(stmt.excluded.image),
+                                     cls.from_api.is_(False))),
+            )
+            db.session.execute(stmt)
+        else:
+            for row in rows:
+                db.session.merge(cls(**row))
+
+
+# Title search indexes (see search.py).  These are Postgres-only: a stemmed
+# full-text index for ranked matches and a trigram index for fuzzy fallbacks.
+RECIPE_SEARCH_INDEXES = {
+    "ix_recipes_title_tsv": "CREATE INDEX IF NOT EXISTS ix_recipes_title_tsv ON recipes "
+                            "USING gin (to_tsvector('english', title))",
+    "ix_recipes_title_trgm": "CREATE INDEX IF NOT EXISTS ix_recipes_title_trgm ON recipes "
+                             "USING gin (title gin_trgm_ops)",
+}
+
+event.listen(
+    Recipe.__table__,
+    "after_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for _ddl in RECIPE_SEARCH_INDEXES.values():
+    event.listen(Recipe.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+
+# invalidate() callbacks of the in-process recipe indexes (search.py,
+# diet_index.py, suggest.py).
+_recipe_index_invalidators = []
+
+
+def invalidate_on_bulk_write(invalidate):
+    """Call `invalidate()` when recipes change without mapper events.
+
+    Bulk ``query.delete()``/``update()`` and a newly created table skip the
+    per-row events the indexes follow, so they start over instead.
+    """
+
+    _recipe_index_invalidators.append(invalidate)
+    return invalidate
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_delete or orm_execute_state.is_update):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Recipe:
+        for invalidate in _recipe_index_invalidators:
+            invalidate()
+
+
+@event.listens_for(Recipe.__table__, "after_create")
+def _invalidate_on_create(target, connection, **kw):
+    for invalidate in _recipe_index_invalidators:
+        invalidate()
+
+
 class Favorites(db.Model):
     """Model for favorite recipes"""    
     __tablename__ = "favorites"
+    __table_args__ = (db.UniqueConstraint("user_id", "recipe_id"),)
 
     id = db.Column(db.Integer,
                    primary_key=True)
@@ -37,6 +205,56 @@ class Favorites(db.Model):
     recipe_id = db.Column(db.Integer,
                           db.ForeignKey("recipes.id"))
     user = db.relationship("User", backref="favorites")
+
+    @classmethod
+    def toggle(cls, user_id, recipe_id):
+        """Favorite or unfavorite a recipe for a user.
+
+        Returns ``(favorited, count)`` with the new state and the recipe's
+        favorite count, or None if the recipe doesn't exist.  On Postgres
+        this is a single statement.  The caller commits.
+        """
+
+        params = {"user_id": user_id, "recipe_id": recipe_id}
+
+        if db.session.get_bind().dialect.name == "postgresql":
+            row = db.session.execute(db.text("""
+                WITH recipe AS (
+                    SELECT id FROM recipes WHERE id = :recipe_id
+                ), deleted AS (
+                    DELETE FROM favorites
+                    WHERE user_id = :user_id AND recipe_id = :recipe_id
+                    RETURNING id
+                ), inserted AS (
+                    INSERT INTO favorites (user_id, recipe_id)
+                    SELECT :user_id, id FROM recipe
+                    WHERE NOT EXISTS (SELECT 1 FROM deleted)
+                    ON CONFLICT (user_id, recipe_id) DO NOTHING
+                    RETURNING id
+                )
+                SELECT EXISTS (SELECT 1 FROM recipe) AS found,
+                       EXISTS (SELECT 1 FROM inserted) AS favorited,
+                       (SELECT count(*) FROM favorites WHERE recipe_id = :recipe_id)
+                         + (SELECT count(*) FROM inserted)
+                         - (SELECT count(*) FROM deleted) AS count
+            """), params).one()
+            return (row.favorited, row.count) if row.found else None
+
+        if db.session.get(Recipe, recipe_id) is None:
+            return None
+        table = cls.__table__
+        deleted = db.session.execute(
+            table.delete()
+                 .where(table.c.user_id == user_id, table.c.recipe_id == recipe_id)
+                 .returning(table.c.id)
+        ).first()
+        if deleted is None:
+            db.session.execute(
+                sqlite.insert(table).values(**params).on_conflict_do_nothing())
+        count = db.session.execute(
+            db.select(db.func.count()).select_from(table).where(table.c.recipe_id == recipe_id)
+        ).scalar()
+        return deleted is None, count
         
 
 
@@ -90,7 +308,7 @@ class User(db.Model):
         Hashes password and adds user to system.
         """
 
-        hashed_pwd = bcrypt.generate_password_hash(password).decode('UTF-8')
+        hashed_pwd = passwords.hash(password)
 
         user = User(
             first_name=first_name,
@@ -113,13 +331,18 @@ class User(db.Model):
         and, if it finds such a user, returns that user object.
 
         If can't find matching user (or if password is wrong), returns False.
+
+        If the stored hash uses a different bcrypt cost than configured, it
+        is replaced with a fresh hash (the caller commits).
         """
 
         user = cls.query.filter_by(username=username).first()
 
         if user:
-            is_auth = bcrypt.check_password_hash(user.password, password)
+            is_auth = passwords.check(user.password, password)
             if is_auth:
+                if passwords.needs_rehash(user.password):
+                    user.password = passwords.hash(password)
                 return user
 
         return False
@@ -135,6 +358,70 @@ class User(db.Model):
 
 
 
+class IdBlock(db.Model):
+    """Block counter for id ranges on databases without sequences (see id_allocator.py)."""
+
+    __tablename__ = "id_blocks"
+
+    name = db.Column(db.Text,
+                     primary_key=True)
+    next_value = db.Column(db.BigInteger,
+                           nullable=False)
+
+
+class ApiCacheEntry(db.Model):
+    """Cached Spoonacular response, shared by all workers (see cache.py)."""
+
+    __tablename__ = "api_cache"
+
+    key = db.Column(db.Text,
+                    primary_key=True)
+    value = db.Column(db.Text,
+                      nullable=False)
+    expires_at = db.Column(db.Float,
+                           nullable=False,
+                           index=True)
+
+
+class RecipeDetail(db.Model):
+    """Ingredients, steps and nutrition of an API recipe (see details.py)."""
+
+    __tablename__ = "recipe_details"
+
+    recipe_id = db.Column(db.Integer,
+                          db.ForeignKey("recipes.id", ondelete="CASCADE"),
+                          primary_key=True)
+    data = db.Column(db.JSON().with_variant(postgresql.JSONB(), "postgresql"),
+                     nullable=False)
+    fetched_at = db.Column(db.DateTime,
+                           nullable=False,
+                           default=utcnow)
+
+    @classmethod
+    def upsert_many(cls, rows):
+        """Insert or replace details; `rows` are dicts of recipe_id and data.
+
+        The caller commits.
+        """
+
+        if not rows:
+            return
+
+        rows = [dict(row, fetched_at=utcnow()) for row in rows]
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            insert = (postgresql if dialect == "postgresql" else sqlite).insert
+            stmt = insert(cls).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.recipe_id],
+                set_={"data": stmt.excluded.data, "fetched_at": stmt.excluded.fetched_at},
+            )
+            db.session.execute(stmt)
+        else:
+            for row in rows:
+                db.session.merge(cls(**row))
+
+
 def connect_db(app):
     """Connect this database to provided Flask app.
 
@@ -142,7 +429,12 @@ def connect_db(app):
     """
 
     db.app = app
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
     db.init_app(app)
+    with app.app_context():
+        app.extensions["pool_metrics"] = PoolMetrics(db.engine)
+    passwords.configure(rounds=app.config.get("BCRYPT_LOG_ROUNDS", 12),
+                        workers=app.config.get("BCRYPT_WORKERS", 2))
 
 
 
@@ -0,0 +1,106 @@
+"""Keyset (cursor) pagination.
+
+Pages are addressed by opaque cursor tokens that encode the sort key of
+the first/last row shown, so page N costs the same as page 1: the query
+seeks past the key with an indexed ``WHERE key > :last`` instead of
+skipping rows with OFFSET.
+"""
+
+import base64
+import json
+
+from flask import current_app, request
+
+
+AFTER = "a"
+BEFORE = "b"
+
+
+class Page:
+    """One page of results plus the cursors of its neighbours."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(direction, key):
+    raw = json.dumps([direction, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(direction, key)``; a missing or malformed token means page one."""
+
+    if not token:
+        return AFTER, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, key = json.loads(raw)
+    except (ValueError, TypeError):
+        return AFTER, None
+    if direction not in (AFTER, BEFORE):
+        return AFTER, None
+    return direction, key
+
+
+def make_page(rows, per_page, direction, key, key_of, total=None):
+    """Build a Page from rows fetched with ``limit(per_page + 1)``.
+
+    `rows` are in fetch order (reversed when paging backwards) and
+    `key_of(row)` returns the JSON-serializable sort key of a row.
+    """
+
+    more = len(rows) > per_page
+    rows = list(rows[:per_page])
+    if direction == BEFORE:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = key is not None, more
+
+    if not rows:
+        return Page(rows, total=total)
+    return Page(
+        rows,
+        next_cursor=encode_cursor(AFTER, key_of(rows[-1])) if has_next else None,
+        prev_cursor=encode_cursor(BEFORE, key_of(rows[0])) if has_prev else None,
+        total=total,
+    )
+
+
+def paginate(query, column, cursor=None, per_page=None, key_of=lambda row: row.id):
+    """Page through `query` ordered by the unique, indexed integer `column`."""
+
+    per_page = per_page or page_size()
+    direction, key = decode_cursor(cursor)
+    if not isinstance(key, int):
+        direction, key = AFTER, None
+
+    if direction == BEFORE:
+        query = query.filter(column < key).order_by(column.desc())
+    else:
+        if key is not None:
+            query = query.filter(column > key)
+        query = query.order_by(column)
+
+    rows = query.limit(per_page + 1).all()
+    return make_page(rows, per_page, direction, key, key_of)
+
+
+def page_size():
+    """The ``per_page`` query arg, clamped to MAX_PAGE_SIZE, or PAGE_SIZE."""
+
+    per_page = request.args.get("per_page", type=int) or current_app.config["PAGE_SIZE"]
+    return max(1, min(per_page, current_app.config["MAX_PAGE_SIZE"]))
@@ -0,0 +1,144 @@
+"""Per-request profiling: SQL statements, DB, API and template time.
+
+Each request gets a RequestProfile fed by SQLAlchemy cursor events, the
+template render signals and ``add_time`` calls from the Spoonacular
+client.  The totals go out as a ``Server-Timing`` header when
+SERVER_TIMING is on (only development by default); slow requests and
+statements repeated within one request (likely N+1 loads) are logged.
+"""
+
+import contextvars
+import time
+from collections import Counter
+
+from flask import before_render_template, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.failed = 0
+        self.statements = Counter()
+        self.timings = {"db": 0.0, "api": 0.0, "tpl": 0.0}
+        self._render_start = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def repeated(self, threshold):
+        """``(statement, count)`` for statements run at least `threshold` times."""
+
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self):
+        t = {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()}
+        queries = f"{self.queries} queries" + (f", {self.failed} failed" if self.failed else "")
+        return (f'db;dur={t["db"]};desc="{queries}", api;dur={t["api"]}, '
+                f'tpl;dur={t["tpl"]}, total;dur={round(self.elapsed * 1000, 2)}')
+
+
+def current_profile():
+    """The profile of the request being handled, or None."""
+
+    return _current.get()
+
+
+def add_time(name, seconds):
+    """Charge `seconds` to the current request's `name` timing, if profiling."""
+
+    profile = _current.get()
+    if profile is not None:
+        profile.timings[name] = profile.timings.get(name, 0.0) + seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    starts = conn.info.get("profiler_start")
+    if profile is None or not starts:
+        return
+    profile.timings["db"] += time.perf_counter() - starts.pop()
+    profile.queries += 1
+    profile.statements[statement] += 1
+
+
+def _handle_error(exception_context):
+    # A statement that raised never reaches after_cursor_execute.
+    conn = exception_context.connection
+    starts = conn.info.get("profiler_start") if conn is not None else None
+    if not starts:
+        return
+    started = starts.pop()
+    profile = _current.get()
+    if profile is None:
+        return
+    profile.timings["db"] += time.perf_counter() - started
+    profile.queries += 1
+    profile.failed += 1
+    if exception_context.statement is not None:
+        profile.statements[exception_context.statement] += 1
+
+
+def _before_render(app, template, context, **extra):
+    profile = _current.get()
+    if profile is not None:
+        profile._render_start = time.perf_counter()
+
+
+def _rendered(app, template, context, **extra):
+    profile = _current.get()
+    if profile is not None and profile._render_start is not None:
+        profile.timings["tpl"] += time.perf_counter() - profile._render_start
+        profile._render_start = None
+
+
+def init_app(app):
+    """Profile every request of `app` (unless PROFILE_REQUESTS is off)."""
+
+    if not app.config.get("PROFILE_REQUESTS", True):
+        return
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_profile():
+        _current.set(RequestProfile())
+
+    @app.after_request
+    def finish_profile(response):
+        profile = _current.get()
+        if profile is None:
+            return response
+        if app.config.get("SERVER_TIMING", False):
+            response.headers["Server-Timing"] = profile.server_timing()
+
+        where = f"{request.method} {request.full_path.rstrip('?')}"
+        slow_ms = app.config.get("SLOW_REQUEST_MS", 500)
+        if profile.elapsed * 1000 >= slow_ms:
+            app.logger.warning("Slow request %s: %s", where, profile.server_timing())
+        for statement, count in profile.repeated(app.config.get("N_PLUS_ONE_THRESHOLD", 5)):
+            app.logger.warning("Possible N+1 in %s: %dx %s", where, count,
+                               " ".join(statement.split())[:200])
+        return response
+
+    @app.teardown_request
+    def end_profile(exc):
+        _current.set(None)
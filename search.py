@@ -0,0 +1,302 @@
+"""Recipe title search for Yummpy.
+
+On Postgres, searches are served by the GIN indexes created in models.py
+(a stemmed ``to_tsvector`` index for ranked matches and a trigram index
+for fuzzy fallbacks).  Other databases (SQLite in tests and benchmarks)
+use an in-process inverted index over tokenized, stemmed titles which is
+built lazily and kept up to date by ORM events.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from models import db, Recipe, invalidate_on_bulk_write
+from pagination import AFTER, BEFORE, decode_cursor, make_page
+from diet_index import matching_bitmap, has_diets
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ES_ENDINGS = ("oes", "xes", "ches", "shes", "sses", "zes")
+
+# ts_rank() and similarity() return float4, which Postgres promotes to
+# float8 when compared with a bound float, so a score read back from a
+# cursor never equals the row's own.  Ranks are ordered and sought on this
+# fixed-precision numeric instead, which round-trips through JSON exactly.
+SCORE_TYPE = db.Numeric(12, 9)
+
+
+def stem(token):
+    """Very small suffix-stripping stemmer for English recipe titles.
+
+    It only has to map obvious variants ("noodles", "noodle") onto the same
+    key; Postgres uses its own ``english`` stemmer.
+    """
+
+    if len(token) <= 3:
+        return token
+    if token.endswith("ies"):
+        token = token[:-3] + "y"
+    elif token.endswith(_ES_ENDINGS):
+        token = token[:-2]
+    elif token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    if token.endswith("ing") and len(token) > 5:
+        token = token[:-3]
+    elif token.endswith("ed") and len(token) > 4:
+        token = token[:-2]
+    if token.endswith("e") and len(token) > 3:
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Split `text` into lowercase, stemmed tokens."""
+
+    return [stem(t) for t in _TOKEN_RE.findall((text or "").lower())]
+
+
+class InvertedIndex:
+    """Token -> recipe id postings with idf-weighted ranking."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(set)
+        self._doc_tokens = {}
+        self._built = False
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    @property
+    def built(self):
+        return self._built
+
+    def invalidate(self):
+        """Drop everything; the index is rebuilt on the next search."""
+
+        with self._lock:
+            self._postings = defaultdict(set)
+            self._doc_tokens = {}
+            self._built = False
+
+    def build(self, rows):
+        """(Re)build the index from an iterable of ``(id, title)`` rows."""
+
+        with self._lock:
+            self._postings = defaultdict(set)
+            self._doc_tokens = {}
+            for recipe_id, title in rows:
+                self._add(recipe_id, title)
+            self._built = True
+
+    def add(self, recipe_id, title):
+        with self._lock:
+            if self._built:
+                self._remove(recipe_id)
+                self._add(recipe_id, title)
+
+    def remove(self, recipe_id):
+        with self._lock:
+            if self._built:
+                self._remove(recipe_id)
+
+    def _add(self, recipe_id, title):
+        tokens = tokenize(title)
+        self._doc_tokens[recipe_id] = tokens
+        for token in set(tokens):
+            self._postings[token].add(recipe_id)
+
+    def _remove(self, recipe_id):
+        tokens = self._doc_tokens.pop(recipe_id, None)
+        if not tokens:
+            return
+        for token in set(tokens):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(recipe_id)
+                if not ids:
+                    del self._postings[token]
+
+    def search(self, query, after=None, before=None, limit=None, allowed=None):
+        """Rank recipes matching every token in `query`, best first.
+
+        If `allowed` is given (any container of ids), other recipes are
+        left out.
+
+        Each match is a ``(-score, id)`` sort key.  Returns ``(keys, total)``
+        where `keys` are up to `limit` keys following `after` (or, walking
+        backwards, the ones nearest before `before`, nearest first) and
+        `total` is the number of matches.
+        """
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            postings = [self._postings.get(t, ()) for t in tokens]
+            if not all(postings):
+                return [], 0
+
+            n_docs = len(self._doc_tokens) or 1
+            weights = [math.log(1 + n_docs / len(p)) for p in postings]
+
+            ordered = sorted(postings, key=len)
+            matches = set(ordered[0])
+            for ids in ordered[1:]:
+                matches &= ids
+                if not matches:
+                    return [], 0
+
+            if allowed is not None:
+                matches = [i for i in matches if i in allowed]
+            total = len(matches)
+            scored = []
+            for recipe_id in matches:
+                doc = self._doc_tokens[recipe_id]
+                score = sum(w * doc.count(t) for t, w in zip(tokens, weights))
+                scored.append((-score / math.sqrt(len(doc)), recipe_id))
+
+        if before is not None:
+            scored = [k for k in scored if k < before]
+            return heapq.nlargest(limit or len(scored), scored), total
+        if after is not None:
+            scored = [k for k in scored if k > after]
+        if limit is None:
+            return sorted(scored), total
+        return heapq.nsmallest(limit, scored), total
+
+
+title_index = InvertedIndex()
+invalidate_on_bulk_write(title_index.invalidate)
+
+
+def _uses_postgres():
+    return db.engine.dialect.name == "postgresql"
+
+
+def _matches(recipe, tokens):
+    """Guard against stale index entries: re-check the row's own title."""
+
+    title_tokens = set(tokenize(recipe.title))
+    return all(t in title_tokens for t in tokens)
+
+
+def _seek(query, score, direction, key):
+    """Order `query` by ``(-score, id)`` and seek past a cursor key."""
+
+    if key is not None:
+        neg_score, last_id = key
+        # repr() of a float with at most 9 decimals gives back those digits.
+        rank = db.literal(Decimal(repr(-neg_score)), SCORE_TYPE)
+        if direction == BEFORE:
+            query = query.filter(db.or_(score > rank,
+                                        db.and_(score == rank, Recipe.id < last_id)))
+        else:
+            query = query.filter(db.or_(score < rank,
+                                        db.and_(score == rank, Recipe.id > last_id)))
+    if direction == BEFORE:
+        return query.order_by(score.asc(), Recipe.id.desc())
+    return query.order_by(score.desc(), Recipe.id)
+
+
+def _search_postgres(query, direction, key, per_page, diets, match_all):
+    config = db.literal_column("'english'")
+    vector = db.func.to_tsvector(config, Recipe.title)
+    tsquery = db.func.plainto_tsquery(config, query)
+    score = db.cast(db.func.ts_rank(vector, tsquery), SCORE_TYPE)
+
+    diet_filter = (db.and_ if match_all else db.or_)(*[getattr(Recipe, d).is_(True) for d in diets])
+
+    matched = Recipe.query.filter(vector.op("@@")(tsquery))
+    if diets:
+        matched = matched.filter(diet_filter)
+    total = matched.count()
+    if not total:
+        # Nothing matched the stemmed words: try trigram similarity for typos.
+        score = db.cast(db.func.similarity(Recipe.title, query), SCORE_TYPE)
+        matched = Recipe.query.filter(Recipe.title.op("%")(query))
+        if diets:
+            matched = matched.filter(diet_filter)
+        total = matched.count()
+
+    rows = _seek(matched.add_columns(score), score, direction, key).limit(per_page + 1).all()
+    page = make_page(rows, per_page, direction, key,
+                     lambda row: [-float(row[1]), row[0].id], total=total)
+    page.items = [recipe for recipe, _ in page.items]
+    return page
+
+
+def _search_local(query, direction, key, per_page, diets, match_all):
+    if not title_index.built:
+        title_index.build(db.session.query(Recipe.id, Recipe.title).yield_per(10000))
+
+    key = tuple(key) if key is not None else None
+    keys, total = title_index.search(
+        query,
+        after=key if direction == AFTER else None,
+        before=key if direction == BEFORE else None,
+        limit=per_page + 1,
+        allowed=matching_bitmap(diets, match_all) if diets else None,
+    )
+    page = make_page(keys, per_page, direction, key, list, total=total)
+
+    ids = [recipe_id for _, recipe_id in page.items]
+    tokens = tokenize(query)
+    by_id = {r.id: r for r in Recipe.query.filter(Recipe.id.in_(ids))} if ids else {}
+    page.items = [by_id[i] for i in ids
+                  if i in by_id and _matches(by_id[i], tokens)
+                  and has_diets(by_id[i], diets, match_all)]
+    return page
+
+
+def _valid_key(key):
+    return (isinstance(key, list) and len(key) == 2
+            and isinstance(key[0], (int, float)) and isinstance(key[1], int))
+
+
+def search_recipes(query, cursor=None, per_page=20, diets=(), match_all=True):
+    """Find recipes whose title matches `query`, ranked by relevance.
+
+    `diets` optionally restricts results to recipes having all (or, with
+    ``match_all=False``, any) of the given diet flags.
+
+    Returns a Page; its cursors seek on the ``(-rank, id)`` sort key.
+    """
+
+    direction, key = decode_cursor(cursor)
+    if not _valid_key(key):
+        direction, key = AFTER, None
+
+    if _uses_postgres():
+        return _search_postgres(query, direction, key, per_page, diets, match_all)
+    return _search_local(query, direction, key, per_page, diets, match_all)
+
+
+def index_recipes(rows):
+    """Add rows written with bulk statements (which skip ORM events)."""
+
+    for row in rows:
+        title_index.add(row["id"], row["title"])
+
+
+@event.listens_for(Recipe, "after_insert")
+def _index_inserted(mapper, connection, target):
+    title_index.add(target.id, target.title)
+
+
+@event.listens_for(Recipe, "after_update")
+def _index_updated(mapper, connection, target):
+    title_index.add(target.id, target.title)
+
+
+@event.listens_for(Recipe, "after_delete")
+def _index_deleted(mapper, connection, target):
+    title_index.remove(target.id)
+
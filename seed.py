@@ -1,15 +1,27 @@
-import os
-import pdb
-import requests
-from app import app
-from models import db, Recipe
-from dotenv import load_dotenv
+"""Seed the Yummpy database.
 
-load_dotenv() # Load the .env file
+    python seed.py                  # up to 100 API recipes (placeholders if the API is down)
+    python seed.py --resume         # keep existing rows, fetch only missing API recipes
+    python seed.py --bulk --recipes 1000000 --users 10000 --favorites 500000
+    python seed.py --bulk --jsonl recipes.jsonl --users 1000 --favorites 20000
+    python seed.py --bulk --top-up --recipes 100000   # add to the existing data
 
-API_KEY = os.getenv("API_KEY")
+API seeding and fresh bulk loads wipe the database first; ``--resume`` and
+``--top-up`` never do.  Bulk-loaded users all have the password "password".
+"""
 
-BASE_URL = 'https://api.spoonacular.com/recipes'
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+from models import db, Recipe, RecipeDetail, User, Favorites, passwords
+import bulk_load
+import details
+import spoonacular
+
+CHUNK_SIZE = 25   # ids per informationBulk call
+WORKERS = 4       # concurrent API calls
+BATCH_SIZE = 50   # rows per insert/commit
 
 # Define placeholder recipes
 PLACEHOLDER_RECIPES = [
@@ -35,70 +47,168 @@ PLACEHOLDER_RECIPES = [
     {"id": 20, "title": "Greek Salad", "image": "https://cdn.loveandlemons.com/wp-content/uploads/2019/07/greek-salad-2.jpg"}
 ]
 
-with app.app_context():
-    db.drop_all()
-    db.create_all()
-
-    def fetch_recipe_ids():
-        """Fetch recipe IDs from the Spoonacular API."""
-        url = f"{BASE_URL}/complexSearch"
-        params = {
-            "apiKey": API_KEY,
-            "number": 100 # Specify the number of recipes you want to fetch
-        }
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            recipe_ids = [recipe["id"] for recipe in data.get("results", [])]
-            print(f"Fetched {len(recipe_ids)} recipe IDs")
-            return recipe_ids
-        else:
-            print("API unavailable, using placeholder recipes.")
-            return None
-
-    def fetch_recipe_info(recipe_id):
-        """Fetch detailed information for a recipe by its ID."""
-        url = f"{BASE_URL}/{recipe_id}/information"
-        params = {"apiKey": API_KEY}
-        response = requests.get(url, params=params)
-        return response.json()
-
-    def seed_recipes():
-        """Seed recipe data into the database."""
-        recipe_ids = fetch_recipe_ids()
-        
-        if recipe_ids:
-            for recipe_id in recipe_ids:
-                recipe_info = fetch_recipe_info(recipe_id)
-                
-                # Parse the recipe information as needed
-                recipe = Recipe(
-                    title=recipe_info["title"],
-                    image=recipe_info["image"],
-                    vegetarian=recipe_info.get("vegetarian", False),
-                    ketogenic=recipe_info.get("ketogenic", False),
-                    vegan=recipe_info.get("vegan", False)
-                )
-                db.session.add(recipe)
-            db.session.commit()
-        else:
-            # If API is unavailable, add placeholder recipes
-            for placeholder in PLACEHOLDER_RECIPES:
-                recipe = Recipe(
-                    title=placeholder["title"],
-                    image=placeholder["image"],
-                    vegetarian=placeholder.get("vegetarian", False),
-                    ketogenic=placeholder.get("ketogenic", False),
-                    vegan=placeholder.get("vegan", False)
-                )
-                db.session.add(recipe)
-            db.session.commit()
-
-        print("Database seeded successfully!")
 
+def fetch_recipe_ids():
+    """Fetch recipe IDs from the Spoonacular API."""
+    params = {
+        "number": 100 # Specify the number of recipes you want to fetch
+    }
     try:
-        seed_recipes()
-    except Exception as e:
-        pdb
-        print(f"Error seeding database: {e}")
\ No newline at end of file
+        data = spoonacular.get("/complexSearch", params)
+    except spoonacular.SpoonacularError:
+        print("API unavailable, using placeholder recipes.")
+        return None
+
+    recipe_ids = [recipe["id"] for recipe in data.get("results", [])]
+    print(f"Fetched {len(recipe_ids)} recipe IDs")
+    return recipe_ids
+
+
+def fetch_recipe_chunk(recipe_ids):
+    """Fetch details for a chunk of IDs in one informationBulk call.
+
+    A failed chunk is reported and skipped; run again with --resume
+    to pick it up.
+    """
+    try:
+        return spoonacular.recipe_information_bulk(recipe_ids, nutrition=True)
+    except spoonacular.SpoonacularError as e:
+        print(f"Skipping {len(recipe_ids)} recipes: {e}")
+        return []
+
+
+def fetch_recipe_infos(recipe_ids):
+    """Yield recipe details, fetching chunks concurrently with a bounded pool."""
+    chunks = [recipe_ids[i:i + CHUNK_SIZE] for i in range(0, len(recipe_ids), CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for infos in pool.map(fetch_recipe_chunk, chunks):
+            yield from infos
+
+
+def store_batch(batch, infos=()):
+    """Upsert a batch of recipe rows, and the details from their `infos`, and commit."""
+    Recipe.upsert_many(batch)
+    RecipeDetail.upsert_many([{"recipe_id": info["id"], "data": details.compact(info)}
+                              for info in infos])
+    db.session.commit()
+
+
+def seed_recipes(resume=False):
+    """Seed recipe data into the database."""
+    recipe_ids = fetch_recipe_ids()
+
+    if recipe_ids:
+        existing = {id for (id,) in db.session.query(Recipe.id).filter(Recipe.id.in_(recipe_ids))}
+        missing = [id for id in recipe_ids if id not in existing]
+        if existing:
+            print(f"{len(existing)} recipes already stored, fetching {len(missing)}")
+
+        start = time.perf_counter()
+        stored = 0
+        batch = []
+        infos = []
+        for recipe_info in fetch_recipe_infos(missing):
+            infos.append(recipe_info)
+            # Parse the recipe information as needed
+            batch.append(dict(
+                id=recipe_info["id"],
+                title=recipe_info["title"],
+                image=recipe_info.get("image", ""),
+                vegetarian=recipe_info.get("vegetarian", False),
+                ketogenic=recipe_info.get("ketogenic", False),
+                vegan=recipe_info.get("vegan", False)
+            ))
+            if len(batch) >= BATCH_SIZE:
+                store_batch(batch, infos)
+                stored += len(batch)
+                batch = []
+                infos = []
+        if batch:
+            store_batch(batch, infos)
+            stored += len(batch)
+
+        elapsed = time.perf_counter() - start
+        print(f"Stored {stored} recipes in {elapsed:.2f}s "
+              f"({stored / elapsed if elapsed else 0:.1f} recipes/sec)")
+    elif resume and Recipe.query.first():
+        print("API unavailable, keeping existing recipes.")
+    else:
+        # If API is unavailable, add placeholder recipes
+        for placeholder in PLACEHOLDER_RECIPES:
+            recipe = Recipe(
+                title=placeholder["title"],
+                image=placeholder["image"],
+                vegetarian=placeholder.get("vegetarian", False),
+                ketogenic=placeholder.get("ketogenic", False),
+                vegan=placeholder.get("vegan", False)
+            )
+            db.session.add(recipe)
+        db.session.commit()
+
+    print("Database seeded successfully!")
+
+
+def bulk_seed(args):
+    """Load generated or JSONL recipes plus synthetic users and favorites."""
+
+    recipe_start = bulk_load.next_id(Recipe, 0 if args.jsonl else args.recipes)
+    user_start = bulk_load.next_id(User)
+    if args.jsonl:
+        recipes = bulk_load.recipes_from_jsonl(args.jsonl)
+    else:
+        recipes = bulk_load.synthetic_recipes(args.recipes, start_id=recipe_start, seed=recipe_start)
+    password_hash = passwords.hash("password")
+
+    start = time.perf_counter()
+    total = bulk_load.timed_load(Recipe, recipes)
+    total += bulk_load.timed_load(User, bulk_load.synthetic_users(
+        args.users, start_id=user_start, password_hash=password_hash))
+    if args.favorites:
+        user_ids = list(range(user_start, user_start + args.users))
+        recipe_ids = [id for (id,) in db.session.query(Recipe.id)]
+        total += bulk_load.timed_load(Favorites, bulk_load.synthetic_favorites(
+            user_ids, recipe_ids, args.favorites, seed=user_start))
+    bulk_load.reset_sequences()
+
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {total:,} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the Yummpy database.")
+    parser.add_argument("--resume", action="store_true",
+                        help="keep existing rows and only fetch recipes not stored yet")
+    parser.add_argument("--bulk", action="store_true",
+                        help="bulk-load synthetic (or --jsonl) data instead of calling the API")
+    parser.add_argument("--top-up", action="store_true",
+                        help="with --bulk: add to the existing data instead of wiping it")
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--jsonl", help="with --bulk: load recipes from this JSONL file")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--favorites", type=int, default=50_000)
+    args = parser.parse_args()
+
+    app = create_app(SUGGEST_WARM=False, DIET_INDEX_WARM=False)
+    with app.app_context():
+        if args.bulk:
+            if args.top_up:
+                db.create_all()
+                bulk_seed(args)
+            else:
+                db.drop_all()
+                db.create_all()
+                with bulk_load.deferred_indexes():
+                    bulk_seed(args)
+            return
+
+        if not args.resume:
+            db.drop_all()
+        db.create_all()
+        try:
+            seed_recipes(args.resume)
+        except Exception as e:
+            print(f"Error seeding database: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Spoonacular API access for Yummpy.
+
+All calls go through one pooled ``requests.Session`` with connect/read
+timeouts, a few retries with jittered exponential backoff, and a circuit
+breaker that fails fast while the API is down so views can fall back to
+local results.  Per-endpoint latency is recorded for monitoring.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+import profiler
+from cache import ResponseCache
+from latency import percentile_ms
+
+load_dotenv() # Load the .env file
+
+API_KEY = os.getenv("API_KEY")
+
+BASE_URL = os.getenv("SPOONACULAR_BASE_URL", "https://api.spoonacular.com/recipes")
+
+CONNECT_TIMEOUT = float(os.getenv("SPOONACULAR_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("SPOONACULAR_READ_TIMEOUT", 10))
+MAX_RETRIES = int(os.getenv("SPOONACULAR_MAX_RETRIES", 2))
+BACKOFF = float(os.getenv("SPOONACULAR_BACKOFF", 0.25))
+POOL_SIZE = int(os.getenv("SPOONACULAR_POOL_SIZE", 20))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that mean the API is unusable for everyone (402: quota used up).
+BREAKER_STATUSES = RETRY_STATUSES | {402}
+
+
+class SpoonacularError(Exception):
+    """The API could not be reached or returned an error."""
+
+
+class CircuitOpenError(SpoonacularError):
+    """The circuit breaker is open; the API was not called."""
+
+
+class CircuitBreaker:
+    """Open after `threshold` consecutive failures, retry after `cooldown` seconds.
+
+    Once the cooldown has passed a single trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+    def reset(self):
+        self.record_success()
+
+
+class EndpointMetrics:
+    """Call counts and latency samples per endpoint."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _stats(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = {
+                "calls": 0, "errors": 0, "retries": 0, "rejected": 0,
+                "samples": deque(maxlen=self.window),
+            }
+        return stats
+
+    def record(self, endpoint, seconds, ok, retries=0):
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats["calls"] += 1
+            stats["retries"] += retries
+            stats["samples"].append(seconds)
+            if not ok:
+                stats["errors"] += 1
+
+    def record_rejected(self, endpoint):
+        with self._lock:
+            self._stats(endpoint)["rejected"] += 1
+
+    def snapshot(self):
+        """Summary per endpoint, with latency percentiles in milliseconds."""
+
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._endpoints.items():
+                samples = sorted(stats["samples"])
+                summary = {k: v for k, v in stats.items() if k != "samples"}
+                for name, pct in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+                    summary[name] = percentile_ms(samples, pct)
+                summary["max_ms"] = round(samples[-1] * 1000, 2) if samples else None
+                result[endpoint] = summary
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+http = _make_session()
+breaker = CircuitBreaker(
+    threshold=int(os.getenv("SPOONACULAR_BREAKER_THRESHOLD", 5)),
+    cooldown=float(os.getenv("SPOONACULAR_BREAKER_COOLDOWN", 30)),
+)
+metrics = EndpointMetrics()
+
+# Searches are refreshed after SEARCH_CACHE_TTL; until then, and for up to
+# SEARCH_CACHE_MAX_STALE more while a refresh runs, results come from here.
+SEARCH_TTL = int(os.getenv("SEARCH_CACHE_TTL", 24 * 3600))
+search_cache = ResponseCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", 1024)),
+    ttl=SEARCH_TTL + int(os.getenv("SEARCH_CACHE_MAX_STALE", 7 * 24 * 3600)),
+    stale_after=SEARCH_TTL,
+)
+
+
+def _endpoint_name(path):
+    """'/123/information' -> 'information', for grouping metrics."""
+
+    return "/".join(p for p in path.strip("/").split("/") if not p.isdigit()) or "/"
+
+
+def get(path, params=None):
+    """GET ``BASE_URL + path`` and return the decoded JSON body.
+
+    Raises SpoonacularError (or CircuitOpenError) when no usable response
+    could be obtained.
+    """
+
+    endpoint = _endpoint_name(path)
+    if not breaker.allow():
+        metrics.record_rejected(endpoint)
+        raise CircuitOpenError(f"Spoonacular circuit open, skipped {endpoint}")
+
+    params = dict(params or {}, apiKey=API_KEY)
+    start = time.perf_counter()
+    response = error = None
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(random.uniform(0, BACKOFF * 2 ** attempt))
+        try:
+            response = http.get(f"{BASE_URL}{path}", params=params,
+                                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except requests.RequestException as e:
+            response, error = None, SpoonacularError(f"{endpoint}: {e}")
+            continue
+
+        if response.status_code == 200:
+            breaker.record_success()
+            metrics.record(endpoint, time.perf_counter() - start, True, attempt)
+            profiler.add_time("api", time.perf_counter() - start)
+            return response.json()
+
+        error = SpoonacularError(f"{endpoint}: HTTP {response.status_code}")
+        if response.status_code not in RETRY_STATUSES:
+            break
+
+    if response is None or response.status_code in BREAKER_STATUSES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    metrics.record(endpoint, time.perf_counter() - start, False, attempt)
+    profiler.add_time("api", time.perf_counter() - start)
+    raise error
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so equivalent searches share a key."""
+
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+def cached_search(query):
+    """``(results, stale)`` for `query` from the search cache; never calls the API."""
+
+    return search_cache.lookup(f"complexSearch:{normalize_query(query)}")
+
+
+def refresh_search(query):
+    """Search the API for `query` and cache the results, replacing stale ones.
+
+    Returns the results; raises SpoonacularError if the call failed.
+    """
+
+    query = normalize_query(query)
+    results = get("/complexSearch", {"query": query}).get("results", [])
+    search_cache.set(f"complexSearch:{query}", results)
+    return results
+
+
+def recipe_information(recipe_id, nutrition=False):
+    """Full details (ingredients, instructions, diet flags) for one recipe."""
+
+    return get(f"/{recipe_id}/information", {"includeNutrition": "true"} if nutrition else None)
+
+
+def recipe_information_bulk(recipe_ids, nutrition=False):
+    """Details for several recipes in one call (Spoonacular's informationBulk)."""
+
+    params = {"ids": ",".join(str(i) for i in recipe_ids)}
+    if nutrition:
+        params["includeNutrition"] = "true"
+    return get("/informationBulk", params)
@@ -9,17 +9,46 @@ favoriteForms.forEach(form => {
     const button = form.querySelector("button");
     const recipeId = button.dataset.recipeId;
 
-    const response = await fetch(`/recipes/${recipeId}/favorites`, {
+    const response = await fetch(`/api/recipes/${recipeId}/favorite`, {
         method: "POST",
+        headers: { "Accept": "application/json" },
       });
 
     if (response.ok) {
-        // Toggle the button class between primary and secondary
-        button.classList.toggle("btn-primary");
-        button.classList.toggle("btn-secondary");
+        // Reflect the server's state rather than blindly flipping the button
+        const { favorited } = await response.json();
+        button.classList.toggle("btn-primary", favorited);
+        button.classList.toggle("btn-secondary", !favorited);
     } else {
         console.error("Failed to toggle favorite status.");
       }
    
   });
 });
+
+// Search-as-you-type: fill the search box's datalist from /recipes/suggest
+const searchInput = document.getElementById("search");
+const searchSuggestions = document.getElementById("search-suggestions");
+
+if (searchInput && searchSuggestions) {
+  let timer;
+  let pending;
+
+  searchInput.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(async () => {
+      const prefix = searchInput.value;
+      if (pending) pending.abort();
+      pending = new AbortController();
+      try {
+        const response = await fetch(`/recipes/suggest?prefix=${encodeURIComponent(prefix)}`,
+                                     { signal: pending.signal });
+        if (!response.ok) return;
+        const { suggestions } = await response.json();
+        searchSuggestions.replaceChildren(...suggestions.map(text => new Option(text)));
+      } catch (e) {
+        if (e.name !== "AbortError") console.error("Failed to fetch suggestions.");
+      }
+    }, 100);
+  });
+}
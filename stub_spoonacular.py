@@ -0,0 +1,147 @@
+"""A local stand-in for the Spoonacular API, for tests and benchmarks.
+
+    python stub_spoonacular.py --port 8099 --latency 0.5
+
+then point the app at it with
+``SPOONACULAR_BASE_URL=http://127.0.0.1:8099/recipes``.  It doubles as an
+image origin for the thumbnail proxy: ``add_image`` serves bytes at a path.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubSpoonacular:
+    """Serves fake complexSearch / information responses on a local port."""
+
+    def __init__(self, port=0, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = []
+        self.images = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/recipes"
+
+    def add_image(self, path, data, content_type="image/jpeg"):
+        """Serve `data` at `path`; returns its URL."""
+
+        self.images[path] = (data, content_type)
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, endpoint):
+        with self._lock:
+            return sum(1 for path in self.calls if path.endswith(endpoint))
+
+    def _record(self, path):
+        with self._lock:
+            self.calls.append(path)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                stub._record(url.path)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.fail:
+                    return self._send(503, {"status": "failure"})
+
+                if url.path in stub.images:
+                    return self._send_bytes(200, *stub.images[url.path])
+
+                parts = url.path.strip("/").split("/")
+                if parts[-1] == "complexSearch":
+                    return self._send(200, stub.complex_search(params))
+                if parts[-1] == "informationBulk":
+                    ids = [int(i) for i in params.get("ids", "").split(",") if i]
+                    return self._send(200, [stub.information(i) for i in ids])
+                if parts[-1] == "information" and parts[-2].isdigit():
+                    return self._send(200, stub.information(int(parts[-2])))
+                return self._send(404, {"status": "failure", "message": "not found"})
+
+            def _send(self, status, body):
+                self._send_bytes(status, json.dumps(body).encode(), "application/json")
+
+            def _send_bytes(self, status, payload, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def complex_search(self, params):
+        query = params.get("query", "")
+        number = int(params.get("number", 10))
+        offset = int(params.get("offset", 0))
+        base = 500000 + (sum(map(ord, query)) % 1000) * 1000
+        results = [
+            {
+                "id": base + offset + i,
+                "title": f"{query.title()} Recipe {offset + i + 1}".strip(),
+                "image": f"https://img.spoonacular.com/recipes/{base + offset + i}-312x231.jpg",
+                "imageType": "jpg",
+            }
+            for i in range(number)
+        ]
+        return {"results": results, "offset": offset, "number": number, "totalResults": 1000}
+
+    def information(self, recipe_id):
+        return {
+            "id": recipe_id,
+            "title": f"Stub Recipe {recipe_id}",
+            "image": f"https://img.spoonacular.com/recipes/{recipe_id}-556x370.jpg",
+            "vegetarian": recipe_id % 3 == 0,
+            "vegan": recipe_id % 6 == 0,
+            "ketogenic": recipe_id % 5 == 0,
+            "readyInMinutes": 30,
+            "servings": 4,
+            "extendedIngredients": [
+                {"id": 1, "name": "salt", "original": "1 tsp salt"},
+                {"id": 2, "name": "olive oil", "original": "2 tbsp olive oil"},
+            ],
+            "analyzedInstructions": [
+                {"steps": [{"number": 1, "step": "Mix everything."},
+                           {"number": 2, "step": "Cook until done."}]}
+            ],
+            "nutrition": {"nutrients": [{"name": "Calories", "amount": 420, "unit": "kcal"}]},
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubSpoonacular(port=args.port, latency=args.latency)
+    print(f"Stub Spoonacular listening on {stub.base_url}")
+    stub.server.serve_forever()
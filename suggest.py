@@ -0,0 +1,264 @@
+"""Search-as-you-type suggestions from an in-memory prefix index.
+
+``/recipes/suggest?prefix=chicken cu`` completes the last word typed from
+the words of recipe titles, most popular first, keeping the words before
+it.  A word weighs one per title using it plus the favorites of those
+recipes.
+
+The vocabulary is a sorted list of words with a parallel array of
+weights, so a prefix is a bisect range and memory grows with the number of
+distinct words rather than titles.  The best completions of long ranges
+(short prefixes) are memoized until a word under them changes.
+
+The index is only ever built by a background job (jobs.py), queued when
+the app starts (SUGGEST_WARM) and again whenever a lookup finds it
+missing; until it is built, lookups answer with no suggestions rather
+than wait.  ORM inserts, edits and deletes update it in place when their
+transaction commits (rolled-back ones never reach it); the job rebuilds
+it every SUGGEST_MAX_AGE seconds to pick up favorites and other workers'
+writes.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import time
+from array import array
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Recipe, Favorites, invalidate_on_bulk_write
+import jobs
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+MIN_LENGTH = 2  # shorter words are never suggested
+MAX_LIMIT = 20
+MEMO_RANGE = 512  # prefixes matching more words than this are memoized
+
+
+def words(text):
+    """The distinct lowercase words of `text` that can be suggested."""
+
+    return {w for w in _WORD_RE.findall((text or "").lower()) if len(w) >= MIN_LENGTH}
+
+
+class PrefixIndex:
+    """Sorted words with a parallel array of weights."""
+
+    def __init__(self, max_age=3600):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._words = []
+        self._weights = array("q")
+        self._memo = {}
+        self._built_at = None
+
+    def __len__(self):
+        return len(self._words)
+
+    @property
+    def built(self):
+        return self._built_at is not None
+
+    @property
+    def fresh(self):
+        return self.built and time.monotonic() - self._built_at < self.max_age
+
+    def invalidate(self):
+        """Rebuild before the next lookup."""
+
+        with self._lock:
+            self._built_at = None
+
+    def build(self, rows):
+        """(Re)build from ``(title, weight)`` rows."""
+
+        counts = {}
+        for title, weight in rows:
+            for word in words(title):
+                counts[word] = counts.get(word, 0) + weight
+        ordered = sorted(counts)
+        weights = array("q", map(counts.__getitem__, ordered))
+        with self._lock:
+            self._words = ordered
+            self._weights = weights
+            self._memo = {}
+            self._built_at = time.monotonic()
+
+    def add(self, title, weight=1):
+        self._adjust(words(title), weight)
+
+    def remove(self, title, weight=1):
+        self._adjust(words(title), -weight)
+
+    def add_missing(self, titles):
+        """Index the words of `titles` not indexed yet, leaving known words alone.
+
+        For rows upserted in bulk, which may or may not be new.
+        """
+
+        self._adjust(set().union(*map(words, titles)), 1, only_new=True)
+
+    def _adjust(self, changed, delta, only_new=False):
+        with self._lock:
+            if not self.built:
+                return
+            for word in changed:
+                i = bisect.bisect_left(self._words, word)
+                if i < len(self._words) and self._words[i] == word:
+                    if only_new:
+                        continue
+                    weight = self._weights[i] + delta
+                    if weight > 0:
+                        self._weights[i] = weight
+                    else:
+                        del self._words[i]
+                        del self._weights[i]
+                elif delta > 0:
+                    self._words.insert(i, word)
+                    self._weights.insert(i, delta)
+                else:
+                    continue
+                for n in range(1, len(word) + 1):
+                    self._memo.pop(word[:n], None)
+
+    def complete(self, prefix, limit=8):
+        """Up to `limit` indexed words starting with `prefix`, heaviest first."""
+
+        limit = min(limit, MAX_LIMIT)
+        with self._lock:
+            best = self._memo.get(prefix)
+            if best is not None:
+                return list(best[:limit])
+
+            lo = bisect.bisect_left(self._words, prefix)
+            hi = bisect.bisect_left(self._words, prefix + "\U0010ffff", lo)
+            if hi - lo <= MEMO_RANGE:
+                return self._heaviest(lo, hi, limit)
+            best = self._memo[prefix] = tuple(self._heaviest(lo, hi, MAX_LIMIT))
+            return list(best[:limit])
+
+    def _heaviest(self, lo, hi, limit):
+        # nlargest is stable, so equal weights stay in alphabetical order.
+        return [self._words[i]
+                for i in heapq.nlargest(limit, range(lo, hi), key=self._weights.__getitem__)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "words": len(self._words),
+                "memoized": len(self._memo),
+                "age": round(time.monotonic() - self._built_at) if self.built else None,
+            }
+
+
+suggest_index = PrefixIndex()
+invalidate_on_bulk_write(suggest_index.invalidate)
+_build_lock = threading.Lock()
+
+
+def _build():
+    weight = 1 + db.func.count(Favorites.id)
+    suggest_index.build(db.session.query(Recipe.title, weight)
+                        .outerjoin(Favorites, Favorites.recipe_id == Recipe.id)
+                        .group_by(Recipe.id).yield_per(10000))
+
+
+@jobs.queue.handler("suggest")
+def rebuild():
+    """Job: rebuild the index from the database, unless another build just did."""
+
+    with _build_lock:
+        if not suggest_index.fresh:
+            _build()
+
+
+def ensure_built():
+    """Whether the index can answer; queues a rebuild if it is missing or old."""
+
+    if not suggest_index.fresh:
+        jobs.queue.enqueue("suggest", "rebuild")
+    return suggest_index.built
+
+
+def init_app(app):
+    suggest_index.max_age = app.config.get("SUGGEST_MAX_AGE", 3600)
+    if app.config.get("SUGGEST_WARM", True):
+        with app.app_context():
+            jobs.queue.enqueue("suggest", "rebuild")
+
+
+def suggest(text, limit=8):
+    """Completions of `text` (the words before the last one kept as typed)."""
+
+    text = text.lower()
+    if not _WORD_RE.fullmatch(text[-1:]):
+        return []  # the last word is finished
+    head, _, partial = " ".join(_WORD_RE.findall(text)).rpartition(" ")
+    if not partial:
+        return []
+
+    if not ensure_built():
+        return []
+    lead = f"{head} " if head else ""
+    return [lead + word for word in suggest_index.complete(partial, limit)]
+
+
+def index_recipes(rows):
+    """Add the new words of rows written with bulk statements (which skip ORM events)."""
+
+    suggest_index.add_missing(row["title"] for row in rows)
+
+
+def _stage(target, title, delta):
+    """Queue a change to the index until the flushing session commits."""
+
+    object_session(target).info.setdefault("suggest_changes", []).append((title, delta))
+
+
+@event.listens_for(Recipe, "after_insert")
+def _index_inserted(mapper, connection, target):
+    _stage(target, target.title, 1)
+
+
+@event.listens_for(Recipe, "after_update")
+def _index_updated(mapper, connection, target):
+    history = inspect(target).attrs.title.history
+    if not history.has_changes():
+        return
+    for title in history.deleted:
+        _stage(target, title, -1)
+    _stage(target, target.title, 1)
+
+
+@event.listens_for(Recipe, "after_delete")
+def _index_deleted(mapper, connection, target):
+    # An expired title isn't loaded here; the next rebuild drops its words.
+    title = inspect(target).dict.get("title")
+    if title is not None:
+        _stage(target, title, -1)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_staged(session):
+    for title, delta in session.info.pop("suggest_changes", ()):
+        if delta > 0:
+            suggest_index.add(title, delta)
+        else:
+            suggest_index.remove(title, -delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_staged(session):
+    session.info.pop("suggest_changes", None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_unapplied(session, transaction):
+    # close() ends a transaction without a rollback event; its flushes are gone too.
+    if transaction.parent is None:
+        session.info.pop("suggest_changes", None)
+
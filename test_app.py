@@ -0,0 +1,45 @@
+"""App factory and configuration profile tests."""
+#    python -m unittest test_app.py
+
+
+import subprocess
+import sys
+from unittest import TestCase
+
+from app import create_app
+
+
+class AppFactoryTestCase(TestCase):
+    def test_import_has_no_side_effects(self):
+        """Importing the module builds no app and loads no dev-only extensions."""
+
+        out = subprocess.run(
+            [sys.executable, "-c",
+             "import sys, app; print(app._default_app is None, 'flask_debugtoolbar' in sys.modules)"],
+            capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.split(), ["True", "False"])
+        self.assertEqual(out.stderr, "")
+
+    def test_production_profile_is_lean(self):
+        app = create_app("production", SQLALCHEMY_DATABASE_URI="sqlite://")
+
+        self.assertFalse(app.config["SQLALCHEMY_ECHO"])
+        self.assertFalse(app.debug)
+        self.assertNotIn("flask_debugtoolbar", {f.__module__ for f in app.after_request_funcs.get(None, [])})
+
+    def test_development_profile_loads_toolbar(self):
+        app = create_app("development", SQLALCHEMY_DATABASE_URI="sqlite://", SECRET_KEY="dev")
+
+        self.assertTrue(app.config["SQLALCHEMY_ECHO"])
+        self.assertIn("flask_debugtoolbar", {f.__module__ for f in app.after_request_funcs.get(None, [])})
+
+    def test_testing_profile(self):
+        app = create_app("testing")
+
+        self.assertTrue(app.testing)
+        self.assertEqual(app.config["BCRYPT_LOG_ROUNDS"], 4)
+
+    def test_overrides_win(self):
+        app = create_app("testing", PAGE_SIZE=7)
+
+        self.assertEqual(app.config["PAGE_SIZE"], 7)
@@ -0,0 +1,70 @@
+"""Fingerprinted static asset tests."""
+#    python -m unittest test_assets.py
+
+
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import assets
+
+from app import create_app
+
+app = create_app("testing")
+
+CSS = b"body { color: red; }\n" * 50
+
+
+class AssetsTestCase(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, "stylesheets"))
+        with open(os.path.join(self.folder, "stylesheets", "style.css"), "wb") as f:
+            f.write(CSS)
+        self.saved = app.static_folder, app.extensions["assets"]
+        app.static_folder = self.folder
+        app.extensions["assets"] = assets.build(self.folder)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.static_folder, app.extensions["assets"] = self.saved
+        shutil.rmtree(self.folder)
+
+    def test_build_fingerprints_and_compresses(self):
+        hashed = app.extensions["assets"]["stylesheets/style.css"]
+        self.assertRegex(hashed, r"^stylesheets/style\.[0-9a-f]{12}\.css$")
+        with open(os.path.join(self.folder, "dist", hashed + ".gz"), "rb") as f:
+            self.assertEqual(gzip.decompress(f.read()), CSS)
+
+        # Rebuilding unchanged sources gives the same names and doesn't pick up dist/.
+        self.assertEqual(assets.build(self.folder), app.extensions["assets"])
+
+    def test_asset_url(self):
+        with app.test_request_context():
+            self.assertTrue(assets.asset_url("stylesheets/style.css").startswith("/assets/stylesheets/style."))
+            self.assertEqual(assets.asset_url("js/app.js"), "/static/js/app.js")
+
+    def test_serves_best_encoding_as_immutable(self):
+        url = "/assets/" + app.extensions["assets"]["stylesheets/style.css"]
+
+        resp = self.client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertEqual(resp.mimetype, "text/css")
+        self.assertEqual(gzip.decompress(resp.data), CSS)
+        self.assertIn("immutable", resp.headers["Cache-Control"])
+        self.assertIn("max-age=31536000", resp.headers["Cache-Control"])
+        self.assertIn("Accept-Encoding", resp.headers["Vary"])
+        resp.close()
+
+        resp = self.client.get(url)
+        self.assertNotIn("Content-Encoding", resp.headers)
+        self.assertEqual(resp.data, CSS)
+        resp.close()
+
+    def test_rejects_unknown_paths(self):
+        self.assertEqual(self.client.get("/assets/manifest.json").status_code, 404)
+        self.assertEqual(self.client.get("/assets/../stylesheets/style.css").status_code, 404)
+        self.assertEqual(self.client.get("/assets/nope.css").status_code, 404)
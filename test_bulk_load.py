@@ -0,0 +1,103 @@
+"""Bulk loader tests."""
+#    python -m unittest test_bulk_load.py
+
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from models import db, User, Recipe, Favorites, RECIPE_SEARCH_INDEXES
+from id_allocator import USER_RECIPE_ID_START
+import bulk_load
+
+from app import create_app
+
+app = create_app("testing")
+
+
+class BulkLoadTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        db.session.commit()
+
+    def test_load_and_top_up(self):
+        loaded = bulk_load.load_rows(Recipe, bulk_load.synthetic_recipes(250), batch_size=100)
+        self.assertEqual(loaded, 250)
+
+        start = bulk_load.next_id(Recipe)
+        bulk_load.load_rows(Recipe, bulk_load.synthetic_recipes(50, start_id=start))
+        self.assertEqual(Recipe.query.count(), 300)
+        self.assertEqual(bulk_load.next_id(Recipe), 301)
+
+    def test_top_up_stays_below_user_recipe_ids(self):
+        bulk_load.load_rows(Recipe, bulk_load.synthetic_recipes(10))
+        db.session.add(Recipe(id=USER_RECIPE_ID_START + 7, title="Mine", image=""))
+        db.session.commit()
+
+        self.assertEqual(bulk_load.next_id(Recipe, 100), 11)
+        with self.assertRaises(ValueError):
+            bulk_load.next_id(Recipe, USER_RECIPE_ID_START)
+
+    def test_indexes_come_back_after_a_failed_load(self):
+        def index_names():
+            return {index["name"] for index in db.inspect(db.engine).get_indexes("recipes")}
+
+        before = index_names()
+        with self.assertRaises(ValueError):
+            with bulk_load.deferred_indexes():
+                db.session.add(Recipe(id=1, title="Half loaded", image=""))
+                db.session.flush()
+                raise ValueError("bad row")
+        self.assertEqual(Recipe.query.count(), 0)
+        self.assertEqual(index_names(), before)
+        if db.engine.dialect.name == "postgresql":
+            self.assertLessEqual(set(RECIPE_SEARCH_INDEXES), before)
+
+    def test_favorites_are_unique_and_reference_loaded_rows(self):
+        bulk_load.load_rows(Recipe, bulk_load.synthetic_recipes(40))
+        bulk_load.load_rows(User, bulk_load.synthetic_users(7, password_hash="x"))
+        user_ids = [id for (id,) in db.session.query(User.id)]
+        recipe_ids = [id for (id,) in db.session.query(Recipe.id)]
+
+        loaded = bulk_load.load_rows(
+            Favorites, bulk_load.synthetic_favorites(user_ids, recipe_ids, 100))
+
+        self.assertEqual(loaded, 100)
+        pairs = db.session.query(Favorites.user_id, Favorites.recipe_id).all()
+        self.assertEqual(len(set(pairs)), 100)
+        self.assertTrue(all(u in user_ids and r in recipe_ids for u, r in pairs))
+
+    def test_recipes_from_jsonl(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps({"id": 7, "title": "Soup", "vegan": True}) + "\n\n")
+            f.write(json.dumps({"id": 8, "title": "Stew", "image": "x.jpg"}) + "\n")
+        try:
+            bulk_load.load_rows(Recipe, bulk_load.recipes_from_jsonl(path))
+        finally:
+            os.remove(path)
+
+        self.assertEqual([(r.id, r.title, r.image, r.vegan) for r in Recipe.query.order_by(Recipe.id)],
+                         [(7, "Soup", "", True), (8, "Stew", "x.jpg", False)])
+
+    def test_copy_values_are_escaped(self):
+        self.assertEqual(bulk_load._copy_value(None), "\\N")
+        self.assertEqual(bulk_load._copy_value(True), "t")
+        self.assertEqual(bulk_load._copy_value("a\tb\nc\\d"), "a\\tb\\nc\\\\d")
@@ -0,0 +1,114 @@
+"""ETag / Last-Modified conditional response tests."""
+#    python -m unittest test_conditional.py
+
+
+from unittest import TestCase
+
+from models import db, User, Recipe, Favorites
+
+from app import create_app, CURR_USER_KEY, user_cache
+
+app = create_app("testing", SERVER_TIMING=True)
+
+
+class ConditionalResponseTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        self.user = User.signup("new", "user", "newuser", "newuser@test.com", "password")
+        db.session.add(Recipe(id=1, title="Tomato Soup", image="https://example.com/1.jpg", from_api=True))
+        db.session.commit()
+        user_cache.clear()
+        self.client = app.test_client()
+
+    def login(self):
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user.id
+
+    def test_recipe_info_revalidates(self):
+        self.login()
+        resp = self.client.get("/recipes/1/info")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("private", resp.headers["Cache-Control"])
+        self.assertIn("no-cache", resp.headers["Cache-Control"])
+        etag, last_modified = resp.headers["ETag"], resp.headers["Last-Modified"]
+
+        resp = self.client.get("/recipes/1/info", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.data, b"")
+        self.assertIn('tpl;dur=0.0,', resp.headers["Server-Timing"])
+
+        resp = self.client.get("/recipes/1/info", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_recipe_change_invalidates(self):
+        self.login()
+        etag = self.client.get("/recipes/1/info").headers["ETag"]
+
+        recipe = db.session.get(Recipe, 1)
+        recipe.title = "Tomato Bisque"
+        db.session.commit()
+
+        resp = self.client.get("/recipes/1/info", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Tomato Bisque", resp.data)
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+    def test_anonymous_listing_is_public(self):
+        resp = self.client.get("/recipes")
+        self.assertIn("public", resp.headers["Cache-Control"])
+        self.assertIn("max-age=60", resp.headers["Cache-Control"])
+        self.assertNotIn("Last-Modified", resp.headers)
+        etag = resp.headers["ETag"]
+
+        self.assertEqual(self.client.get("/recipes", headers={"If-None-Match": etag}).status_code, 304)
+
+        db.session.add(Recipe(id=2, title="Bean Stew", image="x"))
+        db.session.commit()
+        self.assertEqual(self.client.get("/recipes", headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_listing_etag_differs_when_logged_in(self):
+        anon = self.client.get("/recipes").headers["ETag"]
+        self.login()
+        resp = self.client.get("/recipes", headers={"If-None-Match": anon})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers["ETag"], anon)
+
+    def test_pending_flash_is_rendered(self):
+        self.login()
+        etag = self.client.get("/recipes/1/info").headers["ETag"]
+        with self.client.session_transaction() as sess:
+            sess["_flashes"] = [("success", "Saved!")]
+
+        resp = self.client.get("/recipes/1/info", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Saved!", resp.data)
+
+    def test_upsert_only_touches_changed_rows(self):
+        before = db.session.get(Recipe, 1).updated_at
+        Recipe.upsert_many([{"id": 1, "title": "Tomato Soup", "image": "https://example.com/1.jpg"}])
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Recipe, 1).updated_at, before)
+
+        Recipe.upsert_many([{"id": 1, "title": "Tomato Soup", "image": "https://example.com/2.jpg"}])
+        db.session.commit()
+        db.session.expire_all()
+        self.assertGreater(db.session.get(Recipe, 1).updated_at, before)
+        self.assertEqual(db.session.get(Recipe, 1).image, "https://example.com/2.jpg")
@@ -0,0 +1,93 @@
+"""Connection pool configuration and metrics tests."""
+#    python -m unittest test_db_pool.py
+
+
+import os
+import tempfile
+from unittest import TestCase
+
+from sqlalchemy import create_engine, exc, text
+
+from db_pool import PoolMetrics, TimedQueuePool, engine_options
+
+from app import create_app
+
+app = create_app("testing")
+
+
+class PoolMetricsTestCase(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.engine = create_engine(f"sqlite:///{self.path}", poolclass=TimedQueuePool,
+                                    pool_size=1, max_overflow=0, pool_timeout=0.05)
+        self.metrics = PoolMetrics(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_counts_checkouts_and_connections(self):
+        for _ in range(3):
+            with self.engine.connect() as conn:
+                conn.execute(text("select 1"))
+
+        stats = self.metrics.snapshot()
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertEqual(stats["connects"], 1)
+        self.assertEqual((stats["checked_out"], stats["idle"]), (0, 1))
+        self.assertIsNotNone(stats["wait_p50_ms"])
+
+    def test_reports_exhaustion(self):
+        with self.engine.connect():
+            self.assertEqual(self.metrics.snapshot()["checked_out"], 1)
+            with self.assertRaises(exc.TimeoutError):
+                self.engine.connect()
+
+        stats = self.metrics.snapshot()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertGreaterEqual(stats["wait_max_ms"], 50)
+
+    def test_metrics_survive_dispose(self):
+        with self.engine.connect():
+            pass
+        self.engine.dispose()
+        with self.engine.connect():
+            pass
+
+        stats = self.metrics.snapshot()
+        self.assertEqual((stats["checkouts"], stats["connects"]), (2, 2))
+        self.assertIsNotNone(stats["wait_max_ms"])
+
+    def test_engine_options(self):
+        options = engine_options({"SQLALCHEMY_DATABASE_URI": "postgresql:///x",
+                                  "DB_POOL_SIZE": 3, "DB_POOL_RECYCLE": 60})
+        self.assertEqual((options["pool_size"], options["pool_recycle"]), (3, 60))
+        self.assertTrue(options["pool_pre_ping"])
+
+        self.assertEqual(engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite://"}),
+                         {"pool_pre_ping": True})
+
+
+class InternalMetricsViewTestCase(TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config["INTERNAL_TOKEN"] = None
+
+    def test_loopback_only_without_token(self):
+        resp = self.client.get("/internal/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("checkouts", resp.json["db_pool"])
+        self.assertIn("search", resp.json["caches"])
+
+        resp = self.client.get("/internal/metrics", environ_base={"REMOTE_ADDR": "10.0.0.9"})
+        self.assertEqual(resp.status_code, 403)
+
+    def test_token_required_when_configured(self):
+        app.config["INTERNAL_TOKEN"] = "s3cret"
+
+        self.assertEqual(self.client.get("/internal/metrics").status_code, 403)
+        resp = self.client.get("/internal/metrics", headers={"X-Internal-Token": "s3cret"})
+        self.assertEqual(resp.status_code, 200)
@@ -0,0 +1,139 @@
+"""Recipe detail enrichment tests, run against a local stub API."""
+#    python -m unittest test_details.py
+
+
+from datetime import timedelta
+from unittest import TestCase
+
+from models import db, User, Recipe, RecipeDetail, Favorites, utcnow
+from stub_spoonacular import StubSpoonacular
+import spoonacular
+import details
+import jobs
+
+from app import create_app, CURR_USER_KEY, user_cache
+
+app = create_app("testing", RECIPE_DETAILS=True)
+
+
+class RecipeDetailsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+        cls.stub = StubSpoonacular().start()
+        cls.base_url = spoonacular.BASE_URL
+        spoonacular.BASE_URL = cls.stub.base_url
+
+    @classmethod
+    def tearDownClass(cls):
+        spoonacular.BASE_URL = cls.base_url
+        cls.stub.stop()
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        RecipeDetail.query.delete()
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        self.user = User.signup("new", "user", "newuser", "newuser@test.com", "password")
+        db.session.flush()
+        db.session.add_all([Recipe(id=1, title="Tomato Soup", image="x", from_api=True),
+                            Recipe(id=2, title="Pea Soup", image="x", from_api=True),
+                            Recipe(id=3, title="My Soup", image="x", user_id=self.user.id),
+                            Recipe(id=4, title="Placeholder Soup", image="x")])
+        db.session.commit()
+        user_cache.clear()
+        spoonacular.breaker.reset()
+        jobs.queue.clear()
+        self.stub.calls.clear()
+        self.stub.fail = False
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user.id
+
+    def test_first_view_fetches_then_reads_locally(self):
+        resp = self.client.get("/recipes/1/info")
+        self.assertIn(b"1 tsp salt", resp.data)
+        self.assertIn(b"Cook until done.", resp.data)
+        self.assertIn(b"Calories: 420 kcal", resp.data)
+        self.assertEqual(db.session.get(RecipeDetail, 1).data["servings"], 4)
+
+        resp = self.client.get("/recipes/1/info", headers={"If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(resp.status_code, 304)
+        self.assertIn(b"1 tsp salt", self.client.get("/recipes/1/info").data)
+        self.assertEqual(self.stub.count("information"), 1)
+
+    def test_only_api_recipes_are_fetched(self):
+        self.assertEqual(self.client.get("/recipes/3/info").status_code, 200)
+        self.assertEqual(self.client.get("/recipes/4/info").status_code, 200)
+        self.assertEqual(self.stub.calls, [])
+
+        self.client.get("/")
+        jobs.queue.drain()
+        self.assertEqual({d.recipe_id for d in RecipeDetail.query}, {1, 2})
+
+    def test_api_failure_still_shows_recipe(self):
+        self.stub.fail = True
+        resp = self.client.get("/recipes/1/info")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Tomato Soup", resp.data)
+        self.assertIsNone(db.session.get(RecipeDetail, 1))
+
+    def test_stale_details_are_refreshed(self):
+        self.client.get("/recipes/1/info")
+        detail = db.session.get(RecipeDetail, 1)
+        detail.fetched_at = utcnow() - timedelta(days=30)
+        db.session.commit()
+
+        resp = self.client.get("/recipes/1/info")
+        self.assertIn(b"1 tsp salt", resp.data)
+        self.assertEqual(self.stub.count("informationBulk"), 0)
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertEqual(self.stub.count("informationBulk"), 1)
+        db.session.expire_all()
+        self.assertGreater(db.session.get(RecipeDetail, 1).fetched_at, utcnow() - timedelta(minutes=1))
+
+    def test_listing_prefetches_missing_details(self):
+        self.client.get("/recipes")
+        self.client.get("/recipes")
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertEqual(self.stub.count("informationBulk"), 1)
+        self.assertEqual(self.stub.calls, ["/recipes/informationBulk"])
+        self.assertEqual({d.recipe_id for d in RecipeDetail.query}, {1, 2})
+
+        self.client.get("/recipes")
+        self.client.get("/recipes/2/info")
+        self.assertEqual(len(self.stub.calls), 1)
+
+    def test_failed_prefetch_is_not_requeued(self):
+        self.stub.fail = True
+        self.client.get("/recipes")
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.client.get("/recipes")
+        self.assertEqual(jobs.queue.stats()["depth"], 0)
+
+        self.stub.fail = False
+        app.config["DETAIL_RETRY_AFTER"] = 0
+        try:
+            self.client.get("/recipes")
+        finally:
+            app.config["DETAIL_RETRY_AFTER"] = 300
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertEqual({d.recipe_id for d in RecipeDetail.query}, {1, 2})
+
+    def test_overlapping_refreshes_fetch_each_id_once(self):
+        with app.test_request_context():
+            details.refresh([1, 2])
+            details.refresh([2, 1])
+            details.refresh([2, 5])
+        self.assertEqual(jobs.queue.stats()["depth"], 2)
+        self.assertEqual(jobs.queue.drain(), 2)
+        self.assertEqual(self.stub.calls, ["/recipes/informationBulk"] * 2)
+
+        with app.test_request_context():
+            details.refresh([1, 2])
+        self.assertEqual(jobs.queue.drain(), 1)
@@ -0,0 +1,140 @@
+"""Diet filter tests."""
+#    python -m unittest test_diet_index.py
+
+
+from unittest import TestCase
+
+import jobs
+from models import db, User, Recipe, Favorites
+from diet_index import Bitmap, diet_index, filter_recipes, matching_bitmap, rebuild
+
+from app import create_app, CURR_USER_KEY
+
+app = create_app("testing")
+
+
+class BitmapTestCase(TestCase):
+    def setUp(self):
+        self.ids = [1, 5, 65535, 65536, 70000, 5_000_000]
+        self.bitmap = Bitmap.from_ids(self.ids)
+
+    def test_membership_and_len(self):
+        self.assertEqual(len(self.bitmap), len(self.ids))
+        self.assertIn(65536, self.bitmap)
+        self.assertNotIn(2, self.bitmap)
+
+    def test_ids_after_crosses_chunks(self):
+        self.assertEqual(self.bitmap.ids_after(None, 3), [1, 5, 65535])
+        self.assertEqual(self.bitmap.ids_after(65535, 10), [65536, 70000, 5_000_000])
+
+    def test_ids_before_crosses_chunks(self):
+        self.assertEqual(self.bitmap.ids_before(65537, 3), [65536, 65535, 5])
+        self.assertEqual(self.bitmap.ids_before(1, 3), [])
+
+    def test_and_or(self):
+        other = Bitmap.from_ids([5, 70000, 9])
+        self.assertEqual((self.bitmap & other).ids_after(None, 10), [5, 70000])
+        self.assertEqual(len(self.bitmap | other), len(self.ids) + 1)
+
+    def test_add_discard(self):
+        self.bitmap.discard(65536)
+        self.bitmap.add(3)
+        self.assertEqual(self.bitmap.ids_after(None, 4), [1, 3, 5, 65535])
+        self.assertEqual(self.bitmap.ids_after(65535, 1), [70000])
+
+
+class DietFilterTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+
+        self.user = User.signup(
+            first_name="new",
+            last_name="user",
+            email="newuser@test.com",
+            username="newuser",
+            password="HASHED_PASSWORD"
+        )
+        recipes = [
+            Recipe(id=1, title="Lentil Soup", image="x", vegetarian=True, vegan=True),
+            Recipe(id=2, title="Cheese Omelette", image="x", vegetarian=True, ketogenic=True),
+            Recipe(id=3, title="Steak", image="x", ketogenic=True),
+            Recipe(id=4, title="Tomato Soup", image="x", vegetarian=True),
+        ]
+        db.session.add_all(recipes)
+        db.session.commit()
+        jobs.queue.clear()
+        rebuild()  # what the startup job does
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+        jobs.queue.clear()
+
+    def ids(self, page):
+        return [r.id for r in page]
+
+    def test_and_or_filters(self):
+        self.assertEqual(self.ids(filter_recipes(["vegetarian"])), [1, 2, 4])
+        self.assertEqual(self.ids(filter_recipes(["vegetarian", "ketogenic"])), [2])
+        self.assertEqual(self.ids(filter_recipes(["vegan", "ketogenic"], match_all=False)), [1, 2, 3])
+
+    def test_index_follows_edits_and_deletes(self):
+        recipe = db.session.get(Recipe, 4)
+        recipe.vegan = True
+        db.session.delete(db.session.get(Recipe, 1))
+        db.session.commit()
+
+        self.assertTrue(diet_index.fresh)
+        self.assertEqual(self.ids(filter_recipes(["vegan"])), [4])
+
+    def test_missing_index_is_built_in_background(self):
+        diet_index.invalidate()
+        self.assertEqual(self.ids(filter_recipes(["vegan", "ketogenic"], match_all=False)), [1, 2, 3])
+        self.assertEqual(len(matching_bitmap(["vegetarian", "ketogenic"])), 1)
+        self.assertEqual(jobs.queue.stats()["depth"], 1)
+
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertTrue(diet_index.fresh)
+
+    def test_old_index_answers_while_rebuilt(self):
+        diet_index.max_age = 0
+        try:
+            self.assertEqual(self.ids(filter_recipes(["vegan"])), [1])
+            self.assertEqual(jobs.queue.stats()["depth"], 1)
+        finally:
+            diet_index.max_age = app.config["DIET_INDEX_MAX_AGE"]
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertTrue(diet_index.fresh)
+
+    def test_filter_pages(self):
+        first = filter_recipes(["vegetarian"], per_page=2)
+        second = filter_recipes(["vegetarian"], cursor=first.next_cursor, per_page=2)
+        self.assertEqual(self.ids(first), [1, 2])
+        self.assertEqual(self.ids(second), [4])
+        self.assertEqual(self.ids(filter_recipes(["vegetarian"], cursor=second.prev_cursor, per_page=2)), [1, 2])
+
+    def test_filter_combines_with_search(self):
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user.id
+            html = c.get('/recipes?q=soup&diet=vegan').get_data(as_text=True)
+
+            self.assertIn('Lentil Soup', html)
+            self.assertNotIn('Tomato Soup', html)
@@ -0,0 +1,103 @@
+"""Recipe card fragment cache tests."""
+#    python -m unittest test_fragments.py
+
+
+from unittest import TestCase
+
+from models import db, User, Recipe, Favorites
+from fragments import FragmentCache, card_cache
+
+from app import create_app, CURR_USER_KEY, user_cache
+
+app = create_app("testing")
+
+
+class FragmentCacheTestCase(TestCase):
+    def test_versions_and_eviction(self):
+        cache = FragmentCache(maxsize=2)
+        renders = []
+
+        def render(value):
+            renders.append(value)
+            return value
+
+        self.assertEqual(cache.get_or_render("index", 1, "v1", lambda: render("a")), "a")
+        self.assertEqual(cache.get_or_render("index", 1, "v1", lambda: render("b")), "a")
+        self.assertEqual(cache.get_or_render("index", 1, "v2", lambda: render("c")), "c")
+        cache.get_or_render("index", 2, "v1", lambda: render("d"))
+        cache.get_or_render("index", 3, "v1", lambda: render("e"))
+
+        self.assertEqual(renders, ["a", "c", "d", "e"])
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["hit_rate"], 0.2)
+
+        cache.invalidate([3])
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+
+class CardViewsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        self.owner = User.signup("own", "er", "owner", "owner@test.com", "password")
+        self.other = User.signup("oth", "er2", "other", "other@test.com", "password")
+        db.session.flush()
+        db.session.add(Recipe(id=1, title="Tomato Soup", image="x", user_id=self.owner.id))
+        db.session.add(Favorites(user_id=self.other.id, recipe_id=1))
+        db.session.commit()
+        user_cache.clear()
+        card_cache.clear()
+        self.client = app.test_client()
+
+    def home_as(self, user):
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = user.id
+        return self.client.get("/").data.decode()
+
+    def test_per_user_bits_are_overlaid(self):
+        as_owner = self.home_as(self.owner)
+        as_other = self.home_as(self.other)
+
+        self.assertIn("/recipes/1/edit", as_owner)
+        self.assertIn("btn-secondary fav-btn", as_owner)
+        self.assertNotIn("/recipes/1/edit", as_other)
+        self.assertIn("btn-primary fav-btn", as_other)
+        self.assertEqual(card_cache.stats()["hits"], 1)
+
+    def test_edit_and_delete_invalidate(self):
+        self.home_as(self.owner)
+        recipe = db.session.get(Recipe, 1)
+        recipe.title = "Tomato Bisque"
+        db.session.commit()
+        self.assertGreater(card_cache.stats()["invalidations"], 0)
+        self.assertIn("Tomato Bisque", self.home_as(self.owner))
+
+        db.session.delete(db.session.get(Recipe, 1))
+        db.session.commit()
+        self.assertEqual(card_cache.stats()["size"], 0)
+
+    def test_listing_and_favorites_use_cache(self):
+        self.home_as(self.other)
+        self.client.get("/recipes")
+        self.client.get("/recipes")
+        resp = self.client.get("/favorites")
+
+        self.assertIn(b'<li><a href="/recipes/1/info">Tomato Soup</a></li>', resp.data)
+        self.assertEqual(card_cache.stats()["hits"], 1)
+        self.assertEqual(card_cache.stats()["misses"], 3)
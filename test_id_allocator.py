@@ -0,0 +1,108 @@
+"""User recipe id allocator tests."""
+#    python -m unittest test_id_allocator.py
+
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from models import db, User, Recipe, Favorites, IdBlock
+from id_allocator import BlockAllocator, user_recipe_id_seq, USER_RECIPE_ID_START
+
+from app import create_app
+
+app = create_app("testing")
+
+
+class IdAllocatorTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        IdBlock.query.delete()
+        db.session.commit()
+
+    def test_ids_start_in_reserved_range(self):
+        allocator = BlockAllocator(user_recipe_id_seq, USER_RECIPE_ID_START, 10)
+        first, second = allocator.next_id(), allocator.next_id()
+
+        self.assertEqual(first, USER_RECIPE_ID_START)
+        self.assertEqual(second, first + 1)
+
+    def test_blocks_need_one_round_trip(self):
+        allocator = BlockAllocator(user_recipe_id_seq, USER_RECIPE_ID_START, 10)
+        for _ in range(25):
+            allocator.next_id()
+
+        block = db.session.get(IdBlock, user_recipe_id_seq.name)
+        self.assertEqual(block.next_value, USER_RECIPE_ID_START + 30)
+
+
+class ParallelAllocationTestCase(TestCase):
+    """Allocators racing on a database with real concurrent connections.
+
+    The in-memory test database is one connection shared by every thread,
+    so this uses TEST_DATABASE_URL or a SQLite file instead.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        url = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{self.folder}/ids.db"
+        self.app = create_app("testing", SQLALCHEMY_DATABASE_URI=url, SUGGEST_WARM=False,
+                              DIET_INDEX_WARM=False)
+        with self.app.app_context():
+            db.create_all()
+            IdBlock.query.delete()
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+        shutil.rmtree(self.folder)
+
+    def test_parallel_adds_never_collide(self):
+        """Two "workers" with small blocks race to add 400 recipes."""
+
+        workers = [BlockAllocator(user_recipe_id_seq, USER_RECIPE_ID_START, 7) for _ in range(2)]
+
+        def allocate(n):
+            # Each block claim checks out its own pooled connection.
+            with self.app.app_context():
+                return workers[n % 2].next_id()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(allocate, range(400)))
+
+        self.assertEqual(len(set(ids)), 400)
+        self.assertTrue(all(i >= USER_RECIPE_ID_START for i in ids))
+
+        with self.app.app_context():
+            # Every claimed block was claimed once: the counter moved by exactly
+            # the blocks the ids came from.
+            blocks = {(i - USER_RECIPE_ID_START) // 7 for i in ids}
+            counter = db.session.get(IdBlock, user_recipe_id_seq.name)
+            if counter is not None:  # Postgres uses the sequence instead
+                self.assertEqual(counter.next_value, USER_RECIPE_ID_START + 7 * len(blocks))
+
+            for i in ids:
+                db.session.add(Recipe(id=i, title=f"Recipe {i}", image="x"))
+            db.session.commit()
+            self.assertEqual(Recipe.query.count(), 400)
@@ -0,0 +1,138 @@
+"""Thumbnail proxy tests, run against a local stub image origin."""
+#    python -m unittest test_images.py
+
+
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, skipUnless
+
+from stub_spoonacular import StubSpoonacular
+import images
+
+from app import create_app
+
+app = create_app("testing", IMAGE_ALLOW_PRIVATE=True)
+
+
+def sample_jpeg(width=1025, height=1536):
+    if images.Image is None:
+        return b"\xff\xd8\xff\xe0" + os.urandom(4096)
+    out = io.BytesIO()
+    images.Image.new("RGB", (width, height), (200, 80, 40)).save(out, "JPEG")
+    return out.getvalue()
+
+
+class ImageProxyTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = StubSpoonacular().start()
+        cls.src = cls.stub.add_image("/photos/soup.jpg", sample_jpeg())
+        cls.page = cls.stub.add_image("/photos/page.jpg", b"<html>hi</html>", "text/html")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        app.extensions["images"] = images.ImageCache(self.folder, 10 * 1024 * 1024)
+        self.stub.calls.clear()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def url(self, src, width=320):
+        with app.test_request_context():
+            return images.thumb_url(src, width)
+
+    def test_thumb_urls(self):
+        with app.test_request_context():
+            self.assertTrue(images.thumb_url(self.src, 320).startswith("/images/320?src="))
+            self.assertEqual(images.thumb_srcset(self.src).count("w, "), 2)
+            self.assertEqual(images.thumb_url("", 320), "")
+            self.assertEqual(images.thumb_url("/static/x.jpg", 320), "/static/x.jpg")
+
+    def test_fetches_once_and_caches(self):
+        url = self.url(self.src)
+        with ThreadPoolExecutor(4) as pool:
+            responses = list(pool.map(lambda _: app.test_client().get(url), range(4)))
+
+        for resp in responses:
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.mimetype.startswith("image/"))
+        self.assertIn("immutable", responses[0].headers["Cache-Control"])
+
+        self.client.get(self.url(self.src, 160))
+        self.assertEqual(self.stub.count("soup.jpg"), 1)
+        self.assertEqual(app.extensions["images"].stats()["fetches"], 1)
+
+        resp = self.client.get(url, headers={"If-None-Match": responses[0].headers["ETag"]})
+        self.assertEqual(resp.status_code, 304)
+
+    @skipUnless(images.Image, "Pillow is not installed")
+    def test_resizes_and_negotiates_format(self):
+        resp = self.client.get(self.url(self.src), headers={"Accept": "image/webp,*/*"})
+        self.assertEqual(resp.mimetype, "image/webp")
+        self.assertEqual(images.Image.open(io.BytesIO(resp.data)).size, (320, 480))
+
+        resp = self.client.get(self.url(self.src), headers={"Accept": "image/jpeg"})
+        self.assertEqual(resp.mimetype, "image/jpeg")
+        self.assertIn("Accept", resp.headers["Vary"])
+
+    def test_rejects_unsigned_and_unknown_widths(self):
+        self.assertEqual(self.client.get(self.url(self.src).replace("sig=", "sig=x")).status_code, 404)
+        self.assertEqual(self.client.get(self.url(self.src, 333)).status_code, 404)
+        self.assertEqual(self.stub.count("soup.jpg"), 0)
+
+    def test_falls_back_to_source(self):
+        resp = self.client.get(self.url(self.page))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp.location, self.page)
+
+        app.config["IMAGE_ALLOW_PRIVATE"] = False
+        try:
+            resp = self.client.get(self.url(self.src))
+        finally:
+            app.config["IMAGE_ALLOW_PRIVATE"] = True
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(self.stub.count("soup.jpg"), 0)
+        self.assertEqual(app.extensions["images"].stats()["errors"], 2)
+
+    def test_checks_the_connected_address(self):
+        # The name resolves while connecting; no earlier lookup can be swapped.
+        src = self.src.replace("127.0.0.1", "localhost")
+        app.config["IMAGE_ALLOW_PRIVATE"] = False
+        try:
+            with app.app_context(), self.assertRaisesRegex(images.ImageError, "not a public address"):
+                images.fetch(src)
+        finally:
+            app.config["IMAGE_ALLOW_PRIVATE"] = True
+        self.assertEqual(self.stub.count("soup.jpg"), 0)
+
+
+class ImageCacheTestCase(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_evicts_least_recently_used(self):
+        cache = images.ImageCache(self.folder, max_bytes=3000)
+        for i, key in enumerate(["aa1", "bb2", "cc3"]):
+            cache.put(key, b"x" * 1000)
+            os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+        cache.get("aa1")
+        cache.put("dd4", b"x" * 1000)
+
+        self.assertIsNotNone(cache.get("aa1"))
+        self.assertIsNone(cache.get("bb2"))
+        self.assertEqual(cache.stats()["bytes"], 2000)
+
+        # A new worker picks up what is already on disk.
+        self.assertEqual(images.ImageCache(self.folder, 3000).stats()["bytes"], 2000)
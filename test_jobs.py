@@ -0,0 +1,172 @@
+"""Background job queue and stale-while-revalidate search tests."""
+#    python -m unittest test_jobs.py
+
+
+import threading
+from unittest import TestCase
+
+from models import db, User, Recipe, Favorites, ApiCacheEntry
+from stub_spoonacular import StubSpoonacular
+import spoonacular
+import jobs
+
+from app import create_app, CURR_USER_KEY, user_cache
+
+app = create_app("testing")
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        self.queue = jobs.JobQueue(workers=0)
+        self.calls = []
+        self.queue.handler("record")(self.calls.append)
+        self.queue.handler("fail")(lambda: 1 / 0)
+
+    def test_duplicates_are_skipped_until_run(self):
+        with app.app_context():
+            first = self.queue.enqueue("record", "a", "a")
+            self.assertIs(self.queue.enqueue("record", "a", "a"), first)
+            self.queue.enqueue("fail", "b")
+            self.assertEqual(self.queue.stats()["depth"], 2)
+
+            self.assertEqual(self.queue.drain(), 2)
+            self.queue.enqueue("record", "a", "again")
+            self.queue.drain()
+
+        self.assertEqual(self.calls, ["a", "again"])
+        self.assertTrue(first.done.is_set())
+        stats = self.queue.stats()
+        self.assertEqual((stats["depth"], stats["completed"], stats["failed"], stats["skipped"]),
+                         (0, 2, 1, 1))
+        self.assertIsNotNone(stats["run_p95_ms"])
+
+    def test_expected_failures_log_one_line(self):
+        self.queue.handler("down", expected=(ConnectionError,))(self.fail_with)
+        with app.app_context():
+            self.queue.enqueue("down", "a", ConnectionError("refused"))
+            self.queue.enqueue("down", "b", ValueError("bug"))
+            with self.assertLogs(app.logger, "WARNING") as logs:
+                self.queue.drain()
+
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+        self.assertEqual(logs.records[0].getMessage(), "Job down 'a' failed: refused")
+        self.assertIsNone(logs.records[0].exc_info)
+        self.assertEqual(logs.records[1].levelname, "ERROR")
+        self.assertIsNotNone(logs.records[1].exc_info)
+
+    @staticmethod
+    def fail_with(error):
+        raise error
+
+    def test_workers_run_jobs_in_the_background(self):
+        self.queue.configure(workers=2)
+        ran = threading.Event()
+        self.queue.handler("flag")(lambda: ran.set())
+        with app.app_context():
+            job = self.queue.enqueue("flag", "x")
+        self.assertTrue(job.done.wait(5))
+        self.assertTrue(ran.is_set())
+        self.queue.configure(workers=0)
+
+
+class SearchRevalidationTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+        cls.stub = StubSpoonacular().start()
+        cls.base_url = spoonacular.BASE_URL
+        spoonacular.BASE_URL = cls.stub.base_url
+
+    @classmethod
+    def tearDownClass(cls):
+        spoonacular.BASE_URL = cls.base_url
+        cls.stub.stop()
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        ApiCacheEntry.query.delete()
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        self.user = User.signup("new", "user", "newuser", "newuser@test.com", "password")
+        db.session.commit()
+        user_cache.clear()
+        spoonacular.search_cache.clear()
+        spoonacular.breaker.reset()
+        jobs.queue.clear()
+        self.stub.calls.clear()
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user.id
+
+    def test_miss_answers_at_once_and_ingests_in_background(self):
+        resp = self.client.get("/recipes?q=zebra")
+        self.assertIn(b"Still searching", resp.data)
+        self.client.get("/recipes?q=Zebra ")
+        self.assertEqual(self.stub.calls, [])
+        self.assertEqual(jobs.queue.stats()["depth"], 1)
+
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertEqual(Recipe.query.count(), 10)
+
+        resp = self.client.get("/recipes?q=zebra")
+        self.assertIn(b"Zebra Recipe 1", resp.data)
+        self.assertEqual(len(self.stub.calls), 1)
+
+    def test_stale_results_are_served_while_refreshing(self):
+        self.client.get("/recipes?q=zebra")
+        jobs.queue.drain()
+        db.session.execute(db.delete(Recipe))
+        db.session.commit()
+
+        spoonacular.search_cache.stale_after = 0
+        try:
+            resp = self.client.get("/recipes?q=zebra")
+        finally:
+            spoonacular.search_cache.stale_after = spoonacular.SEARCH_TTL
+        self.assertIn(b"Zebra Recipe 1", resp.data)
+        self.assertEqual(jobs.queue.stats()["depth"], 1)
+        jobs.queue.drain()
+        self.assertEqual(len(self.stub.calls), 2)
+
+    def test_waits_briefly_for_the_api_with_workers(self):
+        jobs.queue.configure(workers=1)
+        app.config["SEARCH_WAIT"] = 5
+        try:
+            resp = self.client.get("/recipes?q=zebra")
+        finally:
+            app.config["SEARCH_WAIT"] = 0
+            jobs.queue.configure(workers=0)
+        self.assertIn(b"Zebra Recipe 1", resp.data)
+        self.assertEqual(jobs.queue.stats()["completed"], 1)
+
+    def test_api_failure_is_reported_without_retrying(self):
+        self.stub.fail = True
+        try:
+            self.client.get("/recipes?q=zebra")
+            jobs.queue.drain()
+            resp = self.client.get("/recipes?q=zebra")
+        finally:
+            self.stub.fail = False
+        self.assertIn(b"Error fetching recipes", resp.data)
+        self.assertEqual(jobs.queue.stats()["failed"], 1)
+        self.assertEqual(jobs.queue.stats()["depth"], 0)
+
+        app.config["SEARCH_RETRY_AFTER"] = 0
+        try:
+            self.assertIn(b"Still searching", self.client.get("/recipes?q=zebra").data)
+        finally:
+            app.config["SEARCH_RETRY_AFTER"] = 30
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertIsNone(jobs.queue.last_failure("search", "zebra"))
+
+    def test_open_breaker_skips_the_job(self):
+        for _ in range(spoonacular.breaker.threshold):
+            spoonacular.breaker.record_failure()
+        resp = self.client.get("/recipes?q=zebra")
+        self.assertIn(b"Error fetching recipes", resp.data)
+        self.assertEqual(jobs.queue.stats()["depth"], 0)
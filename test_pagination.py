@@ -0,0 +1,105 @@
+"""Keyset pagination tests."""
+#    python -m unittest test_pagination.py
+
+
+from unittest import TestCase
+
+from models import db, User, Recipe, Favorites
+from pagination import encode_cursor, decode_cursor, paginate, AFTER
+
+from app import create_app, CURR_USER_KEY
+
+app = create_app("testing")
+
+
+class CursorTestCase(TestCase):
+    def test_round_trip(self):
+        token = encode_cursor(AFTER, [-1.5, 42])
+        self.assertEqual(decode_cursor(token), (AFTER, [-1.5, 42]))
+
+    def test_garbage_means_first_page(self):
+        self.assertEqual(decode_cursor("not-a-cursor"), (AFTER, None))
+        self.assertEqual(decode_cursor(encode_cursor("x", 1)), (AFTER, None))
+
+
+class PaginationViewsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+
+        self.user = User.signup(
+            first_name="new",
+            last_name="user",
+            email="newuser@test.com",
+            username="newuser",
+            password="HASHED_PASSWORD"
+        )
+        db.session.commit()
+        for i in range(1, 8):
+            db.session.add(Recipe(id=i, title=f"Recipe {i}", image=f"https://example.com/{i}.jpg"))
+            db.session.add(Favorites(user_id=self.user.id, recipe_id=i))
+        db.session.commit()
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_paginate_forwards_and_back(self):
+        with app.test_request_context():
+            first = paginate(Recipe.query, Recipe.id, per_page=3)
+            second = paginate(Recipe.query, Recipe.id, first.next_cursor, per_page=3)
+            third = paginate(Recipe.query, Recipe.id, second.next_cursor, per_page=3)
+            back = paginate(Recipe.query, Recipe.id, third.prev_cursor, per_page=3)
+
+        self.assertEqual([r.id for r in first], [1, 2, 3])
+        self.assertEqual([r.id for r in second], [4, 5, 6])
+        self.assertEqual([r.id for r in third], [7])
+        self.assertIsNone(first.prev_cursor)
+        self.assertIsNone(third.next_cursor)
+        self.assertEqual([r.id for r in back], [4, 5, 6])
+
+    def test_favorites_are_paged(self):
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user.id
+            response = c.get('/favorites?per_page=5')
+            html = response.get_data(as_text=True)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Recipe 5', html)
+            self.assertNotIn('Recipe 6', html)
+            self.assertIn('Next', html)
+
+            cursor = encode_cursor(AFTER, 5)
+            html = c.get(f'/favorites?per_page=5&cursor={cursor}').get_data(as_text=True)
+            self.assertIn('Recipe 7', html)
+            self.assertNotIn('Recipe 5<', html)
+
+    def test_home_page_size_is_capped(self):
+        app.config['MAX_PAGE_SIZE'], max_size = 2, app.config['MAX_PAGE_SIZE']
+        try:
+            with self.client as c:
+                with c.session_transaction() as sess:
+                    sess[CURR_USER_KEY] = self.user.id
+                html = c.get('/?per_page=50').get_data(as_text=True)
+        finally:
+            app.config['MAX_PAGE_SIZE'] = max_size
+
+        self.assertIn('Recipe 2', html)
+        self.assertNotIn('Recipe 3', html)
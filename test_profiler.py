@@ -0,0 +1,114 @@
+"""Per-request profiler tests."""
+#    python -m unittest test_profiler.py
+
+
+from unittest import TestCase
+
+from flask import render_template_string
+from sqlalchemy import text
+
+from models import db, User, Recipe, Favorites
+import profiler
+
+from app import create_app, CURR_USER_KEY
+
+app = create_app("testing", SERVER_TIMING=True)
+
+
+class ProfilerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        self.user = User.signup("new", "user", "newuser", "newuser@test.com", "password")
+        db.session.add(Recipe(id=1, title="Tomato Soup", image="https://example.com/1.jpg"))
+        db.session.commit()
+        self.client = app.test_client()
+
+    def test_server_timing_header(self):
+        with self.client.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user.id
+        resp = self.client.get("/recipes")
+
+        timing = resp.headers["Server-Timing"]
+        for metric in ("db;dur=", "api;dur=", "tpl;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_server_timing_is_off_by_default(self):
+        self.assertNotIn("Server-Timing", create_app("testing").test_client().get("/login").headers)
+
+    def test_no_profile_outside_requests(self):
+        self.assertIsNone(profiler.current_profile())
+        profiler.add_time("api", 1.0)  # a no-op, not an error
+        self.client.get("/login")
+        self.assertIsNone(profiler.current_profile())
+
+
+class NPlusOneTestCase(TestCase):
+    def setUp(self):
+        self.app = create_app("testing", SLOW_REQUEST_MS=10_000, SERVER_TIMING=True)
+
+        @self.app.route("/loop")
+        def loop():
+            for i in range(6):
+                db.session.execute(text("SELECT :n"), {"n": i})
+            return render_template_string("{{ n }}", n=6)
+
+        @self.app.route("/once")
+        def once():
+            db.session.execute(text("SELECT 1"))
+            return "ok"
+
+        self.client = self.app.test_client()
+
+    def test_repeated_statement_is_flagged(self):
+        with self.assertLogs(self.app.logger, "WARNING") as logs:
+            resp = self.client.get("/loop")
+
+        self.assertIn('desc="6 queries"', resp.headers["Server-Timing"])
+        self.assertTrue(any("Possible N+1 in GET /loop: 6x SELECT ?" in line for line in logs.output))
+
+    def test_single_statement_is_not_flagged(self):
+        with self.assertNoLogs(self.app.logger, "WARNING"):
+            resp = self.client.get("/once")
+
+        self.assertIn('desc="1 queries"', resp.headers["Server-Timing"])
+
+    def test_failed_statement_is_counted(self):
+        @self.app.route("/broken")
+        def broken():
+            try:
+                db.session.execute(text("SELECT * FROM no_such_table"))
+            except Exception:
+                db.session.rollback()
+            db.session.execute(text("SELECT 1"))
+            return "ok"
+
+        resp = self.client.get("/broken")
+        with self.app.app_context(), db.engine.connect() as conn:
+            self.assertEqual(conn.info.get("profiler_start"), [])
+
+        self.assertIn('desc="2 queries, 1 failed"', resp.headers["Server-Timing"])
+
+    def test_slow_request_is_logged(self):
+        self.app.config["SLOW_REQUEST_MS"] = 0
+
+        with self.assertLogs(self.app.logger, "WARNING") as logs:
+            self.client.get("/once")
+
+        self.assertTrue(any("Slow request GET /once" in line for line in logs.output))
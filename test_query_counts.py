@@ -0,0 +1,107 @@
+"""Tests pinning how many SQL statements each route issues."""
+#    python -m unittest test_query_counts.py
+
+
+from contextlib import contextmanager
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from models import db, User, Recipe, Favorites
+
+from app import create_app, CURR_USER_KEY, user_cache
+
+app = create_app("testing")
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements executed inside the block."""
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+class QueryCountTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+
+        self.user = User.signup(
+            first_name="new",
+            last_name="user",
+            email="newuser@test.com",
+            username="newuser",
+            password="HASHED_PASSWORD"
+        )
+        db.session.add(Recipe(id=1, title="Tomato Soup", image="https://example.com/1.jpg"))
+        db.session.commit()
+        user_cache.clear()
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def login(self, c):
+        with c.session_transaction() as sess:
+            sess[CURR_USER_KEY] = self.user.id
+
+    def assertQueries(self, c, method, url, expected):
+        with count_queries() as statements:
+            response = getattr(c, method)(url)
+        self.assertLess(response.status_code, 400)
+        self.assertEqual(len(statements), expected, "\n".join(statements))
+
+    def test_anonymous_requests_never_load_a_user(self):
+        with self.client as c:
+            self.assertQueries(c, "get", "/", 0)
+            self.assertQueries(c, "get", "/login", 0)
+
+    def test_identity_is_cached_between_requests(self):
+        with self.client as c:
+            self.login(c)
+            self.assertQueries(c, "get", "/favorites", 2)
+            self.assertQueries(c, "get", "/favorites", 1)
+
+    def test_logout_invalidates_identity(self):
+        with self.client as c:
+            self.login(c)
+            c.get("/favorites")
+            c.get("/logout")
+
+            self.assertQueries(c, "get", "/favorites", 0)
+
+    def test_route_query_counts(self):
+        with self.client as c:
+            self.login(c)
+            c.get("/login")  # warm the identity cache
+
+            self.assertQueries(c, "get", "/", 1)
+            self.assertQueries(c, "get", "/recipes", 1)
+            self.assertQueries(c, "get", "/recipes/1/info", 1)
+            # One statement on Postgres; SQLite lacks writable CTEs.
+            self.assertQueries(c, "post", "/api/recipes/1/favorite", 4)
@@ -10,7 +10,9 @@ from sqlalchemy.exc import IntegrityError
 
 os.environ['DATABASE_URL'] = "postgresql:///food-recipe-test"
 
-from app import app
+from app import create_app
+
+app = create_app("testing")
 
 
 class RecipeModelTestCase(TestCase):
@@ -73,4 +75,34 @@ class RecipeModelTestCase(TestCase):
         # Expect an IntegrityError because user is required
         with self.assertRaises(IntegrityError):
             db.session.add(recipe)
-            db.session.commit()    
\ No newline at end of file
+            db.session.commit()    
+
+    def test_upsert_many_handles_duplicates(self):
+        """Test that upserting existing ids refreshes them instead of failing"""
+        Recipe.upsert_many([
+            {"id": 1, "title": "Soup", "image": "https://example.com/1.jpg"},
+            {"id": 2, "title": "Stew", "image": "https://example.com/2.jpg"},
+        ])
+        db.session.commit()
+
+        Recipe.upsert_many([
+            {"id": 2, "title": "Beef Stew", "image": "https://example.com/2b.jpg"},
+            {"id": 3, "title": "Salad", "image": "https://example.com/3.jpg"},
+        ])
+        db.session.commit()
+
+        self.assertEqual(Recipe.query.count(), 3)
+        self.assertEqual(db.session.get(Recipe, 2).title, "Beef Stew")
+        self.assertTrue(all(r.from_api for r in Recipe.query))
+
+    def test_upsert_many_keeps_user_recipes(self):
+        """Test that API data never overwrites a user's own recipe"""
+        db.session.add(Recipe(id=5, title="Mine", image="https://example.com/5.jpg", user_id=self.user.id))
+        db.session.commit()
+
+        Recipe.upsert_many([{"id": 5, "title": "Theirs", "image": "https://example.com/x.jpg"}])
+        db.session.commit()
+        db.session.expire_all()
+
+        self.assertEqual(db.session.get(Recipe, 5).title, "Mine")
+        self.assertFalse(db.session.get(Recipe, 5).from_api)
@@ -0,0 +1,175 @@
+"""Recipe search tests."""
+#    python -m unittest test_search.py
+
+
+import os
+from unittest import TestCase, skipUnless
+
+from models import db, User, Recipe, Favorites
+from search import tokenize, InvertedIndex, search_recipes, title_index
+
+from app import create_app, CURR_USER_KEY
+
+app = create_app("testing")
+
+
+class TokenizeTestCase(TestCase):
+    def test_stems_plurals_and_verb_forms(self):
+        self.assertEqual(tokenize("Noodles"), tokenize("noodle"))
+        self.assertEqual(tokenize("Tomatoes"), tokenize("tomato"))
+        self.assertEqual(tokenize("Grilled"), tokenize("grill"))
+        self.assertEqual(tokenize("Baking"), tokenize("bake"))
+
+    def test_splits_on_punctuation(self):
+        self.assertEqual(tokenize("Mac & Cheese, Baked!"), tokenize("mac cheese bake"))
+
+
+class InvertedIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.build([
+            (1, "Chicken Noodle Soup"),
+            (2, "Tomato Soup"),
+            (3, "Chicken Alfredo"),
+            (4, "Chicken Soup with Chicken Dumplings"),
+        ])
+
+    def ids(self, query):
+        keys, _ = self.index.search(query)
+        return [recipe_id for _, recipe_id in keys]
+
+    def test_requires_every_token(self):
+        self.assertEqual(set(self.ids("chicken soup")), {1, 4})
+        self.assertEqual(self.index.search("chicken tomato"), ([], 0))
+
+    def test_ranks_repeated_terms_higher(self):
+        self.assertEqual(self.ids("chicken")[0], 4)
+
+    def test_incremental_updates(self):
+        self.index.add(5, "Pumpkin Soups")
+        self.index.remove(2)
+        self.index.add(1, "Beef Stew")
+        self.assertEqual(set(self.ids("soup")), {4, 5})
+
+
+class SearchViewsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up an application context and create tables once for all tests."""
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up the database and remove the application context."""
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+
+        self.user = User.signup(
+            first_name="new",
+            last_name="user",
+            email="newuser@test.com",
+            username="newuser",
+            password="HASHED_PASSWORD"
+        )
+        for i, title in enumerate(["Chicken Noodle Soup", "Tomato Soup", "Beef Tacos"], start=1):
+            db.session.add(Recipe(id=i, title=title, image=f"https://example.com/{i}.jpg"))
+        db.session.commit()
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_search_recipes_paginates(self):
+        first = search_recipes("soups", per_page=1)
+        self.assertEqual(first.total, 2)
+        self.assertEqual(len(first), 1)
+        self.assertIsNone(first.prev_cursor)
+
+        second = search_recipes("soups", cursor=first.next_cursor, per_page=1)
+        self.assertNotEqual(first.items[0].id, second.items[0].id)
+        self.assertIsNone(second.next_cursor)
+
+        back = search_recipes("soups", cursor=second.prev_cursor, per_page=1)
+        self.assertEqual(back.items, first.items)
+
+    def test_index_follows_edits(self):
+        recipe = db.session.get(Recipe, 3)
+        recipe.title = "Beef Soup"
+        db.session.commit()
+
+        self.assertEqual(search_recipes("soup").total, 3)
+        self.assertTrue(title_index.built)
+
+    def test_search_page(self):
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user.id
+            response = c.get('/recipes?q=noodles')
+            html = response.get_data(as_text=True)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Chicken Noodle Soup', html)
+            self.assertNotIn('Tomato Soup', html)
+
+
+@skipUnless(os.environ.get("TEST_DATABASE_URL", "").startswith("postgresql"),
+            "set TEST_DATABASE_URL to a Postgres database")
+class PostgresRankPagingTestCase(TestCase):
+    """Cursor paging over ts_rank/similarity scores, which SQLite never runs."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        # Five ties on each of two ranks, plus one better match.
+        titles = ["Tomato Soup"] * 5 + ["Roasted Tomato and Pepper Soup"] * 5 + ["Tomato Soup Tomato"]
+        for i, title in enumerate(titles, start=1):
+            db.session.add(Recipe(id=i, title=title, image=""))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def walk(self, query):
+        pages, cursor = [], None
+        for _ in range(20):
+            page = search_recipes(query, cursor=cursor, per_page=2)
+            pages.append([r.id for r in page.items])
+            cursor = page.next_cursor
+            if cursor is None:
+                return pages, page
+        self.fail("paging did not terminate")
+
+    def test_pages_through_tied_ranks(self):
+        self.assertEqual(search_recipes("tomato soup").total, 11)
+        for query in ("tomato soup", "tomatto soop"):  # ranked and trigram fallback
+            everything = [r.id for r in search_recipes(query, per_page=100).items]
+            pages, last = self.walk(query)
+            self.assertEqual([i for page in pages for i in page], everything, query)
+
+            backwards, cursor = [], last.prev_cursor
+            while cursor is not None:
+                page = search_recipes(query, cursor=cursor, per_page=2)
+                backwards.insert(0, [r.id for r in page.items])
+                cursor = page.prev_cursor
+            self.assertEqual(backwards, pages[:-1], query)
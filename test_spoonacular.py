@@ -0,0 +1,171 @@
+"""Spoonacular client tests, run against a local stub API."""
+#    python -m unittest test_spoonacular.py
+
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from cache import ResponseCache
+from models import db, ApiCacheEntry
+from stub_spoonacular import StubSpoonacular
+import spoonacular
+
+from app import create_app
+
+app = create_app("testing")
+
+
+class SearchCacheTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+        cls.stub = StubSpoonacular().start()
+        cls.base_url = spoonacular.BASE_URL
+        spoonacular.BASE_URL = cls.stub.base_url
+
+    @classmethod
+    def tearDownClass(cls):
+        spoonacular.BASE_URL = cls.base_url
+        cls.stub.stop()
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        ApiCacheEntry.query.delete()
+        db.session.commit()
+        spoonacular.search_cache.clear()
+        spoonacular.breaker.reset()
+        self.stub.calls.clear()
+        self.stub.latency = 0
+        self.stub.fail = False
+
+    def test_normalized_queries_share_an_entry(self):
+        results = spoonacular.refresh_search("Pasta  Salad")
+
+        self.assertEqual(spoonacular.cached_search(" pasta salad "), (results, False))
+        self.assertEqual(self.stub.count("complexSearch"), 1)
+        self.assertEqual(spoonacular.search_cache.stats()["hits"], 1)
+
+    def test_database_tier_survives_memory_loss(self):
+        results = spoonacular.refresh_search("tacos")
+        spoonacular.search_cache.clear()
+
+        self.assertEqual(spoonacular.cached_search("tacos")[0], results)
+        self.assertEqual(self.stub.count("complexSearch"), 1)
+        self.assertEqual(spoonacular.search_cache.stats()["db_hits"], 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        cache = ResponseCache(persistent=False)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"id": 1}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: cache.get_or_set("k", compute), range(8)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"id": 1} for r in results))
+        self.assertEqual(cache.stats()["coalesced"], 7)
+
+    def test_failures_are_not_cached(self):
+        self.stub.fail = True
+        with self.assertRaises(spoonacular.SpoonacularError):
+            spoonacular.refresh_search("stew")
+        self.assertEqual(spoonacular.cached_search("stew"), (None, False))
+
+        self.stub.fail = False
+        self.assertTrue(spoonacular.refresh_search("stew"))
+        self.assertEqual(self.stub.count("complexSearch"), spoonacular.MAX_RETRIES + 2)
+
+    def test_lru_evicts_oldest(self):
+        cache = spoonacular.search_cache
+        maxsize, cache.maxsize = cache.maxsize, 2
+        try:
+            for q in ("a", "b", "c"):
+                spoonacular.refresh_search(q)
+            self.assertEqual(cache.stats()["evictions"], 1)
+            self.assertEqual(cache.stats()["size"], 2)
+        finally:
+            cache.maxsize = maxsize
+
+
+class ClientTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = StubSpoonacular().start()
+        cls.saved = (spoonacular.BASE_URL, spoonacular.READ_TIMEOUT, spoonacular.BACKOFF)
+        spoonacular.BASE_URL = cls.stub.base_url
+        spoonacular.BACKOFF = 0.01
+
+    @classmethod
+    def tearDownClass(cls):
+        spoonacular.BASE_URL, spoonacular.READ_TIMEOUT, spoonacular.BACKOFF = cls.saved
+        cls.stub.stop()
+
+    def setUp(self):
+        spoonacular.breaker.reset()
+        spoonacular.metrics.clear()
+        self.stub.calls.clear()
+        self.stub.latency = 0
+        self.stub.fail = False
+
+    def tearDown(self):
+        spoonacular.breaker.reset()
+
+    def test_records_latency_per_endpoint(self):
+        spoonacular.recipe_information(123)
+        spoonacular.recipe_information(456)
+
+        stats = spoonacular.metrics.snapshot()["information"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["errors"], 0)
+        self.assertIsNotNone(stats["p99_ms"])
+
+    def test_retries_then_raises(self):
+        self.stub.fail = True
+        with self.assertRaises(spoonacular.SpoonacularError):
+            spoonacular.recipe_information(1)
+
+        self.assertEqual(self.stub.count("information"), spoonacular.MAX_RETRIES + 1)
+        self.assertEqual(spoonacular.metrics.snapshot()["information"]["errors"], 1)
+
+    def test_read_timeout(self):
+        spoonacular.READ_TIMEOUT = 0.05
+        self.stub.latency = 0.3
+        try:
+            with self.assertRaises(spoonacular.SpoonacularError):
+                spoonacular.recipe_information(1)
+        finally:
+            spoonacular.READ_TIMEOUT = self.saved[1]
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.stub.fail = True
+        for _ in range(spoonacular.breaker.threshold):
+            with self.assertRaises(spoonacular.SpoonacularError):
+                spoonacular.recipe_information(1)
+        calls = len(self.stub.calls)
+
+        self.assertEqual(spoonacular.breaker.state, "open")
+        with self.assertRaises(spoonacular.CircuitOpenError):
+            spoonacular.recipe_information(1)
+        self.assertEqual(len(self.stub.calls), calls)
+
+    def test_half_open_trial_closes_circuit(self):
+        breaker = spoonacular.breaker
+        cooldown, breaker.cooldown = breaker.cooldown, 0
+        try:
+            for _ in range(breaker.threshold):
+                breaker.record_failure()
+            self.assertEqual(breaker.state, "half-open")
+
+            spoonacular.recipe_information(1)
+            self.assertEqual(breaker.state, "closed")
+        finally:
+            breaker.cooldown = cooldown
@@ -0,0 +1,166 @@
+"""Autocomplete tests."""
+#    python -m unittest test_suggest.py
+
+
+from unittest import TestCase
+
+import jobs
+import suggest
+from models import db, User, Recipe, Favorites
+from suggest import PrefixIndex, suggest_index
+
+from app import create_app
+
+app = create_app("testing")
+
+
+class PrefixIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.build([
+            ("Chicken Noodle Soup", 1),
+            ("Chicken Curry", 3),
+            ("Chili con Carne", 1),
+            ("Chickpea Salad", 1),
+        ])
+
+    def test_heaviest_first(self):
+        self.assertEqual(self.index.complete("chi"), ["chicken", "chickpea", "chili"])
+        self.assertEqual(self.index.complete("chi", limit=1), ["chicken"])
+        self.assertEqual(self.index.complete("cu"), ["curry"])
+        self.assertEqual(self.index.complete("x"), [])
+
+    def test_skips_one_letter_words(self):
+        self.index.add("A Pie")
+        self.assertEqual(self.index.complete("a"), [])
+
+    def test_incremental_updates(self):
+        self.index.add("Chili Verde", weight=5)
+        self.index.remove("Chicken Curry", weight=3)
+        self.index.remove("Chickpea Salad")
+        self.assertEqual(self.index.complete("c"), ["chili", "carne", "chicken", "con"])
+        self.assertEqual(self.index.complete("cu"), [])
+
+    def test_memoized_ranges_follow_updates(self):
+        self.index.build([(f"w{n:04d}", 1) for n in range(suggest.MEMO_RANGE + 1)])
+        self.assertEqual(self.index.complete("w", limit=1), ["w0000"])
+        self.assertEqual(self.index.stats()["memoized"], 1)
+
+        self.index.add("w0500", weight=10)
+        self.assertEqual(self.index.complete("w", limit=1), ["w0500"])
+
+    def test_add_missing_keeps_known_weights(self):
+        self.index.add_missing(["Chicken Pot Pie", "Chickpea Curry"])
+        self.assertEqual(self.index.complete("p"), ["pie", "pot"])
+        self.assertEqual(self.index.complete("chi"), ["chicken", "chickpea", "chili"])
+
+    def test_unbuilt_index_ignores_updates(self):
+        index = PrefixIndex()
+        index.add("Chicken")
+        self.assertEqual(len(index), 0)
+
+
+class SuggestViewTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def setUp(self):
+        Favorites.query.delete()
+        Recipe.query.delete()
+        User.query.delete()
+        jobs.queue.clear()
+
+        user = User.signup(first_name="new", last_name="user", email="newuser@test.com",
+                           username="newuser", password="HASHED_PASSWORD")
+        for i, title in enumerate(["Tomato Soup", "Tofu Stir Fry", "Spicy Tomato Pasta"], start=1):
+            db.session.add(Recipe(id=i, title=title, image=""))
+        db.session.flush()
+        db.session.add(Favorites(user_id=user.id, recipe_id=2))
+        db.session.commit()
+        suggest.rebuild()  # what the startup job does
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+        jobs.queue.clear()
+
+    def get(self, prefix, **params):
+        response = self.client.get("/recipes/suggest", query_string=dict(prefix=prefix, **params))
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()["suggestions"]
+
+    def test_completes_last_word(self):
+        # tofu: one title plus one favorite; tomato: two titles, tie broken alphabetically
+        self.assertEqual(self.get("to"), ["tofu", "tomato"])
+        self.assertEqual(self.get("Spicy  TOM"), ["spicy tomato"])
+        self.assertEqual(self.get("to", limit=1), ["tofu"])
+        self.assertEqual(self.get("tomato "), [])
+        self.assertEqual(self.get(""), [])
+
+    def test_missing_index_is_built_in_background(self):
+        suggest_index.invalidate()
+        self.assertEqual(self.get("to"), [])
+        self.assertEqual(self.get("to"), [])
+        self.assertEqual(jobs.queue.stats()["depth"], 1)
+
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertEqual(self.get("to"), ["tofu", "tomato"])
+
+    def test_response_is_publicly_cacheable(self):
+        response = self.client.get("/recipes/suggest?prefix=so")
+        self.assertEqual(response.get_json(), {"prefix": "so", "suggestions": ["soup"]})
+        self.assertTrue(response.cache_control.public)
+
+    def test_follows_edits_and_deletes(self):
+        self.assertEqual(self.get("so"), ["soup"])
+
+        recipe = db.session.get(Recipe, 1)
+        recipe.title = "Tomato Bisque"
+        db.session.add(Recipe(id=4, title="Sourdough", image=""))
+        db.session.commit()
+        self.assertEqual(self.get("so"), ["sourdough"])
+        self.assertEqual(self.get("bi"), ["bisque"])
+
+        db.session.delete(db.session.get(Recipe, 4))
+        db.session.commit()
+        self.assertEqual(self.get("so"), [])
+        self.assertTrue(suggest_index.built)
+
+    def test_rolled_back_writes_are_not_indexed(self):
+        db.session.get(Recipe, 1).title = "Tomato Bisque"
+        db.session.add(Recipe(id=4, title="Sourdough", image=""))
+        db.session.flush()
+        db.session.rollback()
+
+        db.session.add(Recipe(id=5, title="Tofu Scramble", image=""))
+        db.session.commit()
+        self.assertEqual(self.get("so"), ["soup"])
+        self.assertEqual(self.get("bi"), [])
+        self.assertEqual(self.get("sc"), ["scramble"])
+
+        db.session.add(Recipe(id=6, title="Sourdough", image=""))
+        db.session.flush()
+        db.session.close()
+        db.session.commit()
+        self.assertEqual(self.get("so"), ["soup"])
+
+    def test_old_index_is_rebuilt_in_background(self):
+        self.get("to")
+        suggest_index.max_age = 0
+        try:
+            self.assertEqual(self.get("to"), ["tofu", "tomato"])
+            self.assertEqual(jobs.queue.stats()["depth"], 1)
+        finally:
+            suggest_index.max_age = app.config["SUGGEST_MAX_AGE"]
+        self.assertEqual(jobs.queue.drain(), 1)
+        self.assertTrue(suggest_index.fresh)
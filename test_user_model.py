@@ -5,12 +5,14 @@
 import os
 from unittest import TestCase
 
-from models import db, User, Recipe, Favorites
+from models import db, User, Recipe, Favorites, passwords
 from sqlalchemy.exc import IntegrityError
 
 os.environ['DATABASE_URL'] = "postgresql:///food-recipe-test"
 
-from app import app
+from app import create_app
+
+app = create_app("testing")
 
 
 class UserModelTestCase(TestCase):
@@ -149,3 +151,20 @@ class UserModelTestCase(TestCase):
 
         auth_user = User.authenticate('testuser', 'invalidpassword')
         self.assertFalse(auth_user)    
+
+    def test_authenticate_rehashes_on_cost_change(self):
+        """Test that logging in upgrades a hash made with a different cost."""
+        rounds = passwords.rounds
+        passwords.configure(rounds=4)
+        try:
+            User.signup('test', 'user', 'testuser', 'test@test.com', 'password123')
+            db.session.commit()
+            self.assertTrue(User.query.one().password.startswith('$2b$04$'))
+
+            passwords.configure(rounds=5)
+            auth_user = User.authenticate('testuser', 'password123')
+            db.session.commit()
+            self.assertTrue(auth_user.password.startswith('$2b$05$'))
+            self.assertTrue(User.authenticate('testuser', 'password123'))
+        finally:
+            passwords.configure(rounds=rounds)
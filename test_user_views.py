@@ -2,7 +2,9 @@ import os
 from unittest import TestCase
 from models import db, User, Recipe, Favorites
 from flask import session
-from app import app, CURR_USER_KEY
+from app import create_app, CURR_USER_KEY
+
+app = create_app("testing")
 
 class UserViewsTestCase(TestCase):
     
@@ -69,4 +71,44 @@ class UserViewsTestCase(TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertIn('Access unauthorized', html)
 
-        
\ No newline at end of file
+
+    def test_toggle_favorite_json(self):
+        """Test that the JSON toggle flips the favorite and reports the count."""
+        recipe = Recipe.query.first()
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user.id
+
+            response = c.post(f'/api/recipes/{recipe.id}/favorite')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, {"recipe_id": recipe.id, "favorited": True, "count": 1})
+
+            response = c.post(f'/api/recipes/{recipe.id}/favorite')
+            self.assertEqual(response.json["favorited"], False)
+            self.assertEqual(response.json["count"], 0)
+            self.assertEqual(Favorites.query.count(), 0)
+
+    def test_toggle_favorite_json_errors(self):
+        """Test that the JSON toggle rejects anonymous users and unknown recipes."""
+        with self.client as c:
+            response = c.post('/api/recipes/1/favorite')
+            self.assertEqual(response.status_code, 401)
+
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user.id
+            response = c.post('/api/recipes/999999/favorite')
+            self.assertEqual(response.status_code, 404)
+
+    def test_home_page_marks_favorites(self):
+        """Test that the home feed flags the user's favorite recipes."""
+        recipe = Recipe.query.first()
+        db.session.add(Favorites(user_id=self.user.id, recipe_id=recipe.id))
+        db.session.commit()
+
+        with self.client as c:
+            with c.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user.id
+            html = c.get('/').get_data(as_text=True)
+
+            self.assertIn('btn-primary fav-btn', html)
+            self.assertNotIn('btn-secondary fav-btn', html)